@@ -1,59 +1,266 @@
 import argparse
-import openai
 import os
 import json
 import time
+import uuid
+import asyncio
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import openai
 from .model_manager import confirm_model
-from .openai_wrapper import call_openai_method
+from .openai_wrapper import call_openai_method, acall_openai_method
+from .retry_policy import is_retryable
+from .image_download import save_images
+
+DEFAULT_IMAGE_CONCURRENCY = 4  # image requests in flight when fanning out
+DEFAULT_IMAGE_RETRIES = 1  # extra attempts for a single failed image
+MAX_IMAGES_PER_REQUEST = {"dall-e-3": 1, "dall-e-2": 10}
+JOB_FIELDS = ("prompt", "size", "quality", "style", "n")
 
 logger = logging.getLogger(__name__)
 
-def generate_dalle_image(args):
-    api_key = args.api_key if args.api_key else os.getenv("OPENAI_API_KEY")
+def _run_stamp():
+    """UTC time plus a random suffix, so runs started in the same second never share file names."""
+    return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
-    if not confirm_model(args.model):
-        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
-        exit(1)
+def _build_request(args, job=None):
+    """Request payload for `args`, with `prompt`/`size`/`quality`/`style`/`n` overridable per job."""
+    api_key = args.api_key if args.api_key else os.getenv("OPENAI_API_KEY")
+    job = job or {}
 
     request_payload = {
         "model": args.model,
-        "prompt": args.prompt,
-        "size": args.size,
-        "n": args.n,
-        "response_format": "url",
+        "prompt": job.get("prompt", args.prompt),
+        "size": job.get("size") or args.size,
+        "n": job.get("n") or args.n,
+        "response_format": getattr(args, 'response_format', None) or "url",
         "api_key": api_key
     }
 
     if args.model == "dall-e-3":
-        request_payload["quality"] = args.quality
-        if args.style:
-            request_payload["style"] = args.style
+        request_payload["quality"] = job.get("quality") or args.quality
+        style = job.get("style") or args.style
+        if style:
+            request_payload["style"] = style
+    return request_payload
+
+def _save_results(args, response):
+    """
+    Write a JSON record per image. With `--download` (or b64_json output) the
+    images themselves are saved first and their path, size and timing are
+    included in the record. Returns the records.
+    """
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = _run_stamp()
+
+    if getattr(args, 'download', False) or any(item.b64_json for item in response.data):
+        start = time.time()
+        reports = save_images(response.data, args.output_dir, getattr(args, 'concurrency', None))
+        saved = [r for r in reports if "error" not in r]
+        logger.info("Saved %s/%s images (%s bytes) in %.2fs", len(saved), len(reports),
+                    sum(r["bytes"] for r in saved), time.time() - start)
+    else:
+        reports = [{"url": item.url} for item in response.data]
+
+    records = []
+    for i, report in enumerate(reports):
+        record = {**report, "prompt": args.prompt}
+        filename = f"{args.output_dir}/dalle_{timestamp}_{i+1}.json"
+        with open(filename, 'w') as f:
+            json.dump(record, f, indent=2)
+        logger.info("Saved record to %s: %s", filename, report.get("path") or report.get("url"))
+        records.append(record)
+    return records
+
+def read_jobs(path):
+    """
+    Read image jobs from a file: JSONL objects with a `prompt` and optional
+    `size`, `quality`, `style` and `n`, or plain text with one prompt per line.
+    """
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                job = json.loads(line)
+                if not isinstance(job, dict) or "prompt" not in job:
+                    raise ValueError(f"{path}:{line_no}: expected an object with a 'prompt' field")
+                jobs.append({key: job[key] for key in JOB_FIELDS if job.get(key) is not None})
+            else:
+                jobs.append({"prompt": line})
+    return jobs
+
+
+def _needs_fan_out(args):
+    return bool(getattr(args, 'jobs', None)) or args.n > MAX_IMAGES_PER_REQUEST.get(args.model, args.n)
+
+
+def _plan_requests(args, jobs):
+    """Split every job into requests the model accepts; returns (job index, job, n) tuples."""
+    limit = MAX_IMAGES_PER_REQUEST.get(args.model, 10)
+    requests = []
+    for index, job in enumerate(jobs):
+        remaining = job.get("n") or args.n
+        while remaining > 0:
+            requests.append((index, job, min(remaining, limit)))
+            remaining -= limit
+    return requests
+
+
+def _image_entries(args, index, job, n, response=None, error=None):
+    """Manifest entries for one request's images, downloading them if asked to."""
+    payload = _build_request(args, job)
+    base = {"job": index, "prompt": payload["prompt"], "size": payload["size"]}
+    for key in ("quality", "style"):
+        if key in payload:
+            base[key] = payload[key]
+    if error is not None:
+        return [{**base, "error": f"{type(error).__name__}: {error}", "retryable": is_retryable(error)}
+                for _ in range(n)]
+    if getattr(args, 'download', False) or any(item.b64_json for item in response.data):
+        reports = save_images(response.data, args.output_dir, getattr(args, 'concurrency', None))
+    else:
+        reports = [{"url": item.url} for item in response.data]
+    entries = [{**base, **report} for report in reports]
+    for entry in entries:
+        if "error" in entry:
+            entry["retryable"] = True  # e.g. an expired URL: generate that image again
+    return entries
+
+
+def _generate_request(args, index, job, n):
+    payload = dict(_build_request(args, job), n=n)
+    try:
+        response = call_openai_method("images.generate", **payload)
+    except openai.OpenAIError as e:
+        logger.error("Image request for job %s failed: %s", index, e)
+        return _image_entries(args, index, job, n, error=e)
+    return _image_entries(args, index, job, n, response=response)
+
+
+def _generate_with_retries(args, index, job, n):
+    """Run one request, then re-request each failed image on its own."""
+    entries = _generate_request(args, index, job, n)
+    retries = getattr(args, 'image_retries', None)
+    retries = DEFAULT_IMAGE_RETRIES if retries is None else retries
+    for position, entry in enumerate(entries):
+        attempts = 1
+        while "error" in entry and entry.get("retryable") and attempts <= retries:
+            attempts += 1
+            logger.warning("Retrying image %s of job %s (attempt %s)", position + 1, index, attempts)
+            entry = _generate_request(args, index, job, 1)[0]
+        entry.pop("retryable", None)
+        entry["attempts"] = attempts
+        entries[position] = entry
+    return entries
+
+
+def _write_manifest(args, jobs, entries, duration):
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = _run_stamp()
+    manifest = {
+        "created": stamp.split("_")[0],
+        "model": args.model,
+        "jobs": len(jobs),
+        "images": entries,
+        "failed": sum(1 for entry in entries if "error" in entry),
+        "duration_s": round(duration, 2),
+    }
+    path = os.path.join(args.output_dir, f"dalle_manifest_{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Generated %s/%s images for %s jobs in %.2fs; manifest: %s",
+                len(entries) - manifest["failed"], len(entries), len(jobs), duration, path)
+    return manifest
+
+
+def _jobs_for(args):
+    return read_jobs(args.jobs) if getattr(args, 'jobs', None) else [{"prompt": args.prompt}]
+
+
+def generate_dalle_batch(args, jobs=None):
+    """
+    Generate images for many jobs (default: `args.jobs` or the single prompt),
+    splitting `n` into as many requests as the model needs. Requests run
+    `args.concurrency` at a time, failed images are retried individually and
+    everything is recorded in one manifest, which is returned.
+    """
+    jobs = _jobs_for(args) if jobs is None else jobs
+    concurrency = getattr(args, 'concurrency', None) or DEFAULT_IMAGE_CONCURRENCY
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = pool.map(lambda request: _generate_with_retries(args, *request), _plan_requests(args, jobs))
+        entries = [entry for request_entries in results for entry in request_entries]
+    return _write_manifest(args, jobs, entries, time.time() - start)
+
+
+async def agenerate_dalle_batch(args, jobs=None):
+    """Async version of `generate_dalle_batch`; each request runs in a worker thread."""
+    jobs = _jobs_for(args) if jobs is None else jobs
+    semaphore = asyncio.Semaphore(getattr(args, 'concurrency', None) or DEFAULT_IMAGE_CONCURRENCY)
+    start = time.time()
+
+    async def run(request):
+        async with semaphore:
+            return await asyncio.to_thread(_generate_with_retries, args, *request)
+
+    results = await asyncio.gather(*(run(request) for request in _plan_requests(args, jobs)))
+    entries = [entry for request_entries in results for entry in request_entries]
+    return await asyncio.to_thread(_write_manifest, args, jobs, entries, time.time() - start)
+
+
+def generate_dalle_image(args):
+    if not confirm_model(args.model):
+        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
+        exit(1)
+
+    if _needs_fan_out(args):
+        return generate_dalle_batch(args)
+
+    request_payload = _build_request(args)
 
     start = time.time()
     response = call_openai_method("images.generate", **request_payload)
     logger.info("Duration: %.2fs", time.time() - start)
 
-    os.makedirs(args.output_dir, exist_ok=True)
-    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return _save_results(args, response)
 
-    for i, item in enumerate(response["data"]):
-        image_url = item["url"]
-        filename = f"{args.output_dir}/dalle_{timestamp}_{i+1}.json"
-        with open(filename, 'w') as f:
-            json.dump({"url": image_url, "prompt": args.prompt}, f, indent=2)
-        logger.info("Saved URL to %s: %s", filename, image_url)
+async def agenerate_dalle_image(args):
+    """Async version of `generate_dalle_image`."""
+    if not await asyncio.to_thread(confirm_model, args.model):
+        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
+        exit(1)
+
+    if _needs_fan_out(args):
+        return await agenerate_dalle_batch(args)
+
+    request_payload = _build_request(args)
+
+    start = time.time()
+    response = await acall_openai_method("images.generate", **request_payload)
+    logger.info("Duration: %.2fs", time.time() - start)
+
+    return await asyncio.to_thread(_save_results, args, response)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='OpenAI DALL·E Image Generator')
     parser.add_argument('--model', type=str, required=True, help='Model ID (e.g., dall-e-3 or dall-e-2)')
-    parser.add_argument('--prompt', type=str, required=True, help='Text prompt to generate an image')
+    parser.add_argument('--prompt', type=str, help='Text prompt to generate an image')
+    parser.add_argument('--jobs', type=str, help='Prompt file (one per line) or JSONL of prompt/size/quality/style/n jobs')
     parser.add_argument('--size', type=str, choices=['256x256', '512x512', '1024x1024'], default='1024x1024', help='Image resolution')
     parser.add_argument('--quality', type=str, choices=['standard', 'hd'], default='standard', help='Image quality (DALL·E 3 only)')
     parser.add_argument('--style', type=str, choices=['vivid', 'natural'], help='Optional style parameter (DALL·E 3 only)')
     parser.add_argument('--n', type=int, default=1, help='Number of images to generate')
     parser.add_argument('--output_dir', type=str, default='images', help='Directory to save generated images')
+    parser.add_argument('--response_format', type=str, choices=['url', 'b64_json'], default='url', help='Return image URLs or inline base64 data')
+    parser.add_argument('--download', action='store_true', help='Download images right away instead of saving only their URLs')
+    parser.add_argument('--concurrency', type=int, help='Parallel image requests and downloads')
+    parser.add_argument('--image_retries', type=int, default=DEFAULT_IMAGE_RETRIES, help='Extra attempts per failed image')
     parser.add_argument('--api_key', type=str, help='OpenAI API key')
     args = parser.parse_args()
+    if not args.prompt and not args.jobs:
+        parser.error("one of --prompt or --jobs is required")
     generate_dalle_image(args)
@@ -1,32 +1,47 @@
-import openai
 import time
+import asyncio
+import inspect
 import logging
-from .openai_wrapper import call_openai_method
+import threading
+import httpx
+from .openai_wrapper import call_openai_method, acall_openai_method
+from .chat_stream import ChatStream, AsyncChatStream
 import datetime
+import openai
+
+RUN_TIMEOUT = 300  # seconds an assistant run may take before it is cancelled
+POLL_INITIAL_DELAY = 0.1  # first poll of a run's status, in seconds
+POLL_MAX_DELAY = 2.0
+POLL_BACKOFF = 1.5
+# "requires_action" ends the run for us: tool outputs are not submitted here.
+RUN_TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete", "requires_action"}
+# Responses meaning the endpoint does not accept `stream=True`; fall back to polling.
+STREAM_UNSUPPORTED_ERRORS = (openai.BadRequestError, openai.UnprocessableEntityError)
+# A stream that breaks off after the run started; the run is polled instead.
+STREAM_INTERRUPTED_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, httpx.TransportError)
+LOCK_POLL_DELAY = 0.05  # seconds between attempts of an async prompt to take a busy thread
 
 logger = logging.getLogger(__name__)
 
-def use_chat_api(prompt, model, stream, api_key=None):
+_reused_threads = {}  # (api_key, assistant_id) -> thread id, for reuse_thread=True
+_thread_locks = {}  # thread id -> Lock, for threads that several prompts may share
+_threads_lock = threading.Lock()
+
+def use_chat_api(prompt, model, stream, api_key=None, on_delta=None):
+    """
+    Send `prompt` to the chat API and return the reply text.
+
+    With `stream`, deltas are passed to `on_delta` as they arrive (use
+    `chat_stream.stream_chat` to iterate them directly).
+    """
     start = time.time()
     logger.info("Calling chat API with model %s", model)
     if stream:
-        response = call_openai_method(
-            "chat.completions.create",
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            stream=True,
-            api_key=api_key
-        )
-        print("\nStreaming Response:")
-        full_response = ""
-        for chunk in response:
-            if 'choices' in chunk and len(chunk['choices']) > 0:
-                delta = chunk['choices'][0]['delta'].get('content', '')
-                print(delta, end='', flush=True)
-                full_response += delta
-        print()
-        logger.info("Duration: %.2fs", time.time() - start)
-        return full_response
+        chat = ChatStream(prompt, model, api_key=api_key)
+        for delta in chat:
+            if on_delta:
+                on_delta(delta)
+        return chat.text
     else:
         response = call_openai_method(
             "chat.completions.create",
@@ -38,38 +53,296 @@ def use_chat_api(prompt, model, stream, api_key=None):
         logger.info("Duration: %.2fs | Tokens: %s", time.time() - start, usage)
         return response.choices[0].message.content
 
-def use_assistant_api(prompt, assistant_id, api_key=None):
+def _assistant_thread(assistant_id, thread_id, reuse_thread, api_key):
+    """Pick the thread for a prompt: an explicit id, a reused one, or None (create new)."""
+    if thread_id or not reuse_thread:
+        return thread_id
+    with _threads_lock:
+        return _reused_threads.get((api_key, assistant_id))
+
+
+def _remember_thread(assistant_id, thread_id, reuse_thread, api_key):
+    """Keep `thread_id` for reuse; returns the thread to use (another caller's if it got there first)."""
+    if not reuse_thread:
+        return thread_id
+    with _threads_lock:
+        return _reused_threads.setdefault((api_key, assistant_id), thread_id)
+
+
+def _thread_lock(thread_id):
+    """Lock held while a prompt runs on a shared thread: a thread accepts one active run at a time."""
+    with _threads_lock:
+        return _thread_locks.setdefault(thread_id, threading.Lock())
+
+
+def _poll_delays():
+    """Delays between run polls: quick at first, backing off to POLL_MAX_DELAY."""
+    delay = POLL_INITIAL_DELAY
+    while True:
+        yield delay
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+
+def _stream_event(event, parts):
+    """Collect text from one run stream event; returns the run if the event carries one."""
+    data = event.data
+    if event.event == "thread.message.delta":
+        for part in data.delta.content or ():
+            text = getattr(part, "text", None)
+            if text is not None and text.value:
+                parts.append(text.value)
+    elif getattr(data, "object", None) == "thread.run":
+        return data
+    elif event.event == "error":
+        logger.error("Assistant run stream error: %s", getattr(data, "message", data))
+    return None
+
+
+def _messages_text(messages):
+    """Text of the assistant messages of one run, oldest first."""
+    parts = []
+    for message in messages.data:
+        if message.role != "assistant":
+            continue
+        for part in message.content:
+            if part.type == "text":
+                parts.append(part.text.value)
+    return "\n".join(parts)
+
+
+def _run_outcome(run):
+    """Message returned for a run that did not complete."""
+    if run.status == "requires_action":
+        return "Run requires action (tool calls are not supported)."
+    if run.status == "incomplete":
+        reason = getattr(run.incomplete_details, "reason", None)
+        return f"Run incomplete: {reason}." if reason else "Run incomplete."
+    if run.status == "failed" and run.last_error:
+        return f"Run failed: {run.last_error.message}"
+    return f"Run {run.status}."
+
+
+class _Call:
+    """An API call requested by `_assistant_steps`."""
+
+    def __init__(self, method_path, *args, **kwargs):
+        self.method_path = method_path
+        self.args = args
+        self.kwargs = kwargs
+
+
+class _StreamRun(_Call):
+    """A streamed run; keeps the run and text seen so far when the stream breaks off."""
+
+    def __init__(self, deadline, **kwargs):
+        super().__init__("beta.threads.runs.create", stream=True, **kwargs)
+        self.deadline = deadline
+        self.run = None
+        self.parts = []
+
+    def feed(self, event):
+        """Take one event; True once the stream can be left."""
+        self.run = _stream_event(event, self.parts) or self.run
+        if self.run is not None and self.run.status in RUN_TERMINAL_STATUSES:
+            return True
+        return time.monotonic() > self.deadline
+
+
+class _Sleep:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+class _Acquire:
+    def __init__(self, lock):
+        self.lock = lock
+
+
+def _assistant_steps(prompt, assistant_id, api_key, thread_id, reuse_thread, stream, timeout):
+    """
+    The steps of one assistant prompt, shared by the sync and async APIs.
+
+    Yields `_Call`, `_StreamRun`, `_Sleep` and `_Acquire` requests, is sent
+    their results (or has their errors thrown in) by `_run_steps` or
+    `_arun_steps`, and returns the reply text.
+    """
     start = time.time()
-    thread = call_openai_method("beta.threads.create", api_key=api_key)
-    call_openai_method(
-        "beta.threads.messages.create",
-        thread_id=thread.id,
-        role="user",
-        content=prompt,
-        api_key=api_key
-    )
-    run = call_openai_method(
-        "beta.threads.runs.create",
-        thread_id=thread.id,
-        assistant_id=assistant_id,
-        api_key=api_key
-    )
-    while run.status not in ['completed', 'failed']:
-        time.sleep(1)
-        run = call_openai_method(
-            "beta.threads.runs.retrieve",
-            thread_id=thread.id,
+    deadline = time.monotonic() + timeout
+    shared = bool(thread_id or reuse_thread)
+    thread_id = _assistant_thread(assistant_id, thread_id, reuse_thread, api_key)
+    if thread_id is None:
+        thread = yield _Call("beta.threads.create", api_key=api_key)
+        thread_id = _remember_thread(assistant_id, thread.id, reuse_thread, api_key)
+    lock = _thread_lock(thread_id) if shared else None
+    if lock is not None:
+        yield _Acquire(lock)
+    try:
+        yield _Call(
+            "beta.threads.messages.create",
+            thread_id=thread_id,
+            role="user",
+            content=prompt,
+            api_key=api_key
+        )
+
+        run, streamed = None, None
+        if stream:
+            step = _StreamRun(deadline, thread_id=thread_id, assistant_id=assistant_id, api_key=api_key)
+            try:
+                yield step
+            except STREAM_UNSUPPORTED_ERRORS as e:
+                logger.warning("Run streaming unavailable, polling instead: %s", e)
+            except STREAM_INTERRUPTED_ERRORS as e:
+                if step.run is None:
+                    raise
+                logger.warning("Run stream interrupted, polling instead: %s", e)
+            run = step.run
+            # Only a stream that saw the run complete carries the whole reply.
+            if run is not None and run.status == "completed":
+                streamed = "".join(step.parts)
+        if run is None:
+            run = yield _Call(
+                "beta.threads.runs.create",
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                api_key=api_key
+            )
+
+        delays = _poll_delays()
+        while run.status not in RUN_TERMINAL_STATUSES:
+            if time.monotonic() > deadline:
+                yield _Call("beta.threads.runs.cancel", run.id, thread_id=thread_id, api_key=api_key)
+                logger.info("Duration: %.2fs", time.time() - start)
+                return f"Run timed out after {timeout}s."
+            yield _Sleep(min(next(delays), max(deadline - time.monotonic(), 0)))
+            run = yield _Call(
+                "beta.threads.runs.retrieve",
+                run.id,
+                thread_id=thread_id,
+                api_key=api_key
+            )
+
+        logger.info("Duration: %.2fs | Run status: %s", time.time() - start, run.status)
+        if run.status == "requires_action":
+            yield _Call("beta.threads.runs.cancel", run.id, thread_id=thread_id, api_key=api_key)
+        if run.status != "completed":
+            return _run_outcome(run)
+        if streamed:
+            return streamed
+        messages = yield _Call(
+            "beta.threads.messages.list",
+            thread_id=thread_id,
             run_id=run.id,
+            order="asc",
             api_key=api_key
         )
+        return _messages_text(messages)
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def _run_steps(steps):
+    """Carry out `_assistant_steps` with blocking calls; returns the reply."""
+    result, error = None, None
+    try:
+        while True:
+            try:
+                step = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            result, error = None, None
+            try:
+                if isinstance(step, _StreamRun):
+                    with call_openai_method(step.method_path, *step.args, **step.kwargs) as events:
+                        for event in events:
+                            if step.feed(event):
+                                break
+                elif isinstance(step, _Call):
+                    result = call_openai_method(step.method_path, *step.args, **step.kwargs)
+                elif isinstance(step, _Sleep):
+                    time.sleep(step.seconds)
+                else:
+                    step.lock.acquire()
+            except Exception as e:
+                error = e
+    finally:
+        steps.close()
+
+
+async def _arun_steps(steps):
+    """Carry out `_assistant_steps` without blocking the event loop; returns the reply."""
+    result, error = None, None
+    try:
+        while True:
+            try:
+                step = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            result, error = None, None
+            try:
+                if isinstance(step, _StreamRun):
+                    events = await acall_openai_method(step.method_path, *step.args, **step.kwargs)
+                    async with events:
+                        async for event in events:
+                            if step.feed(event):
+                                break
+                elif isinstance(step, _Call):
+                    result = await acall_openai_method(step.method_path, *step.args, **step.kwargs)
+                elif isinstance(step, _Sleep):
+                    await asyncio.sleep(step.seconds)
+                else:
+                    # Polled rather than waited for in a worker thread, so cancelling
+                    # this task can never leave the lock taken.
+                    while not step.lock.acquire(blocking=False):
+                        await asyncio.sleep(LOCK_POLL_DELAY)
+            except Exception as e:
+                error = e
+    finally:
+        steps.close()
 
-    if run.status == 'failed':
-        return "Run failed."
 
-    messages = call_openai_method(
-        "beta.threads.messages.list",
-        thread_id=thread.id,
+def use_assistant_api(prompt, assistant_id, api_key=None, thread_id=None, reuse_thread=False,
+                      stream=True, timeout=RUN_TIMEOUT):
+    """
+    Ask an assistant and return its reply text.
+
+    The run is streamed when the API supports it; otherwise (or if the stream
+    breaks off) it is polled with backoff and the reply is read back from the
+    thread. Pass `thread_id`, or `reuse_thread=True` to keep one thread per
+    assistant for this process, to continue a conversation instead of
+    starting a new thread; prompts on a shared thread run one at a time.
+    Runs that stop in any other state than `completed` (or exceed `timeout`
+    seconds) return a "Run ..." message; unfinished runs are cancelled
+    first so the thread stays usable.
+    """
+    return _run_steps(_assistant_steps(prompt, assistant_id, api_key, thread_id, reuse_thread, stream, timeout))
+
+
+async def ause_chat_api(prompt, model, stream=False, api_key=None, on_delta=None):
+    """Async version of `use_chat_api`; `on_delta` may be a coroutine function."""
+    start = time.time()
+    logger.info("Calling chat API with model %s", model)
+    if stream:
+        chat = AsyncChatStream(prompt, model, api_key=api_key)
+        async for delta in chat:
+            if on_delta:
+                result = on_delta(delta)
+                if inspect.isawaitable(result):
+                    await result
+        return chat.text
+    response = await acall_openai_method(
+        "chat.completions.create",
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
         api_key=api_key
     )
-    logger.info("Duration: %.2fs", time.time() - start)
-    return messages.data[0]['content'][0]['text']['value']
+    usage = getattr(response, 'usage', {})
+    logger.info("Duration: %.2fs | Tokens: %s", time.time() - start, usage)
+    return response.choices[0].message.content
+
+async def ause_assistant_api(prompt, assistant_id, api_key=None, thread_id=None, reuse_thread=False,
+                             stream=True, timeout=RUN_TIMEOUT):
+    """Async version of `use_assistant_api`."""
+    return await _arun_steps(_assistant_steps(prompt, assistant_id, api_key, thread_id, reuse_thread, stream,
+                                              timeout))
@@ -1,44 +1,111 @@
 import argparse
-import openai
 import os
 import json
 import time
+import asyncio
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from .model_manager import confirm_model
-from .openai_wrapper import call_openai_method
+from .openai_wrapper import call_openai_method, acall_openai_method
+from . import audio_segments
+
+DEFAULT_CHUNK_CONCURRENCY = 4
+TIMESTAMPED_FORMATS = {"srt", "vtt", "verbose_json"}
 
 logger = logging.getLogger(__name__)
 
-def transcribe_audio(args):
+def _request_kwargs(args):
     api_key = args.api_key if args.api_key else os.getenv("OPENAI_API_KEY")
+    operation = "translate" if args.translate else "transcribe"
+    kwargs = {
+        "model": args.model,
+        "language": args.language,
+        "response_format": args.format,
+        "api_key": api_key
+    }
+    endpoint = "translations" if args.translate else "transcriptions"
+    return operation, f"audio.{endpoint}.create", kwargs
 
-    if not confirm_model(args.model):
-        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
-        exit(1)
+def _chunk_settings(args):
+    segment_seconds = getattr(args, 'segment_seconds', None) or audio_segments.DEFAULT_SEGMENT_SECONDS
+    overlap = getattr(args, 'overlap', None)
+    concurrency = getattr(args, 'concurrency', None) or DEFAULT_CHUNK_CONCURRENCY
+    return segment_seconds, audio_segments.DEFAULT_OVERLAP_SECONDS if overlap is None else overlap, concurrency
 
-    operation = "translate" if args.translate else "transcribe"
-    method = f"audio.{operation}s.create"
 
-    start = time.time()
-    logger.info("Starting %s with model %s", operation, args.model)
-    with open(args.file, 'rb') as audio_file:
-        transcript = call_openai_method(
-            method,
-            model=args.model,
-            file=audio_file,
-            language=args.language,
-            response_format=args.format,
-            api_key=api_key
-        )
+def _plan_chunks(args, kwargs):
+    """
+    Plan segments for a long WAV file, or return None to upload it whole.
+    Adjusts `kwargs` so segments come back in a stitchable format.
+    """
+    segment_seconds, overlap, _ = _chunk_settings(args)
+    if not audio_segments.is_wav(args.file):
+        if os.path.getsize(args.file) > audio_segments.MAX_UPLOAD_BYTES:
+            logger.warning("%s is larger than the upload limit; convert it to WAV to have it split automatically",
+                           args.file)
+        return None
+    if not audio_segments.needs_chunking(args.file, segment_seconds):
+        return None
+    if args.model.startswith("whisper"):
+        # Timestamps are needed to offset and deduplicate the segments.
+        kwargs["response_format"] = "verbose_json"
+    elif args.format in TIMESTAMPED_FORMATS:
+        raise ValueError(f"Splitting audio into '{args.format}' output requires a model with verbose_json support")
+    else:
+        kwargs["response_format"] = "json"
+        overlap = 0  # without timestamps overlapping text cannot be removed
+    segments = audio_segments.plan_segments(args.file, segment_seconds, overlap)
+    logger.info("Split %s into %s segments", args.file, len(segments))
+    return segments
+
+
+def _stitch(args, kwargs, transcripts, segments):
+    if kwargs["response_format"] != "verbose_json":
+        text = audio_segments.join_texts(transcripts)
+        return text if args.format == "text" else {"text": text}
+    return audio_segments.render(audio_segments.stitch_verbose(segments, transcripts), args.format)
 
+
+def _transcribe_segment(args, method, kwargs, segment):
+    with audio_segments.read_segment(args.file, segment) as audio_file:
+        return call_openai_method(method, file=audio_file, **kwargs)
+
+
+def transcribe_chunks(args, method, kwargs, segments):
+    """Transcribe planned segments concurrently and stitch them in order."""
+    _, _, concurrency = _chunk_settings(args)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        transcripts = list(pool.map(lambda segment: _transcribe_segment(args, method, kwargs, segment), segments))
+    return _stitch(args, kwargs, transcripts, segments)
+
+
+async def atranscribe_chunks(args, method, kwargs, segments):
+    """Async version of `transcribe_chunks`."""
+    _, _, concurrency = _chunk_settings(args)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def transcribe(segment):
+        async with semaphore:
+            audio_file = await asyncio.to_thread(audio_segments.read_segment, args.file, segment)
+            with audio_file:
+                return await acall_openai_method(method, file=audio_file, **kwargs)
+
+    transcripts = await asyncio.gather(*(transcribe(segment) for segment in segments))
+    return _stitch(args, kwargs, transcripts, segments)
+
+
+def render_transcript(transcript):
+    """The transcript as the text written to disk or the console."""
     if isinstance(transcript, dict):
-        output = json.dumps(transcript, indent=2)
-    else:
-        output = transcript
+        return json.dumps(transcript, indent=2)
+    if hasattr(transcript, 'model_dump'):
+        return json.dumps(transcript.model_dump(), indent=2)
+    return transcript
 
-    logger.info("Duration: %.2fs", time.time() - start)
 
+def _write_output(args, transcript):
+    output = render_transcript(transcript)
     if args.output_file:
         with open(args.output_file, 'w', encoding='utf-8') as f:
             f.write(output)
@@ -47,14 +114,70 @@ def transcribe_audio(args):
         print("\nTranscription Output:\n")
         print(output)
 
+def transcribe_file(args):
+    """Transcribe `args.file`, split into parallel requests when it is a long WAV; returns the transcript."""
+    _, method, kwargs = _request_kwargs(args)
+    segments = _plan_chunks(args, kwargs)
+    if segments:
+        return transcribe_chunks(args, method, kwargs, segments)
+    with open(args.file, 'rb') as audio_file:
+        return call_openai_method(method, file=audio_file, **kwargs)
+
+
+def transcribe_audio(args):
+    if getattr(args, 'input_dir', None):
+        from .audio_batch import transcribe_directory
+        return transcribe_directory(args)
+
+    if not confirm_model(args.model):
+        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
+        exit(1)
+
+    operation, _, _ = _request_kwargs(args)
+
+    start = time.time()
+    logger.info("Starting %s with model %s", operation, args.model)
+    transcript = transcribe_file(args)
+
+    logger.info("Duration: %.2fs", time.time() - start)
+    _write_output(args, transcript)
+
+async def atranscribe_audio(args):
+    """Async version of `transcribe_audio`."""
+    if not await asyncio.to_thread(confirm_model, args.model):
+        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
+        exit(1)
+
+    operation, method, kwargs = _request_kwargs(args)
+
+    start = time.time()
+    logger.info("Starting %s with model %s", operation, args.model)
+    segments = await asyncio.to_thread(_plan_chunks, args, kwargs)
+    if segments:
+        transcript = await atranscribe_chunks(args, method, kwargs, segments)
+    else:
+        with open(args.file, 'rb') as audio_file:
+            transcript = await acall_openai_method(method, file=audio_file, **kwargs)
+
+    logger.info("Duration: %.2fs", time.time() - start)
+    _write_output(args, transcript)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='OpenAI Whisper Transcription Tool')
     parser.add_argument('--model', type=str, required=True, help='Model ID (e.g., whisper-1)')
-    parser.add_argument('--file', type=str, required=True, help='Path to audio file to transcribe')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', type=str, help='Path to audio file to transcribe')
+    source.add_argument('--input_dir', type=str, help='Transcribe every audio file under this directory (resumable)')
+    parser.add_argument('--output_dir', type=str, help='Mirrored tree for --input_dir transcripts (default: next to the audio)')
     parser.add_argument('--language', type=str, help='Optional language code (e.g., en, es, fr)')
     parser.add_argument('--translate', action='store_true', help='Translate to English instead of transcribing')
     parser.add_argument('--format', type=str, choices=['json', 'text', 'srt', 'vtt', 'verbose_json'], default='json', help='Output format')
     parser.add_argument('--output_file', type=str, help='File to save the result')
+    parser.add_argument('--segment_seconds', type=float, help='Split WAV files longer than this into parallel requests')
+    parser.add_argument('--overlap', type=float, help='Seconds of overlap between split segments')
+    parser.add_argument('--concurrency', type=int, help='Segments (or --input_dir files) transcribed in parallel')
     parser.add_argument('--api_key', type=str, help='OpenAI API key')
     args = parser.parse_args()
-    transcribe_audio(args)
+    result = transcribe_audio(args)
+    if args.input_dir:
+        print(json.dumps(result, indent=2))
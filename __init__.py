@@ -1,7 +1,3 @@
-from .openai_wrapper import generate_content
-from .model_manager import get_available_models
-
-
 # Unified OpenAI API CLI Toolkit
 
 __version__ = "1.0.0"
@@ -16,3 +12,24 @@ __all__ = [
     "utils",
     "demo_runner"
 ]
+
+# Submodules and these helpers are imported on first access, so importing the
+# package (e.g. for `python -m OpenAI_API_Wrapper --help`) does not load `openai`.
+_LAZY_ATTRS = {
+    "main": ("entrypoint", "main"),
+    "generate_content": ("openai_wrapper", "generate_content"),
+    "get_available_models": ("model_manager", "get_available_models"),
+}
+
+
+def __getattr__(name):
+    import importlib
+    if name in _LAZY_ATTRS:
+        module_name, attr = _LAZY_ATTRS[name]
+        value = getattr(importlib.import_module(f".{module_name}", __name__), attr)
+    elif name in __all__:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -5,7 +5,7 @@ from .entrypoint import main as cli_main
 if __name__ == "__main__":
     # If called with arguments, go to CLI handler
     if len(sys.argv) > 1:
-        cli_main()
+        cli_main(standalone=True)
     else:
         try:
             from .testing_gui import OpenAITestGUI
@@ -0,0 +1,237 @@
+import os
+import copy
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .model_manager import confirm_model
+from .Whisper_Api_Module import render_transcript, transcribe_file
+
+AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".oga", ".ogg", ".wav", ".webm"}
+OUTPUT_EXTENSIONS = {"json": ".json", "verbose_json": ".json", "text": ".txt", "srt": ".srt", "vtt": ".vtt"}
+MANIFEST_NAME = "transcription_manifest.json"
+DEFAULT_FILE_CONCURRENCY = 4  # requests in flight, shared between files and the segments of long WAVs
+MANIFEST_SAVE_INTERVAL = 2.0  # seconds between manifest writes; a crash redoes at most this much work
+HASH_BLOCK_BYTES = 1024 * 1024
+PROGRESS_EVERY = 50  # files between progress log lines
+
+logger = logging.getLogger(__name__)
+
+
+def discover_audio(input_dir, exclude=None):
+    """Sorted paths (relative, '/'-separated) of the audio files under `input_dir`, skipping `exclude`."""
+    exclude = os.path.abspath(exclude) if exclude else None
+    found = []
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != exclude)
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(dirpath, name), input_dir).replace(os.sep, "/"))
+    return sorted(found)
+
+
+def file_hash(path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class TranscriptionManifest:
+    """
+    Progress of a directory transcription, keyed by audio path and content hash.
+
+    A file counts as done when its entry has the same sha256 and its output
+    still exists; a file whose content changed is transcribed again. Hashes
+    are reused while a file's size and mtime are unchanged, so a restart
+    does not re-read finished recordings. Saved atomically, at most every
+    MANIFEST_SAVE_INTERVAL seconds and on `save(force=True)`.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.files = {}
+        self._by_hash = {}  # sha256 -> relative path of a finished transcript, for duplicates
+        self._in_progress = {}  # sha256 -> Event set when that content is finished
+        self._lock = threading.Lock()
+        self._saved = 0.0
+        self._dirty = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("settings") == settings:
+                self.files = data.get("files", {})
+            else:
+                logger.warning("%s was written with different settings (%s); starting over",
+                               path, data.get("settings"))
+        output_root = os.path.dirname(path)
+        for rel_path, entry in self.files.items():
+            if entry.get("status") == "done" and os.path.exists(os.path.join(output_root, entry["output"])):
+                self._by_hash.setdefault(entry["sha256"], rel_path)
+
+    def known_hash(self, rel_path, stat):
+        entry = self.files.get(rel_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry.get("sha256")
+        return None
+
+    def is_done(self, rel_path, sha256, output_path):
+        entry = self.files.get(rel_path)
+        return bool(entry and entry.get("status") == "done" and entry.get("sha256") == sha256
+                    and os.path.exists(output_path))
+
+    def claim(self, sha256):
+        """
+        None if this caller should transcribe `sha256`, else the relative
+        path of a finished file with the same content. Waits while another
+        worker is transcribing the same content.
+        """
+        while True:
+            with self._lock:
+                done = self._by_hash.get(sha256)
+                if done is not None:
+                    return done
+                event = self._in_progress.get(sha256)
+                if event is None:
+                    self._in_progress[sha256] = threading.Event()
+                    return None
+            event.wait()
+
+    def release(self, sha256, rel_path=None):
+        """End a claim; `rel_path` names the finished transcript (None on failure)."""
+        with self._lock:
+            if rel_path is not None:
+                self._by_hash[sha256] = rel_path
+            event = self._in_progress.pop(sha256, None)
+        if event is not None:
+            event.set()
+
+    def record(self, rel_path, entry):
+        self.files[rel_path] = entry
+        self._dirty = True
+        self.save()
+
+    def save(self, force=False):
+        if not self._dirty or (not force and time.monotonic() - self._saved < MANIFEST_SAVE_INTERVAL):
+            return
+        _write_atomic(self.path, json.dumps({"settings": self.settings, "files": self.files}, indent=1))
+        self._saved = time.monotonic()
+        self._dirty = False
+
+
+def output_path_for(rel_path, input_dir, output_dir, response_format):
+    """Transcript path: next to the audio, or at the same relative path under `output_dir`."""
+    base = os.path.splitext(rel_path)[0] + OUTPUT_EXTENSIONS.get(response_format, ".txt")
+    return os.path.join(output_dir or input_dir, *base.split("/"))
+
+
+def segment_concurrency(concurrency, files):
+    """Segments of one long WAV sent at once, so that all files together stay within `concurrency`."""
+    return max(concurrency // max(min(concurrency, files), 1), 1)
+
+
+def _transcribe_one(args, manifest, rel_path, output_root, segments_in_flight=1):
+    """Worker: returns (rel_path, manifest entry or None when already done, audio bytes sent)."""
+    path = os.path.join(args.input_dir, *rel_path.split("/"))
+    output_path = output_path_for(rel_path, args.input_dir, args.output_dir, args.format)
+    entry = {"output": os.path.relpath(output_path, output_root).replace(os.sep, "/")}
+    start = time.perf_counter()
+    claimed = None
+    try:
+        stat = os.stat(path)
+        sha256 = manifest.known_hash(rel_path, stat) or file_hash(path)
+        if manifest.is_done(rel_path, sha256, output_path):
+            return rel_path, None, 0
+        entry.update(sha256=sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        duplicate_of = manifest.claim(sha256)
+        if duplicate_of is not None:
+            source = output_path_for(duplicate_of, args.input_dir, args.output_dir, args.format)
+            if source != output_path:
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                shutil.copyfile(source, output_path)
+            entry.update(status="done", duplicate_of=duplicate_of, seconds=0.0)
+            return rel_path, entry, 0
+        claimed = sha256
+        file_args = copy.copy(args)
+        file_args.file = path
+        file_args.concurrency = segments_in_flight
+        _write_atomic(output_path, render_transcript(transcribe_file(file_args)))
+    except Exception as e:
+        if claimed:
+            manifest.release(claimed)
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}",
+                     seconds=round(time.perf_counter() - start, 3))
+        return rel_path, entry, entry.get("size", 0) if claimed else 0
+    manifest.release(claimed, rel_path)
+    entry.update(status="done", seconds=round(time.perf_counter() - start, 3))
+    return rel_path, entry, stat.st_size
+
+
+def transcribe_directory(args):
+    """
+    Transcribe every audio file under `args.input_dir` with up to
+    `args.concurrency` requests in flight: one per file, or several
+    segments of a long WAV when there are fewer files than that. Transcripts go next to the audio or
+    into a mirrored tree under `args.output_dir`. Progress is kept in a
+    manifest there, so a rerun skips finished files and copies the
+    transcript of identical content instead of sending it again. Returns
+    a summary with counts, throughput and errors.
+    """
+    if not confirm_model(args.model):
+        logger.error("Model '%s' is not recognized by OpenAI.", args.model)
+        exit(1)
+    output_root = args.output_dir or args.input_dir
+    settings = {"model": args.model, "format": args.format, "language": args.language,
+                "translate": bool(args.translate)}
+    manifest = TranscriptionManifest(os.path.join(output_root, MANIFEST_NAME), settings)
+    files = discover_audio(args.input_dir, exclude=args.output_dir)
+    concurrency = getattr(args, 'concurrency', None) or DEFAULT_FILE_CONCURRENCY
+    summary = {"files": len(files), "transcribed": 0, "skipped": 0, "duplicates": 0, "failed": 0,
+               "audio_bytes": 0, "seconds": 0.0, "files_per_s": 0.0, "mb_per_s": 0.0, "errors": {}}
+    logger.info("Found %s audio files in %s; manifest %s", len(files), args.input_dir, manifest.path)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            per_file = segment_concurrency(concurrency, len(files))
+            futures = [pool.submit(_transcribe_one, args, manifest, rel_path, output_root, per_file)
+                       for rel_path in files]
+            for finished, future in enumerate(as_completed(futures), 1):
+                rel_path, entry, sent = future.result()
+                summary["audio_bytes"] += sent
+                if entry is None:
+                    summary["skipped"] += 1
+                elif entry["status"] == "failed":
+                    summary["failed"] += 1
+                    summary["errors"][rel_path] = entry["error"]
+                    logger.warning("Failed to transcribe %s: %s", rel_path, entry["error"])
+                else:
+                    summary["duplicates" if "duplicate_of" in entry else "transcribed"] += 1
+                if entry is not None:
+                    manifest.record(rel_path, entry)
+                if finished % PROGRESS_EVERY == 0:
+                    logger.info("%s/%s files done (%.1f files/s)", finished, len(files),
+                                finished / (time.perf_counter() - start))
+    finally:
+        manifest.save(force=True)
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = round(elapsed, 2)
+    summary["files_per_s"] = round((summary["transcribed"] + summary["duplicates"]) / elapsed, 2) if elapsed else 0.0
+    summary["mb_per_s"] = round(summary["audio_bytes"] / 1e6 / elapsed, 2) if elapsed else 0.0
+    logger.info("Transcribed %s, skipped %s finished, copied %s duplicates, %s failed in %.1fs "
+                "(%.2f files/s, %.2f MB/s)", summary["transcribed"], summary["skipped"], summary["duplicates"],
+                summary["failed"], elapsed, summary["files_per_s"], summary["mb_per_s"])
+    return summary
@@ -0,0 +1,204 @@
+import io
+import os
+import wave
+import array
+import sys
+
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024  # API limit per audio upload
+UPLOAD_HEADROOM = 0.95  # fraction of the limit a segment may use
+DEFAULT_SEGMENT_SECONDS = 600
+DEFAULT_OVERLAP_SECONDS = 2.0
+SILENCE_SEARCH_SECONDS = 10.0  # how far before a fixed cut to look for a quieter spot
+SILENCE_BLOCK_SECONDS = 0.05
+
+
+def is_wav(path):
+    try:
+        with wave.open(path, 'rb'):
+            return True
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def wav_info(path):
+    """Return (frame_rate, channels, sample_width, n_frames) of a WAV file."""
+    with wave.open(path, 'rb') as w:
+        return w.getframerate(), w.getnchannels(), w.getsampwidth(), w.getnframes()
+
+
+def needs_chunking(path, segment_seconds=DEFAULT_SEGMENT_SECONDS):
+    """Whether a WAV file is too large for one upload or longer than one segment."""
+    if not is_wav(path):
+        return False
+    rate, _, _, n_frames = wav_info(path)
+    return os.path.getsize(path) > MAX_UPLOAD_BYTES * UPLOAD_HEADROOM or n_frames / rate > segment_seconds
+
+
+def _block_energies(w, start, n_frames, block):
+    """Mean absolute amplitude of each `block`-frame block of 16-bit audio from `start`."""
+    w.setpos(start)
+    samples = array.array('h', w.readframes(n_frames))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    step = block * w.getnchannels()
+    return [sum(map(abs, samples[i:i + step])) / max(len(samples[i:i + step]), 1)
+            for i in range(0, len(samples), step)]
+
+
+def _quietest_frame(w, start, end):
+    """Frame in [start, end) at the centre of the quietest block; `end` for non-16-bit audio."""
+    if w.getsampwidth() != 2 or end <= start:
+        return end
+    block = max(int(w.getframerate() * SILENCE_BLOCK_SECONDS), 1)
+    energies = _block_energies(w, start, end - start, block)
+    # Prefer the latest of equally quiet blocks so segments stay close to full length.
+    quietest = min(range(len(energies)), key=lambda i: (energies[i], -i))
+    return min(start + quietest * block + block // 2, end)
+
+
+def plan_segments(path, segment_seconds=DEFAULT_SEGMENT_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS):
+    """
+    Split a WAV file into segments for separate uploads.
+
+    Cut points are placed at the quietest spot in the SILENCE_SEARCH_SECONDS
+    before each `segment_seconds` mark (16-bit PCM; other widths use fixed
+    windows). Each segment extends `overlap_seconds` past its cut points so
+    words on a boundary are heard whole by at least one request.
+
+    Returns a list of dicts with `start_frame`/`n_frames` (audio to send) and
+    `own_start`/`own_end` (seconds of the timeline this segment is responsible
+    for when stitching).
+    """
+    with wave.open(path, 'rb') as w:
+        rate, channels, width, total = w.getframerate(), w.getnchannels(), w.getsampwidth(), w.getnframes()
+        overlap = int(overlap_seconds * rate)
+        max_frames = int(MAX_UPLOAD_BYTES * UPLOAD_HEADROOM / (channels * width)) - 2 * overlap
+        length = min(int(segment_seconds * rate), max_frames)
+        if length <= 0:
+            raise ValueError("segment_seconds must be positive and larger than twice the overlap")
+        search = min(int(SILENCE_SEARCH_SECONDS * rate), length // 2)
+
+        cuts = [0]
+        while total - cuts[-1] > length:
+            target = cuts[-1] + length
+            cuts.append(_quietest_frame(w, target - search, target))
+        cuts.append(total)
+
+    segments = []
+    for own_start, own_end in zip(cuts, cuts[1:]):
+        start = max(own_start - overlap, 0)
+        end = min(own_end + overlap, total)
+        segments.append({
+            "index": len(segments),
+            "start_frame": start,
+            "n_frames": end - start,
+            "offset": start / rate,
+            "own_start": own_start / rate,
+            "own_end": own_end / rate,
+        })
+    return segments
+
+
+def read_segment(path, segment):
+    """The audio of one planned segment as an in-memory WAV file ready for upload."""
+    with wave.open(path, 'rb') as src:
+        src.setpos(segment["start_frame"])
+        frames = src.readframes(segment["n_frames"])
+        params = src.getparams()
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as dst:
+        dst.setparams(params)
+        dst.writeframes(frames)
+    buffer.seek(0)
+    buffer.name = f"{os.path.splitext(os.path.basename(path))[0]}.part{segment['index']:04d}.wav"
+    return buffer
+
+
+def _as_dict(transcript):
+    if hasattr(transcript, "model_dump"):
+        return transcript.model_dump()
+    return transcript if isinstance(transcript, dict) else {"text": str(transcript)}
+
+
+def _same_text(a, b):
+    return " ".join(a.lower().split()) == " ".join(b.lower().split())
+
+
+def stitch_verbose(segments, transcripts):
+    """
+    Merge per-segment `verbose_json` transcripts into one, shifting timestamps
+    by each segment's offset. A transcribed segment is kept only by the audio
+    segment that owns its midpoint, and a repeat of the previous segment's
+    text right after a boundary is dropped.
+    """
+    merged, words, language, task = [], [], None, None
+    for segment, transcript in zip(segments, transcripts):
+        data = _as_dict(transcript)
+        language = language or data.get("language")
+        task = task or data.get("task")
+        offset = segment["offset"]
+        last = segment is segments[-1]
+        for item in data.get("segments") or ():
+            start, end = item["start"] + offset, item["end"] + offset
+            midpoint = (start + end) / 2
+            if midpoint < segment["own_start"] or (midpoint >= segment["own_end"] and not last):
+                continue
+            if merged and _same_text(merged[-1]["text"], item["text"]) and start < merged[-1]["end"] + 1:
+                continue
+            merged.append({**item, "id": len(merged), "start": start, "end": end})
+        for word in data.get("words") or ():
+            start = word["start"] + offset
+            if segment["own_start"] <= start < segment["own_end"] or (last and start >= segment["own_start"]):
+                words.append({**word, "start": start, "end": word["end"] + offset})
+
+    result = {
+        "task": task or "transcribe",
+        "language": language,
+        "duration": segments[-1]["own_end"] if segments else 0.0,
+        "text": " ".join(item["text"].strip() for item in merged),
+        "segments": merged,
+    }
+    if words:
+        result["words"] = words
+    return result
+
+
+def join_texts(transcripts):
+    """Concatenate plain `json`/`text` transcripts (no timestamps to deduplicate by)."""
+    return " ".join(_as_dict(t).get("text", "").strip() for t in transcripts).strip()
+
+
+def _timestamp(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def to_srt(merged):
+    blocks = []
+    for number, item in enumerate(merged["segments"], 1):
+        blocks.append(f"{number}\n{_timestamp(item['start'], ',')} --> {_timestamp(item['end'], ',')}\n"
+                      f"{item['text'].strip()}\n")
+    return "\n".join(blocks)
+
+
+def to_vtt(merged):
+    blocks = ["WEBVTT\n"]
+    for item in merged["segments"]:
+        blocks.append(f"{_timestamp(item['start'], '.')} --> {_timestamp(item['end'], '.')}\n{item['text'].strip()}\n")
+    return "\n".join(blocks)
+
+
+def render(merged, response_format):
+    """Render a stitched verbose transcript in the format the caller asked for."""
+    if response_format == "srt":
+        return to_srt(merged)
+    if response_format == "vtt":
+        return to_vtt(merged)
+    if response_format == "text":
+        return merged["text"]
+    if response_format == "json":
+        return {"text": merged["text"]}
+    return merged
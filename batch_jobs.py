@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+from .client_pool import get_client
+from .openai_wrapper import call_openai_method
+from .utils import build_json_response
+
+BATCH_ENDPOINTS = {
+    "chat": "/v1/chat/completions",
+    "embeddings": "/v1/embeddings",
+}
+COMPLETION_WINDOW = "24h"
+MAX_BATCH_REQUESTS = 50_000
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+POLL_INITIAL_DELAY = 5.0
+POLL_MAX_DELAY = 300.0
+POLL_BACKOFF = 1.5
+
+logger = logging.getLogger(__name__)
+
+
+def read_requests(path, endpoint="chat", model=None):
+    """
+    Yield (custom_id, body) for every non-blank line of a JSONL request file.
+
+    Each line is an object with an optional `id` (default: line number) and
+    either a full request `body`, or a `prompt` (chat) / `input` or `text`
+    (embeddings) plus an optional `model` overriding `model`.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = str(item.get('id', line_no))
+            if 'body' in item:
+                body = dict(item['body'])
+                body.setdefault('model', model)
+            elif endpoint == "chat" and 'prompt' in item:
+                body = {"model": item.get('model') or model,
+                        "messages": [{"role": "user", "content": item['prompt']}]}
+            elif endpoint == "embeddings" and ('input' in item or 'text' in item):
+                body = {"model": item.get('model') or model, "input": item.get('input', item.get('text'))}
+            else:
+                raise ValueError(f"{path}:{line_no}: expected a 'body' or the {endpoint} request fields")
+            if not body.get('model'):
+                raise ValueError(f"{path}:{line_no}: no model given (set one per line or pass --model)")
+            yield custom_id, body
+
+
+def write_batch_file(requests, path, endpoint="chat"):
+    """Write (custom_id, body) pairs in the Batch API's JSONL input format; returns the count."""
+    url = BATCH_ENDPOINTS[endpoint]
+    seen = set()
+    with open(path, 'w', encoding='utf-8') as f:
+        for custom_id, body in requests:
+            if custom_id in seen:
+                raise ValueError(f"Duplicate request id {custom_id!r}")
+            seen.add(custom_id)
+            f.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": url, "body": body},
+                               ensure_ascii=False) + "\n")
+    if len(seen) > MAX_BATCH_REQUESTS:
+        raise ValueError(f"{len(seen)} requests exceed the {MAX_BATCH_REQUESTS}-request batch limit")
+    return len(seen)
+
+
+def _create_batch(batch_file, endpoint, api_key=None, metadata=None):
+    with open(batch_file, 'rb') as f:
+        uploaded = call_openai_method("files.create", file=f, purpose="batch", api_key=api_key)
+    kwargs = {"metadata": metadata} if metadata else {}
+    batch = call_openai_method(
+        "batches.create",
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINTS[endpoint],
+        completion_window=COMPLETION_WINDOW,
+        api_key=api_key,
+        **kwargs
+    )
+    logger.info("Submitted batch %s (input file %s)", batch.id, uploaded.id)
+    return batch
+
+
+def submit_batch(requests, endpoint="chat", api_key=None, metadata=None):
+    """
+    Upload `requests` ((custom_id, body) pairs, e.g. from `read_requests`)
+    as a batch input file and create the batch. Returns the Batch object.
+    """
+    fd, batch_file = tempfile.mkstemp(suffix=".jsonl", prefix="batch_")
+    os.close(fd)
+    try:
+        count = write_batch_file(requests, batch_file, endpoint)
+        if not count:
+            raise ValueError("No requests to submit")
+        logger.info("Uploading %s %s requests", count, endpoint)
+        return _create_batch(batch_file, endpoint, api_key, metadata)
+    finally:
+        os.remove(batch_file)
+
+
+def _endpoint_name(url):
+    return next((name for name, endpoint_url in BATCH_ENDPOINTS.items() if endpoint_url == url), "chat")
+
+
+def batch_status(batch_id, api_key=None):
+    """The current state of a batch as a plain dict."""
+    batch = call_openai_method("batches.retrieve", batch_id, api_key=api_key)
+    counts = batch.request_counts
+    return {
+        "id": batch.id,
+        "status": batch.status,
+        "endpoint": batch.endpoint,
+        "completed": counts.completed if counts else 0,
+        "failed": counts.failed if counts else 0,
+        "total": counts.total if counts else 0,
+        "input_file_id": batch.input_file_id,
+        "output_file_id": batch.output_file_id,
+        "error_file_id": batch.error_file_id,
+    }
+
+
+def wait_for_batch(batch_id, api_key=None, timeout=None, initial_delay=POLL_INITIAL_DELAY,
+                   max_delay=POLL_MAX_DELAY):
+    """
+    Poll until the batch reaches a terminal status, backing off from
+    `initial_delay` to `max_delay` seconds between polls. Returns the final
+    status dict; raises TimeoutError after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    delay = initial_delay
+    while True:
+        status = batch_status(batch_id, api_key)
+        if status["status"] in TERMINAL_STATUSES:
+            return status
+        logger.info("Batch %s %s: %s/%s done, %s failed", batch_id, status["status"],
+                    status["completed"], status["total"], status["failed"])
+        if deadline is not None and time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Batch {batch_id} still {status['status']} after {timeout}s")
+        time.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, max_delay)
+
+
+def iter_file_lines(file_id, api_key=None):
+    """Stream a file's content as decoded JSON lines without loading it whole."""
+    with get_client(api_key=api_key).files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def _result_record(line, endpoint):
+    """Map one Batch API output or error line to a bulk-style result record."""
+    response = line.get('response') or {}
+    body = response.get('body') or {}
+    status_code = response.get('status_code')
+    content = None
+    error = line.get('error') or body.get('error')
+    if status_code == 200 and not error:
+        if endpoint == "embeddings":
+            content = [item.get('embedding') for item in body.get('data', [])]
+        else:
+            content = body['choices'][0]['message']['content'] if body.get('choices') else None
+    record = build_json_response(content, body.get('model'), "batch", id=line.get('custom_id'),
+                                 status_code=status_code, usage=body.get('usage'))
+    if error or status_code != 200:
+        record["error"] = error or f"HTTP {status_code}"
+    return record
+
+
+def iter_results(batch_id, api_key=None):
+    """
+    Yield a result record per request of a finished batch, streamed from its
+    output file and then its error file. Records carry the request's `id`
+    (its custom_id), since the API does not preserve input order.
+    """
+    status = batch_status(batch_id, api_key)
+    endpoint = _endpoint_name(status["endpoint"])
+    for file_id in (status["output_file_id"], status["error_file_id"]):
+        if file_id:
+            for line in iter_file_lines(file_id, api_key):
+                yield _result_record(line, endpoint)
+
+
+def fetch_results(batch_id, output_path=None, api_key=None):
+    """
+    Write the batch's result records as JSONL to `output_path` (stdout when
+    None or '-'). Returns a summary with the ids of failed requests.
+    """
+    summary = {"total": 0, "failed": 0, "failed_ids": []}
+    out = sys.stdout if output_path in (None, '-') else open(output_path, 'w', encoding='utf-8')
+    try:
+        for record in iter_results(batch_id, api_key):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            summary["total"] += 1
+            if "error" in record:
+                summary["failed"] += 1
+                summary["failed_ids"].append(record["id"])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logger.info("Fetched %s results of batch %s, %s failed", summary["total"], batch_id, summary["failed"])
+    return summary
+
+
+def resubmit_failed(batch_id, api_key=None, failed_ids=None):
+    """
+    Submit a new batch containing only the requests of `batch_id` that
+    failed (or `failed_ids`), taken from its original input file. Returns
+    the new Batch object, or None when nothing failed.
+    """
+    status = batch_status(batch_id, api_key)
+    if failed_ids is None:
+        failed_ids = [record["id"] for record in iter_results(batch_id, api_key) if "error" in record]
+    failed_ids = set(failed_ids)
+    if not failed_ids:
+        logger.info("Batch %s has no failed requests", batch_id)
+        return None
+    endpoint = _endpoint_name(status["endpoint"])
+    requests = ((line["custom_id"], line["body"]) for line in iter_file_lines(status["input_file_id"], api_key)
+                if line["custom_id"] in failed_ids)
+    logger.info("Resubmitting %s failed requests of batch %s", len(failed_ids), batch_id)
+    return submit_batch(requests, endpoint, api_key, metadata={"resubmit_of": batch_id})
@@ -0,0 +1,257 @@
+"""
+Offline throughput benchmark against the local mock OpenAI server.
+
+Drives `call_openai_method`, `use_chat_api` (plain and streamed),
+`generate_dalle_image`, `transcribe_audio` and `embed_texts` from a thread pool and reports
+requests/sec, p50/p95/p99 latency, errors and memory per scenario. Results
+can be saved as a baseline and later runs compared against it.
+
+    python benchmark.py                                 # report
+    python benchmark.py --save_baseline bench.json      # record a baseline
+    python benchmark.py --baseline bench.json           # fail on regressions
+    python benchmark.py --replay openai_journal.jsonl.gz --speed 10   # replay recorded traffic
+    python test_launcher.py --benchmark                 # quick run with the tests
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import pathlib
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+ROOT = pathlib.Path(__file__).resolve().parent
+PACKAGE = ROOT.name
+sys.path.insert(0, str(ROOT.parent))
+
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TOLERANCE = 0.25  # allowed relative drop in req/s or growth in p95 against the baseline
+LATENCY_SLACK_MS = 2.0  # absolute p95 growth ignored, since sub-millisecond timings are noisy
+MEMORY_SAMPLE_OPS = 20  # operations run under tracemalloc to measure heap use per scenario
+
+
+def _module(name):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def _call_openai_method(workdir):
+    call_openai_method = _module("openai_wrapper").call_openai_method
+    return lambda i: call_openai_method(
+        "chat.completions.create", model="gpt-4o-mini",
+        messages=[{"role": "user", "content": f"Benchmark prompt {i}"}])
+
+
+def _use_chat_api(workdir, stream=False):
+    use_chat_api = _module("Gpt_Api_Module").use_chat_api
+    return lambda i: use_chat_api(f"Benchmark prompt {i}", "gpt-4o-mini", stream)
+
+
+def _generate_dalle_image(workdir):
+    generate_dalle_image = _module("Dalle_Api_Module").generate_dalle_image
+    args = SimpleNamespace(model="dall-e-2", prompt="Benchmark image", size="256x256", n=1, quality="standard",
+                           style=None, api_key=None, output_dir=os.path.join(workdir, "images"),
+                           response_format="url", download=True, concurrency=1, jobs=None)
+    return lambda i: generate_dalle_image(args)
+
+
+def _transcribe_audio(workdir):
+    transcribe_audio = _module("Whisper_Api_Module").transcribe_audio
+    audio = os.path.join(workdir, "bench.wav")
+    with wave.open(audio, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\x00\x00" * 16000)
+    args = SimpleNamespace(model="whisper-1", file=audio, translate=False, language=None, format="json",
+                           api_key=None, output_file=os.path.join(workdir, "transcript.json"))
+    return lambda i: transcribe_audio(args)
+
+
+def _embed_texts(workdir):
+    embed_texts = _module("embeddings").embed_texts
+    texts = [f"Benchmark text {n}" for n in range(64)]
+    return lambda i: embed_texts(texts, "text-embedding-3-small", concurrency=1)
+
+
+SCENARIOS = {
+    "call_openai_method": _call_openai_method,
+    "use_chat_api": _use_chat_api,
+    "use_chat_api_stream": lambda workdir: _use_chat_api(workdir, stream=True),
+    "generate_dalle_image": _generate_dalle_image,
+    "transcribe_audio": _transcribe_audio,
+    "embed_texts": _embed_texts,
+}
+
+
+def percentiles(samples):
+    """p50/p95/p99 in milliseconds of latencies given in seconds."""
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000}
+
+
+def _timed(operation, i):
+    start = time.perf_counter()
+    try:
+        operation(i)
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, type(e).__name__
+
+
+def run_scenario(operation, requests, concurrency):
+    """Run `operation(i)` for i in range(requests) on `concurrency` threads and summarize."""
+    operation(-1)  # warm-up: client pool, imports, model registry
+    tracemalloc.start()
+    for i in range(min(MEMORY_SAMPLE_OPS, requests)):
+        operation(i)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: _timed(operation, i), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for seconds, error in results if error is None]
+    errors = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        **percentiles(latencies),
+        "errors": errors,
+        "heap_peak_kb": heap_peak / 1024,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+@contextlib.contextmanager
+def mock_environment(server, workdir):
+    """Point the wrapper at the mock server with fast retries and a throwaway model registry."""
+    retry_policy = _module("retry_policy")
+    model_manager = _module("model_manager")
+    saved_env = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    saved_policy = retry_policy.get_retry_policy()
+    saved_registry = model_manager.registry
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ["OPENAI_API_KEY"] = "sk-mock"
+    retry_policy.set_retry_policy(retry_policy.RetryPolicy(max_retries=5, base_delay=0.01, max_delay=0.1))
+    model_manager.registry = model_manager.ModelRegistry(config_file=os.path.join(workdir, "model_config.json"))
+    try:
+        yield
+    finally:
+        model_manager.registry = saved_registry
+        retry_policy.set_retry_policy(saved_policy)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_benchmarks(scenarios=None, requests=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY, **server_settings):
+    """Run the selected scenarios against a fresh mock server; returns {scenario: results}."""
+    MockOpenAIServer = _module("mock_openai_server").MockOpenAIServer
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, MockOpenAIServer(**server_settings) as server, \
+            mock_environment(server, workdir):
+        for name in scenarios or SCENARIOS:
+            results[name] = run_scenario(SCENARIOS[name](workdir), requests, concurrency)
+    return results
+
+
+def run_replay(path, speed=1.0, concurrency=DEFAULT_CONCURRENCY, **server_settings):
+    """Replay a `journal` file against a fresh mock server at `speed` times its original pace."""
+    MockOpenAIServer = _module("mock_openai_server").MockOpenAIServer
+    with tempfile.TemporaryDirectory() as workdir, MockOpenAIServer(**server_settings) as server, \
+            mock_environment(server, workdir):
+        return _module("journal").replay(path, speed=speed, concurrency=concurrency)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return a list of regression messages for scenarios present in both runs."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']:.1f} req/s vs baseline {previous['rps']:.1f}")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance) + LATENCY_SLACK_MS:
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms vs baseline {previous['p95_ms']:.1f} ms")
+        if sum(current["errors"].values()) > sum(previous["errors"].values()):
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {previous['errors']}")
+    return regressions
+
+
+def format_results(results, baseline=None):
+    lines = [f"{'scenario':<22} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'heap KB':>9}  errors"]
+    for name, r in results.items():
+        line = (f"{name:<22} {r['rps']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+                f"{r['heap_peak_kb']:9.0f}  {sum(r['errors'].values())}")
+        previous = (baseline or {}).get(name)
+        if previous and previous["rps"]:
+            line += f"  ({(r['rps'] / previous['rps'] - 1) * 100:+.0f}% req/s)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the wrapper against a local mock OpenAI server")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Worker threads")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency per request (s)")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--baseline", help="Compare against a saved baseline JSON and fail on regressions")
+    parser.add_argument("--save_baseline", help="Write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative regression")
+    parser.add_argument("--replay", help="Replay a request journal (see journal.py) instead of the scenarios")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay pace: 1 = original, 10 = ten times "
+                                                                  "faster, 0 = as fast as possible")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        stats = run_replay(args.replay, args.speed, args.concurrency, latency=args.latency,
+                           error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=0)
+        print(json.dumps(stats, indent=2))
+        return 1 if stats["errors"] else 0
+
+    results = run_benchmarks(args.scenarios, args.requests, args.concurrency, latency=args.latency,
+                             error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=0)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import sys
+import json
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from .openai_wrapper import call_openai_method
+from .utils import build_json_response
+
+DEFAULT_CONCURRENCY = 8
+WINDOW_FACTOR = 4  # completed results buffered per worker while the head is pending
+
+logger = logging.getLogger(__name__)
+
+
+def read_prompts(path):
+    """
+    Yield (id, prompt, model, error) for every non-blank line of a JSONL file.
+
+    Each line is an object with a `prompt` and optional `id` and `model`
+    fields; the id defaults to the 1-based line number. A malformed line
+    yields its line number and an `error` message instead of a prompt, so
+    one bad line does not stop the rest of the file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, None, f"{path}:{line_no}: invalid JSON: {e}"
+                continue
+            if not isinstance(item, dict) or 'prompt' not in item:
+                yield line_no, None, None, f"{path}:{line_no}: expected an object with a 'prompt' field"
+                continue
+            yield item.get('id', line_no), item['prompt'], item.get('model'), None
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+def run_prompt(item_id, prompt, model, api_key=None):
+    """Send one prompt and return its output record (errors are recorded, not raised)."""
+    start = time.perf_counter()
+    try:
+        response = call_openai_method(
+            "chat.completions.create",
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            api_key=api_key
+        )
+        content = response.choices[0].message.content if response else None
+        usage = _usage_dict(getattr(response, 'usage', None))
+        error = None if response else "skipped"
+    except Exception as e:
+        content, usage, error = None, None, f"{type(e).__name__}: {e}"
+    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    record = build_json_response(content, model, "gpt", id=item_id, usage=usage, latency_ms=latency_ms)
+    if error:
+        record["error"] = error
+    return record
+
+
+def run_bulk(input_path, output_path, model, concurrency=None, api_key=None):
+    """
+    Stream prompts from `input_path` through the chat API and write JSONL results.
+
+    Up to `concurrency` (default DEFAULT_CONCURRENCY) requests run in parallel.
+    Results are written in input order as soon as they are ready, and at most
+    `concurrency * WINDOW_FACTOR` prompts are held in memory at once regardless
+    of file size. Malformed lines get an error record in their place.
+    Returns a summary dict with counts and wall time.
+    """
+    if concurrency is None:
+        concurrency = DEFAULT_CONCURRENCY
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    window = concurrency * WINDOW_FACTOR
+    summary = {"total": 0, "failed": 0}
+    start = time.perf_counter()
+
+    out = sys.stdout if output_path in (None, '-') else open(output_path, 'w', encoding='utf-8')
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = deque()
+
+            def flush_head():
+                record = pending.popleft().result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                summary["total"] += 1
+                if "error" in record:
+                    summary["failed"] += 1
+
+            for item_id, prompt, item_model, error in read_prompts(input_path):
+                if error:
+                    logger.warning("Skipping %s", error)
+                    pending.append(Future())
+                    pending[-1].set_result(build_json_response(None, model, "gpt", id=item_id, usage=None,
+                                                               latency_ms=0.0, error=error))
+                else:
+                    pending.append(pool.submit(run_prompt, item_id, prompt, item_model or model, api_key))
+                if len(pending) >= window:
+                    flush_head()
+            while pending:
+                flush_head()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary["duration_s"] = round(time.perf_counter() - start, 2)
+    logger.info("Bulk run finished: %s prompts, %s failed, %.2fs",
+                summary["total"], summary["failed"], summary["duration_s"])
+    return summary
@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+from .chat_stream import ChatStream
+from .openai_wrapper import call_openai_method
+from .token_estimator import context_window, estimate_message_tokens
+
+DEFAULT_SESSION_PATH = "chat_session.json"
+DEFAULT_OUTPUT_RESERVE = 4_096  # tokens kept free for the reply
+# When the history overflows its budget it is cut back to this fraction, so the
+# prefix then stays unchanged (and cacheable) for several turns instead of
+# shifting by one message every turn.
+TRIM_TARGET = 0.6
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own later reference. Keep facts, decisions, names, "
+    "numbers and open questions; drop pleasantries. Reply with the summary only.\n\n{conversation}"
+)
+SESSION_COMMANDS = "/exit  /reset  /save  /usage"
+
+logger = logging.getLogger(__name__)
+
+
+def _cached_tokens(usage):
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+class ChatSession:
+    """
+    A multi-turn chat with a managed history.
+
+        session = ChatSession("gpt-4o-mini", system_prompt="You are terse.", path="chat.json")
+        session.send("Hi")
+        session.send("And again", on_delta=print)
+        session.last_turn   # prompt/cached/completion tokens and seconds of the last turn
+
+    Requests are laid out so the server-side prompt cache can hit: the system
+    prompt (and summary, if any) come first and never change between turns,
+    history is only ever appended to, and the session id is sent as
+    `prompt_cache_key`. When the history exceeds `max_history_tokens` (default:
+    the model's context window minus `reserve_tokens`), the oldest turns are
+    dropped in one cut down to TRIM_TARGET of the budget, or folded into the
+    summary with `summarize=True`. With `path`, the session is saved after
+    every turn and can be resumed with `ChatSession.load`.
+    """
+
+    def __init__(self, model, system_prompt=None, api_key=None, max_history_tokens=None,
+                 reserve_tokens=DEFAULT_OUTPUT_RESERVE, summarize=False, path=None, session_id=None,
+                 prompt_cache_key=True, **request_kwargs):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.api_key = api_key
+        self.max_history_tokens = max_history_tokens
+        self.reserve_tokens = reserve_tokens
+        self.summarize = summarize
+        self.path = path
+        self.session_id = session_id or uuid.uuid4().hex
+        self.prompt_cache_key = prompt_cache_key
+        self.request_kwargs = request_kwargs
+        self.summary = None
+        self.history = []
+        self.last_turn = None
+        self.totals = {"turns": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    # -- history -------------------------------------------------------------
+    def _prefix(self, summary=None):
+        summary = summary or self.summary
+        prefix = []
+        if self.system_prompt:
+            prefix.append({"role": "system", "content": self.system_prompt})
+        if summary:
+            prefix.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+        return prefix
+
+    def messages(self):
+        """The exact message list the next request sends."""
+        return self._prefix() + [dict(message) for message in self.history]
+
+    @property
+    def history_budget(self):
+        window_budget = context_window(self.model) - self.reserve_tokens
+        return min(self.max_history_tokens, window_budget) if self.max_history_tokens else window_budget
+
+    def _trim(self):
+        """Drop (or summarize) the oldest turns when the request would exceed the budget."""
+        budget = self.history_budget
+        if estimate_message_tokens(self.messages(), self.model) <= budget:
+            return 0
+        target = budget * TRIM_TARGET
+        cut = 0
+        # Always keep the newest message, and cut only before a user message.
+        while cut < len(self.history) - 1:
+            cut += 1
+            while cut < len(self.history) - 1 and self.history[cut]["role"] != "user":
+                cut += 1
+            if estimate_message_tokens(self._prefix() + self.history[cut:], self.model) <= target:
+                break
+        dropped, kept = self.history[:cut], self.history[cut:]
+        # Nothing changes until the summary is in and the result fits.
+        summary = self._summarize(dropped) if self.summarize and dropped else self.summary
+        if estimate_message_tokens(self._prefix(summary) + kept, self.model) > budget:
+            raise ValueError(f"The latest message alone exceeds the {budget}-token history budget")
+        self.history, self.summary = kept, summary
+        logger.info("Trimmed %s old messages from session %s", len(dropped), self.session_id)
+        return len(dropped)
+
+    def _summarize(self, dropped):
+        parts = [self.summary] if self.summary else []
+        parts += [f"{message['role']}: {message['content']}" for message in dropped]
+        response = call_openai_method(
+            "chat.completions.create",
+            model=self.model,
+            messages=[{"role": "user", "content": SUMMARY_PROMPT.format(conversation="\n\n".join(parts))}],
+            api_key=self.api_key
+        )
+        return response.choices[0].message.content
+
+    def reset(self):
+        """Forget the conversation (the system prompt stays)."""
+        self.history = []
+        self.summary = None
+        self._autosave()
+
+    # -- turns ---------------------------------------------------------------
+    def _request_kwargs(self):
+        kwargs = dict(self.request_kwargs)
+        if self.prompt_cache_key:
+            kwargs.setdefault("prompt_cache_key", self.session_id)
+        return kwargs
+
+    def send(self, content, stream=False, on_delta=None):
+        """Send a user message and return the reply; `on_delta` (implies stream) gets the deltas."""
+        history, summary = list(self.history), self.summary
+        self.history.append({"role": "user", "content": content})
+        try:
+            trimmed = self._trim()
+            start = time.perf_counter()
+            if stream or on_delta:
+                chat = ChatStream(model=self.model, messages=self.messages(), api_key=self.api_key,
+                                  **self._request_kwargs())
+                for delta in chat:
+                    if on_delta:
+                        on_delta(delta)
+                reply, usage = chat.text, chat.usage
+            else:
+                response = call_openai_method("chat.completions.create", model=self.model,
+                                              messages=self.messages(), api_key=self.api_key,
+                                              **self._request_kwargs())
+                reply, usage = response.choices[0].message.content, getattr(response, "usage", None)
+        except BaseException:
+            # The turn never happened: restore the history (and summary) from before any trim.
+            self.history, self.summary = history, summary
+            raise
+        self.history.append({"role": "assistant", "content": reply or ""})
+        self._record_turn(usage, time.perf_counter() - start, trimmed)
+        self._autosave()
+        return reply
+
+    def _record_turn(self, usage, seconds, trimmed):
+        self.last_turn = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "cached_tokens": _cached_tokens(usage),
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "seconds": round(seconds, 3),
+            "trimmed_messages": trimmed,
+        }
+        self.totals["turns"] += 1
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+            self.totals[key] += self.last_turn[key]
+        logger.info("Turn %s: %s prompt tokens (%s cached), %s completion tokens, %.2fs",
+                    self.totals["turns"], self.last_turn["prompt_tokens"], self.last_turn["cached_tokens"],
+                    self.last_turn["completion_tokens"], seconds)
+
+    # -- persistence ---------------------------------------------------------
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "model": self.model,
+            "system_prompt": self.system_prompt,
+            "summary": self.summary,
+            "history": self.history,
+            "max_history_tokens": self.max_history_tokens,
+            "reserve_tokens": self.reserve_tokens,
+            "summarize": self.summarize,
+            "request_kwargs": self.request_kwargs,
+            "totals": self.totals,
+        }
+
+    def save(self, path=None):
+        """Write the session as JSON (atomically) to `path` or the session's own path."""
+        path = path or self.path
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    def _autosave(self):
+        if self.path:
+            self.save()
+
+    @classmethod
+    def load(cls, path, api_key=None, **overrides):
+        """Resume a saved session; `overrides` replace saved settings (e.g. model)."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        settings = {key: data.get(key) for key in ("model", "system_prompt", "max_history_tokens", "summarize",
+                                                   "session_id")}
+        settings["reserve_tokens"] = data.get("reserve_tokens") or DEFAULT_OUTPUT_RESERVE
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        session = cls(api_key=api_key, path=path, **settings, **(data.get("request_kwargs") or {}))
+        session.summary = data.get("summary")
+        session.history = data.get("history") or []
+        session.totals.update(data.get("totals") or {})
+        return session
+
+
+def open_session(path, model, api_key=None, **settings):
+    """Resume the session saved at `path`, or start a new one that saves there."""
+    if path and os.path.exists(path):
+        return ChatSession.load(path, api_key=api_key, model=model, **settings)
+    settings = {key: value for key, value in settings.items() if value is not None}
+    return ChatSession(model, api_key=api_key, path=path, **settings)
+
+
+def run_interactive(args, read=input, out=sys.stdout):
+    """The `gpt --session` loop: read a line, stream the reply, until /exit or EOF."""
+    session = open_session(args.session, args.model, args.api_key, system_prompt=args.system,
+                           max_history_tokens=args.history_tokens, summarize=args.summarize or None)
+    out.write(f"Session {session.session_id} ({len(session.history)} messages). Commands: {SESSION_COMMANDS}\n")
+    pending = args.prompt
+    while True:
+        if pending is None:
+            try:
+                pending = read("> ")
+            except EOFError:
+                break
+        line, pending = pending.strip(), None
+        if not line:
+            continue
+        if line == "/exit":
+            break
+        if line == "/reset":
+            session.reset()
+            out.write("History cleared.\n")
+            continue
+        if line == "/save":
+            out.write(f"Saved to {session.save()}\n")
+            continue
+        if line == "/usage":
+            out.write(json.dumps(session.totals) + "\n")
+            continue
+
+        def write_delta(delta):
+            out.write(delta)
+            out.flush()
+
+        try:
+            session.send(line, on_delta=write_delta)
+        except Exception as e:
+            # `send` has rolled the history back, so the conversation can go on.
+            out.write(f"\n[Error: {type(e).__name__}: {e}]\n")
+            continue
+        turn = session.last_turn
+        out.write(f"\n[{turn['prompt_tokens']} prompt tokens, {turn['cached_tokens']} cached, "
+                  f"{turn['completion_tokens']} completion, {turn['seconds']:.2f}s]\n")
+    return session
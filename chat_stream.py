@@ -0,0 +1,172 @@
+import time
+import logging
+import statistics
+from .openai_wrapper import call_openai_method, acall_openai_method
+
+logger = logging.getLogger(__name__)
+
+
+class StreamMetrics:
+    """Timing of a streamed response, measured from the moment the request is sent."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self._last_token_at = None
+        self.inter_token_latencies = []
+
+    def token(self):
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        else:
+            self.inter_token_latencies.append(now - self._last_token_at)
+        self._last_token_at = now
+        self.chunks += 1
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def total_duration(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started
+
+    def as_dict(self):
+        gaps = self.inter_token_latencies
+        return {
+            "time_to_first_token_s": self.time_to_first_token,
+            "mean_inter_token_latency_s": statistics.fmean(gaps) if gaps else None,
+            "max_inter_token_latency_s": max(gaps) if gaps else None,
+            "total_duration_s": self.total_duration,
+            "chunks": self.chunks,
+        }
+
+
+def _chat_request(prompt, model, messages, kwargs):
+    request = dict(kwargs)
+    request["model"] = model
+    request["messages"] = messages if messages is not None else [{"role": "user", "content": prompt}]
+    request["stream"] = True
+    request.setdefault("stream_options", {"include_usage": True})
+    return request
+
+
+class _StreamBase:
+    def __init__(self, prompt=None, model=None, messages=None, **kwargs):
+        self._request = _chat_request(prompt, model, messages, kwargs)
+        self._response = None
+        self._parts = []
+        self.metrics = None
+        self.usage = None
+        self.finish_reason = None
+        self.done = False
+
+    def _handle(self, chunk):
+        """Record one chunk; returns its text delta or None."""
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        delta = choice.delta.content if choice.delta else None
+        if not delta:
+            return None
+        self.metrics.token()
+        self._parts.append(delta)
+        return delta
+
+    def _finish(self):
+        if not self.done:
+            self.done = True
+            self.metrics.finish()
+            logger.info("Duration: %.2fs | TTFT: %s | Tokens: %s",
+                        self.metrics.total_duration,
+                        "n/a" if self.metrics.time_to_first_token is None
+                        else f"{self.metrics.time_to_first_token:.2f}s",
+                        self.usage)
+
+    @property
+    def text(self):
+        """Everything received so far, joined once per access (linear in total size)."""
+        return "".join(self._parts)
+
+
+class ChatStream(_StreamBase):
+    """
+    Iterator over the text deltas of a streamed chat completion.
+
+        stream = ChatStream("Hi", "gpt-4o-mini")
+        for delta in stream:
+            print(delta, end="", flush=True)
+        stream.text, stream.usage, stream.metrics.as_dict()
+
+    The request is sent on first iteration. `close()` aborts it early.
+    Extra keyword arguments (api_key, temperature, ...) go to `call_openai_method`.
+    """
+
+    def __iter__(self):
+        if self._response is None:
+            self.metrics = StreamMetrics()
+            self._response = call_openai_method("chat.completions.create", **self._request)
+        try:
+            for chunk in self._response:
+                delta = self._handle(chunk)
+                if delta:
+                    yield delta
+        finally:
+            self._finish()
+
+    def close(self):
+        if self._response is not None and hasattr(self._response, "close"):
+            self._response.close()
+
+    def read(self):
+        """Consume the whole stream and return the final text."""
+        for _ in self:
+            pass
+        return self.text
+
+
+class AsyncChatStream(_StreamBase):
+    """Async counterpart of `ChatStream`, used with `async for`."""
+
+    async def __aiter__(self):
+        if self._response is None:
+            self.metrics = StreamMetrics()
+            self._response = await acall_openai_method("chat.completions.create", **self._request)
+        try:
+            async for chunk in self._response:
+                delta = self._handle(chunk)
+                if delta:
+                    yield delta
+        finally:
+            self._finish()
+
+    async def close(self):
+        if self._response is not None and hasattr(self._response, "close"):
+            await self._response.close()
+
+    async def read(self):
+        async for _ in self:
+            pass
+        return self.text
+
+
+def stream_chat(prompt, model, api_key=None, **kwargs):
+    """Start a streamed chat completion; iterate the result for text deltas."""
+    return ChatStream(prompt, model, api_key=api_key, **kwargs)
+
+
+def astream_chat(prompt, model, api_key=None, **kwargs):
+    """Async version of `stream_chat`; iterate the result with `async for`."""
+    return AsyncChatStream(prompt, model, api_key=api_key, **kwargs)
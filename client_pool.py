@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+import logging
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0  # seconds an idle socket stays open
+DEFAULT_TIMEOUT = 600.0  # seconds, same as the OpenAI SDK default
+DEFAULT_IDLE_TTL = 15 * 60  # seconds before an unused client is evicted
+DEFAULT_SDK_RETRIES = 0  # retries are handled by retry_policy, not the SDK
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """
+    Thread-safe registry of long-lived OpenAI clients.
+
+    Clients are keyed by (api_key, base_url, timeout) so every call with the
+    same credentials shares one httpx connection pool and keeps its TLS
+    sessions alive. Clients that have not been used for `idle_ttl` seconds are
+    dropped from the registry on the next lookup.
+
+    Async clients are additionally scoped to the running event loop, since
+    their connections cannot be shared between loops.
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+                 timeout=DEFAULT_TIMEOUT, idle_ttl=DEFAULT_IDLE_TTL,
+                 sdk_max_retries=DEFAULT_SDK_RETRIES):
+        self._lock = threading.Lock()
+        self._clients = {}  # key -> [client, last_used]
+        self._async_clients = weakref.WeakKeyDictionary()  # loop -> {key: [client, last_used]}
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.idle_ttl = idle_ttl
+        self.sdk_max_retries = sdk_max_retries
+
+    def configure(self, **settings):
+        """Update pool settings. Applies to clients created after the call."""
+        with self._lock:
+            for name, value in settings.items():
+                if not hasattr(self, name) or name.startswith("_"):
+                    raise TypeError(f"Unknown client pool setting: {name}")
+                setattr(self, name, value)
+
+    def get(self, api_key=None, base_url=None, timeout=None):
+        """Return the shared client for these settings, creating it on first use."""
+        key = self._key(api_key, base_url, timeout)
+        with self._lock:
+            return self._lookup(self._clients, key, self._create_client)
+
+    def get_async(self, api_key=None, base_url=None, timeout=None):
+        """Return the shared `AsyncOpenAI` client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        key = self._key(api_key, base_url, timeout)
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            return self._lookup(clients, key, self._create_async_client)
+
+    def clear(self):
+        """Close and forget every pooled sync client; async clients are dropped."""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        for client, _ in entries:
+            client.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients) + sum(len(c) for c in self._async_clients.values())
+
+    def _key(self, api_key, base_url, timeout):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        timeout = self.timeout if timeout is None else timeout
+        return (api_key, base_url, timeout)
+
+    def _lookup(self, clients, key, factory):
+        now = time.monotonic()
+        self._evict_idle(clients, now)
+        entry = clients.get(key)
+        if entry is None:
+            entry = [factory(*key), now]
+            clients[key] = entry
+            logger.debug("Created pooled OpenAI client (base_url=%s)", key[1])
+        entry[1] = now
+        return entry[0]
+
+    def _evict_idle(self, clients, now):
+        # Evicted clients are only dereferenced, not closed: a stream handed out
+        # earlier may still be reading from it. The SDK closes it once collected.
+        if not self.idle_ttl:
+            return
+        stale = [key for key, (_, last_used) in clients.items()
+                 if now - last_used > self.idle_ttl]
+        for key in stale:
+            del clients[key]
+        if stale:
+            logger.debug("Evicted %s idle OpenAI client(s)", len(stale))
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _create_client(self, api_key, base_url, timeout):
+        import openai
+        http_client = openai.DefaultHttpxClient(limits=self._limits(), timeout=timeout)
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=self.sdk_max_retries,
+            http_client=http_client,
+        )
+
+    def _create_async_client(self, api_key, base_url, timeout):
+        import openai
+        http_client = openai.DefaultAsyncHttpxClient(limits=self._limits(), timeout=timeout)
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=self.sdk_max_retries,
+            http_client=http_client,
+        )
+
+
+_default_pool = ClientPool()
+
+
+def get_client(api_key=None, base_url=None, timeout=None):
+    """Return a pooled `openai.OpenAI` client from the process-wide registry."""
+    return _default_pool.get(api_key=api_key, base_url=base_url, timeout=timeout)
+
+
+def get_async_client(api_key=None, base_url=None, timeout=None):
+    """Return a pooled `openai.AsyncOpenAI` client bound to the running loop."""
+    return _default_pool.get_async(api_key=api_key, base_url=base_url, timeout=timeout)
+
+
+def configure_client_pool(**settings):
+    """Adjust connection limits, timeout or idle eviction of the shared pool."""
+    _default_pool.configure(**settings)
+
+
+def clear_client_pool():
+    """Close all pooled clients, e.g. before forking worker processes."""
+    _default_pool.clear()
@@ -0,0 +1,384 @@
+import os
+import sys
+import hmac
+import json
+import stat
+import time
+import socket
+import hashlib
+import logging
+import secrets
+import tempfile
+import ipaddress
+import threading
+import socketserver
+
+FORWARDED_MODES = {"gpt", "dalle", "whisper"}
+# Options holding paths; the client sends them absolute since the daemon has its own cwd.
+PATH_OPTIONS = ("prompt_file", "file", "input_dir", "output_file", "output_dir", "jobs", "input", "output", "index")
+DEFAULT_CONCURRENCY = 8  # CLI requests the daemon runs at once, across all clients
+DEFAULT_TCP_ADDRESS = "127.0.0.1:47821"
+CONNECT_TIMEOUT = 1.0
+SOCKET_ENV = "OPENAI_WRAPPER_SOCKET"
+SOCKET_NAME = "openai_wrapper.sock"
+# Variables that choose the account and endpoint. Commands are only forwarded
+# to a daemon that has the same values; the values themselves are not sent.
+ENVIRONMENT_VARIABLES = ("OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_ORG_ID", "OPENAI_PROJECT_ID")
+
+logger = logging.getLogger(__name__)
+
+
+def default_address():
+    """
+    $OPENAI_WRAPPER_SOCKET, else a Unix socket in a per-user directory:
+    $XDG_RUNTIME_DIR, or a 0700 directory in the temp directory (localhost
+    TCP where there are no Unix sockets).
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    if hasattr(socket, "AF_UNIX") and hasattr(os, "getuid"):
+        directory = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(),
+                                                                      f"openai_wrapper-{os.getuid()}")
+        return os.path.join(directory, SOCKET_NAME)
+    return DEFAULT_TCP_ADDRESS
+
+
+def _tcp(address):
+    """(host, port) for a "host:port" address, None for a socket path."""
+    host, sep, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port)) if sep and port.isdigit() else None
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def token_path(address):
+    """
+    The shared secret of a TCP daemon: a file readable only by its user.
+    (A Unix socket is protected by its own file mode and needs none.)
+    """
+    tcp = _tcp(address)
+    return os.path.join(os.path.expanduser("~"), f".openai_wrapper_daemon_{tcp[1]}.token") if tcp else None
+
+
+def _read_token(address):
+    path = token_path(address)
+    if path is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def _write_token(path):
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        os.chmod(path, 0o600)  # O_CREAT's mode does not apply to an existing file
+        f.write(token)
+    return token
+
+
+def environment_digest(environ=None):
+    """Fingerprint of ENVIRONMENT_VARIABLES, compared instead of sending the key itself."""
+    environ = os.environ if environ is None else environ
+    digest = hashlib.sha256()
+    for name in ENVIRONMENT_VARIABLES:
+        digest.update(f"{name}={environ.get(name, '')}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _check_socket(path):
+    """
+    Raise PermissionError unless `path` is a socket only this user can use,
+    in a directory other users cannot swap it out of. Otherwise another
+    local user could be listening there and receive the forwarded commands.
+    """
+    info = os.lstat(path)
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} is not a socket private to this user")
+    directory = os.path.dirname(os.path.abspath(path))
+    info = os.stat(directory)
+    if info.st_uid not in (0, os.getuid()) or (info.st_mode & 0o022 and not info.st_mode & stat.S_ISVTX):
+        raise PermissionError(f"{directory} can be changed by other users")
+
+
+def _connect(address, timeout=CONNECT_TIMEOUT):
+    tcp = _tcp(address)
+    if not tcp and hasattr(os, "getuid"):
+        _check_socket(address)
+    sock = socket.socket(socket.AF_INET if tcp else socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(tcp or address)
+    except OSError:
+        sock.close()
+        raise
+    sock.settimeout(None)  # requests themselves may take minutes
+    return sock
+
+
+def _send(sock, message):
+    sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def _exchange(address, message):
+    """Send one request and yield the daemon's reply messages."""
+    token = _read_token(address)
+    with _connect(address) as sock:
+        _send(sock, {**message, "token": token} if token else message)
+        with sock.makefile("r", encoding="utf-8") as replies:
+            for line in replies:
+                yield json.loads(line)
+
+
+# -- client ------------------------------------------------------------------
+def client_argv(argv, args):
+    """`argv` with every path option re-appended as an absolute path (argparse keeps the last)."""
+    argv = list(argv)
+    for dest in PATH_OPTIONS:
+        value = getattr(args, dest, None)
+        if value and value != "-":
+            argv += [f"--{dest}", os.path.abspath(value)]
+    return argv
+
+
+def forward(argv, address=None, out=None, err=None):
+    """
+    Run a CLI command in the daemon, relaying its output. Returns the exit
+    code, or None when it was not run there (the caller then runs it
+    in-process): no daemon is listening, its token cannot be read, or it
+    has a different OpenAI environment than this process.
+    """
+    out, err = out or sys.stdout, err or sys.stderr
+    address = address or default_address()
+    try:
+        token = _read_token(address)
+        sock = _connect(address)
+    except PermissionError as e:
+        logger.warning("Not forwarding to the daemon: %s", e)
+        return None
+    except OSError:
+        return None  # nothing listening (or a stale socket file)
+    with sock:
+        try:
+            _send(sock, {"op": "run", "argv": argv, "token": token, "environment": environment_digest()})
+            with sock.makefile("r", encoding="utf-8") as replies:
+                for line in replies:
+                    message = json.loads(line)
+                    if "refused" in message:
+                        logger.info("Daemon refused the command (%s); running it here", message["refused"])
+                        return None
+                    if "exit" in message:
+                        return message["exit"]
+                    stream = out if "stdout" in message else err
+                    stream.write(message.get("stdout", message.get("stderr", "")))
+                    stream.flush()
+        except OSError:
+            pass
+    # Not retried in-process: the daemon may already have sent the request.
+    err.write("Lost the connection to the OpenAI wrapper daemon\n")
+    return 1
+
+
+def daemon_status(address=None):
+    """The running daemon's counters, or None when there is none."""
+    try:
+        return next(_exchange(address or default_address(), {"op": "status"})).get("status")
+    except (OSError, StopIteration):
+        return None
+
+
+def stop_daemon(address=None):
+    """Ask the daemon to exit after its running requests; False when there is none."""
+    try:
+        return next(_exchange(address or default_address(), {"op": "stop"})).get("stopping", False)
+    except (OSError, StopIteration):
+        return False
+
+
+# -- server ------------------------------------------------------------------
+class _ThreadSinks:
+    """sys.stdout/sys.stderr stand-in that sends writes from request threads to their client."""
+
+    def __init__(self, original, key):
+        self._original = original
+        self._key = key
+        self._local = threading.local()
+
+    def bind(self, sock):
+        self._local.sock = sock
+
+    def write(self, text):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            return self._original.write(text)
+        if text:
+            _send(sock, {self._key: text})
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, "sock", None) is None:
+            self._original.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("not a JSON object")
+        except ValueError:
+            return _send(self.connection, {"refused": "malformed request"})
+        daemon = self.server.daemon
+        if daemon.token and not hmac.compare_digest(str(message.get("token") or ""), daemon.token):
+            logger.warning("Rejected a request with a wrong token from %s", self.client_address)
+            return _send(self.connection, {"refused": "wrong token"})
+        if message.get("op") == "run" and message.get("environment") != daemon.environment:
+            # Running it here would silently use another account or endpoint.
+            return _send(self.connection, {"refused": "different OPENAI_* environment"})
+        if message.get("op") == "status":
+            _send(self.connection, {"status": self.server.daemon.status()})
+        elif message.get("op") == "stop":
+            _send(self.connection, {"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif message.get("op") == "run":
+            code = self.server.daemon.run(message["argv"], self.connection)
+            try:
+                _send(self.connection, {"exit": code})
+            except OSError:
+                pass  # the client went away
+
+
+class Daemon:
+    """
+    Keeps the SDK, pooled clients (and their TLS connections), the model
+    registry and any enabled caches warm, and runs forwarded CLI commands
+    with at most `concurrency` of them at once across all clients.
+
+    TCP addresses must be loopback; clients then authenticate with the token
+    the daemon writes to `token_path(address)` (mode 0600). Commands are
+    only accepted from clients with the same ENVIRONMENT_VARIABLES.
+    """
+
+    def __init__(self, address=None, concurrency=DEFAULT_CONCURRENCY):
+        self.address = address or default_address()
+        tcp = _tcp(self.address)
+        if tcp and not _is_loopback(tcp[0]):
+            raise ValueError(f"Refusing to listen on {tcp[0]}: the daemon only serves this machine "
+                             "(use a loopback address or a Unix socket)")
+        self.concurrency = concurrency
+        self.environment = environment_digest()
+        self.token = None
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.counts = {"served": 0, "failed": 0, "active": 0, "waiting": 0}
+        self.started = time.time()
+        self._server = None
+        self._sinks = None
+
+    def status(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {"pid": os.getpid(), "address": self.address, "concurrency": self.concurrency,
+                "uptime_s": round(time.time() - self.started, 1), **counts}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.counts[key] += delta
+
+    def run(self, argv, sock):
+        """Run one CLI command with its output sent to `sock`; returns the exit code."""
+        from .entrypoint import main
+        self._count(waiting=1)
+        with self._slots:
+            self._count(waiting=-1, active=1)
+            start = time.perf_counter()
+            for sink in self._sinks:
+                sink.bind(sock)
+            code = 0
+            try:
+                main(argv, echo=True)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                code = 1  # the traceback has already been echoed
+            finally:
+                for sink in self._sinks:
+                    sink.bind(None)
+                self._count(active=-1, served=1, failed=int(code != 0))
+        logger.info("%s -> %s in %.2fs", " ".join(argv[:1]), code, time.perf_counter() - start)
+        return code
+
+    def warm_up(self):
+        """Load what every request would otherwise load again: the SDK, the client, the registry."""
+        from .client_pool import get_client
+        from .model_manager import registry
+        from .openai_wrapper import _resolve_method
+        from . import entrypoint, Gpt_Api_Module, Dalle_Api_Module, Whisper_Api_Module  # noqa: F401
+        client = get_client()
+        for method_path in ("chat.completions.create", "images.generate", "audio.transcriptions.create"):
+            _resolve_method(client, method_path)
+        registry.models()
+
+    def _bind(self):
+        tcp = _tcp(self.address)
+        if tcp:
+            server = socketserver.ThreadingTCPServer(tcp, _Handler, bind_and_activate=False)
+            server.allow_reuse_address = True
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.address)), mode=0o700, exist_ok=True)
+            if os.path.exists(self.address):
+                if daemon_status(self.address) is not None:
+                    raise RuntimeError(f"A daemon is already listening on {self.address}")
+                os.remove(self.address)  # left behind by a daemon that died
+            server = socketserver.ThreadingUnixStreamServer(self.address, _Handler, bind_and_activate=False)
+        previous_umask = os.umask(0o177)  # the socket is for this user only
+        try:
+            server.server_bind()
+        finally:
+            os.umask(previous_umask)
+        server.server_activate()
+        if tcp:
+            self.token = _write_token(token_path(self.address))
+        server.daemon = self
+        return server
+
+    def serve_forever(self):
+        """Listen until `stop_daemon()` or Ctrl+C; running requests are finished first."""
+        self.warm_up()
+        self._server = self._bind()
+        self._sinks = [_ThreadSinks(sys.stdout, "stdout"), _ThreadSinks(sys.stderr, "stderr")]
+        sys.stdout, sys.stderr = self._sinks
+        logger.info("OpenAI wrapper daemon listening on %s (pid %s, %s concurrent requests)",
+                    self.address, os.getpid(), self.concurrency)
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sys.stdout, sys.stderr = (sink._original for sink in self._sinks)
+            self._server.server_close()
+            leftover = token_path(self.address) if _tcp(self.address) else self.address
+            if os.path.exists(leftover):
+                os.remove(leftover)
+            logger.info("Daemon stopped after %s requests", self.counts["served"])
+
+def serve(address=None, concurrency=DEFAULT_CONCURRENCY, rpm=None, tpm=None):
+    """Run the daemon in the foreground; `rpm`/`tpm` turn on rate limiting shared by all clients."""
+    if rpm or tpm:
+        from .rate_limiter import enable_rate_limiting, DEFAULT_RPM, DEFAULT_TPM
+        enable_rate_limiting(default_rpm=rpm or DEFAULT_RPM, default_tpm=tpm or DEFAULT_TPM)
+    Daemon(address, concurrency).serve_forever()
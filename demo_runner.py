@@ -1,71 +1,216 @@
-import subprocess
+"""
+Smoke/demo run of every API mode, in-process and in parallel.
+
+Each scenario calls `entrypoint.main(argv)` directly (no subprocess, no
+repeated interpreter start-up); independent scenarios run concurrently.
+Writes a JSON report with wall time, API time, calls, tokens and pass/fail
+per scenario, and logs to a rotated `.demo_log.txt`.
+
+    python demo_runner.py                       # against the real API (OPENAI_API_KEY)
+    python demo_runner.py --mock                # against a local mock server
+    python demo_runner.py --base_url http://localhost:8089/v1 --scenarios gpt whisper
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import logging.handlers
 import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-results = {}
-log_base = ".demo_log"
-log_ext = ".txt"
+ROOT = pathlib.Path(__file__).resolve().parent
+PACKAGE = ROOT.name
+sys.path.insert(0, str(ROOT.parent))
+
+LOG_PATH = ".demo_log.txt"
+LOG_BACKUPS = 5  # previous runs kept as .demo_log.txt.1 ... .5
+LOG_MAX_BYTES = 5 * 1024 * 1024
+REPORT_PATH = "demo_report.json"
+DEFAULT_CONCURRENCY = 4
+
+logger = logging.getLogger("demo_runner")
+
+
+def _module(name):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def _silent_wav(path, seconds=1.0, rate=16000):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * int(rate * seconds))
+    return path
+
+
+def _no_failed_images(records):
+    return not any("error" in record for record in records or [])
+
+
+def build_scenarios(workdir, audio=None):
+    """{name: (argv, check)} for every demo; `check(result)` returns False on a soft failure."""
+    audio = audio or _silent_wav(os.path.join(workdir, "demo.wav"))
+    texts = os.path.join(workdir, "texts.txt")
+    with open(texts, "w", encoding="utf-8") as f:
+        f.write("Penguins live in the southern hemisphere.\nThe moon orbits the earth.\n")
+    return {
+        "gpt": (["gpt", "--model", "gpt-4o-mini", "--prompt", "Tell me a joke about penguins.",
+                 "--json_output"], None),
+        "gpt_stream": (["gpt", "--model", "gpt-4", "--prompt", "Count to five.", "--stream",
+                        "--output_file", os.path.join(workdir, "stream.txt")], None),
+        "dalle": (["dalle", "--model", "dall-e-2", "--prompt", "An astronaut lounging in a tropical resort in space",
+                   "--size", "256x256", "--download", "--output_dir", os.path.join(workdir, "images")],
+                  _no_failed_images),
+        "whisper": (["whisper", "--model", "whisper-1", "--file", audio, "--format", "text",
+                     "--output_file", os.path.join(workdir, "transcript.txt")], None),
+        "embed": (["embed", "--model", "text-embedding-3-small", "--input", texts,
+                   "--index", os.path.join(workdir, "index")], None),
+    }
+
+
+class _Attribution:
+    """Metrics hook that totals API time, calls and tokens per scenario."""
 
-# Rotate up to 5 logs
-for i in range(4, -1, -1):
-    src = f"{log_base}{'' if i == 0 else f'.{i}'}{log_ext}"
-    dst = f"{log_base}.{i+1}{log_ext}"
-    if os.path.exists(src):
-        if i == 4:
-            os.remove(src)
-        else:
-            os.rename(src, dst)
+    def __init__(self):
+        self.threads = {}  # thread id -> scenario
+        self.models = {}  # model -> scenario, for calls made on helper threads
+        self.totals = {}
+        self._lock = threading.Lock()
 
-log_path = f"{log_base}{log_ext}"
+    def __call__(self, record):
+        scenario = self.threads.get(threading.get_ident()) or self.models.get(record.model) or "unattributed"
+        with self._lock:
+            totals = self.totals.setdefault(scenario, {"calls": 0, "api_s": 0.0, "retries": 0,
+                                                       "prompt_tokens": 0, "completion_tokens": 0})
+            totals["calls"] += 1
+            totals["api_s"] += record.seconds
+            totals["retries"] += record.retries
+            totals["prompt_tokens"] += record.prompt_tokens
+            totals["completion_tokens"] += record.completion_tokens
 
 
-def log_line(log, message):
-    timestamp = datetime.utcnow().isoformat() + "Z"
-    log_entry = f"[{timestamp}] {message}"
-    log.write(log_entry + "\n")
-    print(log_entry)
+def _scenario_model(argv):
+    return argv[argv.index("--model") + 1] if "--model" in argv else None
 
 
-def run_demo(name, args):
-    print(f"\nRunning {name} Demo...")
+def run_scenario(name, argv, check, attribution):
+    entrypoint = _module("entrypoint")
+    attribution.threads[threading.get_ident()] = name
+    logger.info("%s START: %s", name.upper(), " ".join(argv))
+    start = time.perf_counter()
+    error = None
     try:
-        with open(log_path, 'a') as log:
-            log_line(log, f"{name.upper()} DEMO START")
-            process = subprocess.Popen(
-                ["python", "main.py", *args],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True
-            )
-            for line in process.stdout:
-                log_line(log, line.rstrip())
-            return_code = process.wait()
-            results[name] = 'Success' if return_code == 0 else f'Failed (code {return_code})'
-    except Exception as e:
-        results[name] = f"Error: {e}"
-
-
-run_demo("gpt", [
-    "gpt",
-    "--model", "gpt-3.5-turbo",
-    "--prompt", "Tell me a joke about penguins.",
-    "--json_output"
-])
-
-run_demo("dalle", [
-    "dalle",
-    "--model", "dall-e-2",
-    "--prompt", "An astronaut lounging in a tropical resort in space",
-    "--output_dir", "demo_images"
-])
-
-run_demo("whisper", [
-    "whisper",
-    "--model", "whisper-1",
-    "--file", "sample_audio.mp3",
-    "--format", "text"
-])
-
-print("\nDEMO SUMMARY:")
-for mode, status in results.items():
-    print(f"- {mode.upper()}: {status}")
+        result = entrypoint.main(argv)
+        if check and not check(result):
+            error = "check failed"
+    except BaseException as e:  # includes SystemExit from an unknown model
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        attribution.threads.pop(threading.get_ident(), None)
+    wall = time.perf_counter() - start
+    logger.info("%s %s in %.2fs%s", name.upper(), "FAIL" if error else "PASS", wall, f" ({error})" if error else "")
+    return {"status": "fail" if error else "pass", "wall_s": round(wall, 3), "error": error}
+
+
+def run_demos(names, workdir, concurrency=DEFAULT_CONCURRENCY, audio=None):
+    """Run the selected scenarios concurrently; returns the report dict."""
+    metrics = _module("metrics")
+    scenarios = build_scenarios(workdir, audio)
+    names = names or list(scenarios)
+    attribution = _Attribution()
+    for name in names:
+        attribution.models.setdefault(_scenario_model(scenarios[name][0]), name)
+    metrics.add_hook(attribution)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {name: pool.submit(run_scenario, name, *scenarios[name], attribution) for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+    finally:
+        metrics.remove_hook(attribution)
+    for name, result in results.items():
+        totals = attribution.totals.get(name, {})
+        result.update(api_s=round(totals.get("api_s", 0.0), 3), calls=totals.get("calls", 0),
+                      retries=totals.get("retries", 0), prompt_tokens=totals.get("prompt_tokens", 0),
+                      completion_tokens=totals.get("completion_tokens", 0))
+    return {
+        "started": datetime.utcnow().isoformat() + "Z",
+        "wall_s": round(time.perf_counter() - start, 3),
+        "passed": sum(r["status"] == "pass" for r in results.values()),
+        "failed": sum(r["status"] == "fail" for r in results.values()),
+        "scenarios": results,
+        # e.g. image downloads on helper threads, which carry no model
+        "unattributed": attribution.totals.get("unattributed"),
+    }
+
+
+def _setup_log(path):
+    """Attach a rotating log handler; each run starts a new file and keeps LOG_BACKUPS old ones."""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                   encoding="utf-8", delay=True)
+    if os.path.exists(path) and os.path.getsize(path):
+        handler.doRollover()
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(threadName)s %(name)s %(levelname)s: %(message)s"))
+    logging.getLogger().addHandler(handler)
+    return handler
+
+
+def format_report(report):
+    lines = [f"{'scenario':<12} {'status':<6} {'wall s':>7} {'api s':>7} {'calls':>5} {'tokens':>7}  error"]
+    for name, r in report["scenarios"].items():
+        tokens = r["prompt_tokens"] + r["completion_tokens"]
+        lines.append(f"{name:<12} {r['status']:<6} {r['wall_s']:7.2f} {r['api_s']:7.2f} {r['calls']:5} {tokens:7}  "
+                     f"{r['error'] or ''}")
+    lines.append(f"{report['passed']} passed, {report['failed']} failed in {report['wall_s']:.2f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every API mode once, in parallel, and report timings")
+    parser.add_argument("--scenarios", nargs="+", choices=["gpt", "gpt_stream", "dalle", "whisper", "embed"],
+                        help="Scenarios to run (default: all)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Scenarios run at once")
+    parser.add_argument("--mock", action="store_true", help="Run against a local mock OpenAI server")
+    parser.add_argument("--base_url", help="OpenAI-compatible endpoint to use instead of the real API")
+    parser.add_argument("--audio", help="Audio file for the whisper demo (default: generated silence)")
+    parser.add_argument("--report", default=REPORT_PATH, help="JSON report path")
+    parser.add_argument("--log", default=LOG_PATH, help="Rotated log file path")
+    args = parser.parse_args(argv)
+
+    handler = _setup_log(args.log)
+    root_logger = logging.getLogger()
+    previous_level = root_logger.level
+    root_logger.setLevel(logging.INFO)
+    try:
+        with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+            if args.mock:
+                benchmark = _module("benchmark")
+                server = stack.enter_context(_module("mock_openai_server").MockOpenAIServer())
+                stack.enter_context(benchmark.mock_environment(server, workdir))
+            elif args.base_url:
+                os.environ["OPENAI_BASE_URL"] = args.base_url
+            report = run_demos(args.scenarios, workdir, args.concurrency, args.audio)
+    finally:
+        root_logger.removeHandler(handler)
+        root_logger.setLevel(previous_level)
+        handler.close()
+
+    report["target"] = "mock" if args.mock else (args.base_url or "openai")
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"\nReport written to {args.report}, log to {args.log}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
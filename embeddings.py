@@ -0,0 +1,158 @@
+import json
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .openai_wrapper import call_openai_method
+from .token_estimator import estimate_tokens
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_CONCURRENCY = 4
+WINDOW_FACTOR = 2  # batches buffered per worker while the head batch is pending
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8_191
+# Requests are packed below the hard limits, since the token counts are estimates.
+PACKING_HEADROOM = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+def read_texts(path):
+    """
+    Yield (id, text) for every non-blank line of `path`.
+
+    JSONL lines are objects with a `text` and optional `id` field; any other
+    line is taken as the text itself. Ids default to the 1-based line number.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("{"):
+                item = json.loads(line)
+                if 'text' not in item:
+                    raise ValueError(f"{path}:{line_no}: expected an object with a 'text' field")
+                yield item.get('id', line_no), item['text']
+            else:
+                yield line_no, line
+
+
+def pack_batches(items, model=DEFAULT_EMBEDDING_MODEL, max_inputs=MAX_INPUTS_PER_REQUEST,
+                 max_tokens=MAX_TOKENS_PER_REQUEST, skipped=None):
+    """
+    Group (id, text) pairs into request-sized batches of (ids, texts).
+
+    A batch closes when adding the next text would exceed `max_inputs` inputs
+    or (with some headroom) `max_tokens` estimated tokens. A text over the
+    per-input limit would fail its whole batch, so it is never sent: with a
+    `skipped` list it is appended there as (id, reason) and left out,
+    otherwise ValueError is raised when the generator reaches it.
+    """
+    token_budget = int(max_tokens * PACKING_HEADROOM)
+    ids, texts, tokens = [], [], 0
+    for item_id, text in items:
+        cost = estimate_tokens(text, model)
+        if cost > MAX_TOKENS_PER_INPUT:
+            reason = f"Input {item_id!r} is ~{cost} tokens, over the {MAX_TOKENS_PER_INPUT}-token limit"
+            if skipped is None:
+                raise ValueError(reason)
+            logger.warning("Skipping: %s", reason)
+            skipped.append((item_id, reason))
+            continue
+        if texts and (len(texts) >= max_inputs or tokens + cost > token_budget):
+            yield ids, texts
+            ids, texts, tokens = [], [], 0
+        ids.append(item_id)
+        texts.append(text)
+        tokens += cost
+    if texts:
+        yield ids, texts
+
+
+def embed_batch(texts, model=DEFAULT_EMBEDDING_MODEL, api_key=None, dimensions=None):
+    """Embed one batch in a single request; returns the vectors in input order."""
+    kwargs = {"dimensions": dimensions} if dimensions else {}
+    response = call_openai_method("embeddings.create", model=model, input=list(texts), api_key=api_key, **kwargs)
+    if not response:
+        raise RuntimeError("Embedding request was skipped")
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def iter_embeddings(items, model=DEFAULT_EMBEDDING_MODEL, api_key=None, concurrency=None, dimensions=None,
+                    max_inputs=MAX_INPUTS_PER_REQUEST, skipped=None):
+    """
+    Yield (ids, vectors) per batch, in input order, for an iterable of
+    (id, text) pairs. Up to `concurrency` batches are in flight and only a
+    bounded window of them is held in memory, so the input can be a stream
+    of millions of texts. Over-long texts go to `skipped` (see `pack_batches`).
+    """
+    return _embed_batches(pack_batches(items, model, max_inputs, skipped=skipped), model, api_key, concurrency,
+                          dimensions)
+
+
+def _embed_batches(batches, model, api_key, concurrency, dimensions):
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    window = concurrency * WINDOW_FACTOR
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        for ids, texts in batches:
+            pending.append((ids, pool.submit(embed_batch, texts, model, api_key, dimensions)))
+            if len(pending) >= window:
+                ids, future = pending.popleft()
+                yield ids, future.result()
+        while pending:
+            ids, future = pending.popleft()
+            yield ids, future.result()
+
+
+def embed_texts(texts, model=DEFAULT_EMBEDDING_MODEL, api_key=None, concurrency=None, dimensions=None):
+    """
+    Embed a list of strings; returns one vector (list of floats) per text.
+    Raises ValueError for an over-long text before any request is sent.
+    """
+    batches = list(pack_batches(enumerate(texts), model))
+    vectors = []
+    for _, batch in _embed_batches(batches, model, api_key, concurrency, dimensions):
+        vectors.extend(batch)
+    return vectors
+
+
+def build_index(input_path, index_path, model=DEFAULT_EMBEDDING_MODEL, api_key=None, concurrency=None,
+                dimensions=None):
+    """
+    Embed every text of `input_path` (see `read_texts`) and append the
+    vectors to the `VectorStore` at `index_path`. Texts over the per-input
+    token limit are skipped and their ids listed in the summary, so one bad
+    line does not abort a build whose earlier batches are already stored.
+    Returns a summary dict.
+    """
+    from .vector_store import VectorStore
+    start = time.perf_counter()
+    summary = {"texts": 0, "batches": 0}
+    skipped = []
+    store = VectorStore(index_path, model=model, dimensions=dimensions)
+    for ids, vectors in iter_embeddings(read_texts(input_path), model, api_key, concurrency, dimensions,
+                                        skipped=skipped):
+        store.add(ids, vectors)
+        summary["texts"] += len(ids)
+        summary["batches"] += 1
+    summary["skipped"] = len(skipped)
+    summary["skipped_ids"] = [item_id for item_id, _ in skipped]
+    summary["size"] = len(store)
+    summary["duration_s"] = round(time.perf_counter() - start, 2)
+    logger.info("Indexed %s texts in %s requests (%.2fs); index holds %s vectors",
+                summary["texts"], summary["batches"], summary["duration_s"], summary["size"])
+    return summary
+
+
+def query_index(index_path, query, model=None, api_key=None, top_k=10):
+    """Embed `query` with the index's model and return its `top_k` [(id, score)] matches."""
+    from .vector_store import VectorStore
+    store = VectorStore(index_path, model=model)
+    model = store.model or DEFAULT_EMBEDDING_MODEL
+    vector = embed_batch([query], model, api_key, dimensions=store.dimensions)[0]
+    return store.search(vector, top_k)
@@ -1,16 +1,15 @@
 import argparse
-import os
-import openai
 import traceback
-from .model_manager import confirm_model
-from .Gpt_Api_Module import use_chat_api, use_assistant_api
-from .Dalle_Api_Module import generate_dalle_image
-from .Whisper_Api_Module import transcribe_audio
 
 import sys
 
-def main(argv=None):
-    is_direct = __name__ == "__main__" and (argv is None or argv == sys.argv)
+# API modules (and with them `openai`) are imported only once a mode needs
+# them, so `--help` and argument errors return without loading the SDK.
+
+def main(argv=None, standalone=False, echo=None):
+    is_direct = standalone or (__name__ == "__main__" and (argv is None or argv == sys.argv))
+    if echo is None:
+        echo = not argv  # print results like the CLI does (the daemon passes argv and echo=True)
 
     if is_direct and len(sys.argv) == 1:
         try:
@@ -33,40 +32,159 @@ def main(argv=None):
 
     try:
         parser = argparse.ArgumentParser(description='Unified OpenAI CLI')
-        parser.add_argument('mode', choices=['gpt', 'dalle', 'whisper'], help='Operation mode')
-        parser.add_argument('--model', type=str, required=True, help='Model to use')
+        parser.add_argument('mode', choices=['gpt', 'dalle', 'whisper', 'embed', 'batch', 'daemon'], help='Operation mode')
+        parser.add_argument('action', nargs='?', choices=['submit', 'status', 'fetch', 'resubmit', 'stop'],
+                            help='Batch action (batch mode); status or stop (daemon mode, default: serve)')
+        parser.add_argument('--model', type=str, help='Model to use (required except in batch and daemon modes)')
         parser.add_argument('--prompt', type=str, help='Text prompt')
         parser.add_argument('--prompt_file', type=str, help='Path to prompt text file')
         parser.add_argument('--stream', action='store_true', help='Stream GPT response')
         parser.add_argument('--assistant_id', type=str, help='Assistant ID for GPT assistant mode')
+        parser.add_argument('--thread_id', type=str, help='Existing thread to continue in assistant mode')
+        parser.add_argument('--run_timeout', type=float, default=300, help='Seconds before an assistant run is cancelled')
         parser.add_argument('--file', type=str, help='Path to audio file for Whisper')
         parser.add_argument('--translate', action='store_true', help='Translate to English (Whisper)')
         parser.add_argument('--language', type=str, help='Language hint (Whisper)')
         parser.add_argument('--format', type=str, default='json', help='Output format (Whisper)')
+        parser.add_argument('--segment_seconds', type=float, help='Split WAV files longer than this into parallel requests (Whisper)')
+        parser.add_argument('--overlap', type=float, help='Seconds of overlap between split segments (Whisper)')
         parser.add_argument('--size', type=str, default='1024x1024', help='Image size (DALL·E)')
         parser.add_argument('--quality', type=str, default='standard', help='Image quality (DALL·E 3)')
         parser.add_argument('--style', type=str, help='Image style (DALL·E 3)')
         parser.add_argument('--n', type=int, default=1, help='Number of images (DALL·E)')
         parser.add_argument('--output_file', type=str, help='Output file path')
-        parser.add_argument('--output_dir', type=str, default='images', help='Output directory (DALL·E)')
+        parser.add_argument('--output_dir', type=str, help='Output directory (DALL·E, default images; Whisper --input_dir, default next to the audio)')
+        parser.add_argument('--input_dir', type=str, help='Transcribe every audio file under this directory, resumably (Whisper)')
+        parser.add_argument('--response_format', type=str, choices=['url', 'b64_json'], default='url', help='Image URLs or inline base64 data (DALL·E)')
+        parser.add_argument('--download', action='store_true', help='Download images right away (DALL·E)')
+        parser.add_argument('--jobs', type=str, help='Prompt file or JSONL of image jobs (DALL·E)')
+        parser.add_argument('--image_retries', type=int, help='Extra attempts per failed image (DALL·E)')
         parser.add_argument('--json_output', action='store_true', help='Format GPT result as JSON')
         parser.add_argument('--api_key', type=str, help='OpenAI API key')
+        parser.add_argument('--input', type=str, help='JSONL file of prompts (bulk GPT, batch) or texts to index (embed)')
+        parser.add_argument('--output', type=str, help='JSONL results file for bulk GPT mode and batch fetch (default: stdout)')
+        parser.add_argument('--concurrency', type=int, help='Parallel requests (bulk GPT, map-reduce chunks, split Whisper audio, DALL·E downloads, daemon)')
+        parser.add_argument('--index', type=str, help='Vector index path prefix (embed)')
+        parser.add_argument('--query', type=str, help='Text to search the index for (embed)')
+        parser.add_argument('--top_k', type=int, default=10, help='Number of matches to return (embed)')
+        parser.add_argument('--dimensions', type=int, help='Embedding dimensions for text-embedding-3 models (embed)')
+        parser.add_argument('--batch_id', type=str, help='Batch to check, fetch or resubmit (batch)')
+        parser.add_argument('--endpoint', type=str, choices=['chat', 'embeddings'], default='chat', help='Batch request type (batch)')
+        parser.add_argument('--wait', action='store_true', help='Poll until the batch has finished (batch)')
+        parser.add_argument('--session', type=str, nargs='?', const='chat_session.json', help='Interactive chat saved to (and resumed from) this file (GPT)')
+        parser.add_argument('--system', type=str, help='System prompt for a new session (GPT)')
+        parser.add_argument('--history_tokens', type=int, help='Token budget for session history (GPT)')
+        parser.add_argument('--summarize', action='store_true', help='Summarize trimmed session history instead of dropping it (GPT)')
+        parser.add_argument('--map_reduce', action='store_true', help='Always split the prompt file into chunks (GPT)')
+        parser.add_argument('--chunk_tokens', type=int, help='Maximum tokens per map-reduce chunk (GPT)')
+        parser.add_argument('--chunk_overlap', type=int, help='Tokens repeated between map-reduce chunks (GPT, default 200 or a quarter of --chunk_tokens)')
+        parser.add_argument('--reduce_prompt', type=str, help='Reduce prompt template with {instruction} and {results} (GPT)')
+        parser.add_argument('--socket', type=str, help='Daemon address: Unix socket path or host:port (default: $OPENAI_WRAPPER_SOCKET or a per-user socket)')
+        parser.add_argument('--no_daemon', action='store_true', help='Run in this process even if a daemon is running')
+        parser.add_argument('--rpm', type=int, help='Requests per minute shared by all daemon clients (daemon)')
+        parser.add_argument('--tpm', type=int, help='Tokens per minute shared by all daemon clients (daemon)')
 
         args = parser.parse_args(argv)
+        if args.mode not in ('batch', 'daemon') and not args.model:
+            parser.error("--model is required")
+        if args.mode == 'batch' and args.action not in ('submit', 'status', 'fetch', 'resubmit'):
+            parser.error("batch mode needs an action: submit, status, fetch or resubmit")
+        if args.mode == 'daemon' and args.action not in (None, 'status', 'stop'):
+            parser.error("daemon mode takes no action (serve), status or stop")
+        if args.chunk_overlap is not None and (args.chunk_overlap < 0 or (
+                args.chunk_tokens is not None and args.chunk_overlap >= args.chunk_tokens)):
+            parser.error("--chunk_overlap must be between 0 and --chunk_tokens - 1")
+
+        if argv is None and not args.no_daemon and not args.session:
+            # Thin client: hand the command to a running daemon, which has the
+            # SDK, clients and model list loaded already.
+            from .daemon import FORWARDED_MODES, client_argv, forward
+            if args.mode in FORWARDED_MODES:
+                code = forward(client_argv(sys.argv[1:], args), args.socket)
+                if code is not None:
+                    sys.exit(code)
 
-        openai.api_key = args.api_key if args.api_key else os.getenv("OPENAI_API_KEY")
+        import logging
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+        )
+
+        if args.mode == 'daemon':
+            from . import daemon
+            if args.action is None:
+                return daemon.serve(args.socket, args.concurrency or daemon.DEFAULT_CONCURRENCY,
+                                    args.rpm, args.tpm)
+            if args.action == 'status':
+                import json
+                result = daemon.daemon_status(args.socket)
+                message = result and json.dumps(result, indent=2)
+            else:
+                result = daemon.stop_daemon(args.socket)
+                message = result and "Daemon stopping after its running requests."
+            if echo:
+                print(message or "No daemon is running.")
+            return result
 
-        if not confirm_model(args.model):
+        from .model_manager import confirm_model
+        if args.model and not confirm_model(args.model, api_key=args.api_key):
             print(f"Model '{args.model}' is not recognized by OpenAI.")
             exit(1)
 
+        document = None
         if args.prompt_file:
             with open(args.prompt_file, 'r') as f:
-                args.prompt = f.read()
+                document = f.read()
+            # With both, --prompt is the instruction applied to the file's contents.
+            if args.prompt is None or args.mode != 'gpt':
+                args.prompt, document = document, None
 
         if args.mode == 'gpt':
-            if args.assistant_id:
-                result = use_assistant_api(args.prompt, args.assistant_id, args.api_key)
+            if args.input:
+                from .bulk_prompts import run_bulk
+                return run_bulk(args.input, args.output, args.model, args.concurrency, args.api_key)
+            if args.session:
+                from .chat_session import run_interactive
+                if document is not None:
+                    args.prompt = f"{args.prompt}\n\n{document}"
+                return run_interactive(args)
+            from .Gpt_Api_Module import use_chat_api, use_assistant_api
+            map_reduce_needed = args.map_reduce and not args.assistant_id
+            if not args.assistant_id and not map_reduce_needed:
+                # Pre-flight: don't upload a document the model would reject.
+                from .map_reduce import needs_map_reduce
+                map_reduce_needed = needs_map_reduce(args.prompt, args.model, document)
+            if document is not None and not map_reduce_needed:
+                args.prompt, document = f"{args.prompt}\n\n{document}", None
+
+            if map_reduce_needed:
+                from .map_reduce import map_reduce, DEFAULT_REDUCE_PROMPT, DEFAULT_CONCURRENCY
+                text, instruction = (document, args.prompt) if document is not None else (args.prompt, None)
+                result = map_reduce(text, args.model, instruction, args.api_key,
+                                    chunk_tokens=args.chunk_tokens, overlap_tokens=args.chunk_overlap,
+                                    reduce_prompt=args.reduce_prompt or DEFAULT_REDUCE_PROMPT,
+                                    concurrency=args.concurrency or DEFAULT_CONCURRENCY)
+            elif args.assistant_id:
+                result = use_assistant_api(args.prompt, args.assistant_id, args.api_key,
+                                           thread_id=args.thread_id, timeout=args.run_timeout)
+            elif args.stream and not args.json_output:
+                # Write deltas to the console and the output file as they arrive.
+                sinks = [sys.stdout] if echo else []
+                out = open(args.output_file, 'w') if args.output_file else None
+                if out:
+                    sinks.append(out)
+                try:
+                    def write_delta(delta):
+                        for sink in sinks:
+                            sink.write(delta)
+                            sink.flush()
+                    result = use_chat_api(args.prompt, args.model, True, args.api_key, on_delta=write_delta)
+                finally:
+                    if out:
+                        out.close()
+                if echo:
+                    print()
+                return result
             else:
                 result = use_chat_api(args.prompt, args.model, args.stream, args.api_key)
             if args.json_output:
@@ -78,7 +196,7 @@ def main(argv=None):
                     "mode": args.mode,
                     "response": result
                 }, indent=2)
-            if not argv:
+            if echo:
                 print(result)
             if args.output_file:
                 with open(args.output_file, 'w') as f:
@@ -86,13 +204,67 @@ def main(argv=None):
             return result
 
         elif args.mode == 'dalle':
+            from .Dalle_Api_Module import generate_dalle_image
+            args.output_dir = args.output_dir or 'images'
             return generate_dalle_image(args)
 
         elif args.mode == 'whisper':
-            return transcribe_audio(args)
+            if bool(args.file) == bool(args.input_dir):
+                parser.error("whisper mode needs either --file or --input_dir")
+            from .Whisper_Api_Module import transcribe_audio
+            result = transcribe_audio(args)
+            if args.input_dir and echo:
+                import json
+                print(json.dumps(result, indent=2))
+            return result
+
+        elif args.mode == 'embed':
+            if not args.index or not (args.input or args.query):
+                parser.error("embed mode needs --index and --input (build) and/or --query (search)")
+            from .embeddings import build_index, query_index
+            result = None
+            if args.input:
+                result = build_index(args.input, args.index, args.model, args.api_key,
+                                     args.concurrency, args.dimensions)
+            if args.query:
+                result = query_index(args.index, args.query, args.model, args.api_key, args.top_k)
+                if echo:
+                    for item_id, score in result:
+                        print(f"{score:.4f}\t{item_id}")
+            elif echo:
+                print(result)
+            return result
+
+        elif args.mode == 'batch':
+            from . import batch_jobs
+            if args.action == 'submit':
+                if not args.input:
+                    parser.error("batch submit needs --input")
+                requests = batch_jobs.read_requests(args.input, args.endpoint, args.model)
+                result = batch_jobs.submit_batch(requests, args.endpoint, args.api_key).id
+                if args.wait:
+                    batch_jobs.wait_for_batch(result, args.api_key)
+            elif not args.batch_id:
+                parser.error(f"batch {args.action} needs --batch_id")
+            elif args.action == 'status':
+                if args.wait:
+                    result = batch_jobs.wait_for_batch(args.batch_id, args.api_key)
+                else:
+                    result = batch_jobs.batch_status(args.batch_id, args.api_key)
+            elif args.action == 'fetch':
+                if args.wait:
+                    batch_jobs.wait_for_batch(args.batch_id, args.api_key)
+                return batch_jobs.fetch_results(args.batch_id, args.output, args.api_key)
+            else:
+                batch = batch_jobs.resubmit_failed(args.batch_id, args.api_key)
+                result = batch.id if batch else None
+            if echo:
+                import json
+                print(json.dumps(result, indent=2) if isinstance(result, dict) else result)
+            return result
 
     except Exception:
-        if not argv:
+        if echo:
             print("\n=== ERROR ===")
             print(traceback.format_exc())
         raise
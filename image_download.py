@@ -0,0 +1,120 @@
+import os
+import time
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from .metrics import CallRecord, emit, has_hooks
+
+DEFAULT_DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_TIMEOUT = 60.0  # seconds; generated image URLs are short-lived, so fail fast
+CHUNK_SIZE = 64 * 1024
+B64_CHUNK_CHARS = CHUNK_SIZE // 3 * 4  # multiple of 4, so every slice decodes on its own
+
+# Leading bytes -> file extension
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF8", ".gif"),
+]
+
+logger = logging.getLogger(__name__)
+
+_http_client = None
+_http_lock = threading.Lock()
+
+
+def _get_http_client():
+    """Shared httpx client for image downloads, so concurrent fetches reuse connections."""
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=DOWNLOAD_TIMEOUT, follow_redirects=True)
+        return _http_client
+
+
+def _extension(head):
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return ".bin"
+
+
+def _write_atomic(chunks, output_dir):
+    """
+    Stream `chunks` into a temporary file in `output_dir`, then rename it to
+    `<sha256 prefix><ext>`. Returns (path, size, sha256). Readers never see a
+    partial file, and identical images share one file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size, head = 0, b""
+    fd, tmp_path = tempfile.mkstemp(prefix=".dalle-", suffix=".part", dir=output_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        path = os.path.join(output_dir, digest.hexdigest()[:16] + _extension(head))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path, size, digest.hexdigest()
+
+
+def _b64_chunks(data):
+    for i in range(0, len(data), B64_CHUNK_CHARS):
+        yield base64.b64decode(data[i:i + B64_CHUNK_CHARS])
+
+
+def _url_chunks(url):
+    with _get_http_client().stream("GET", url) as response:
+        response.raise_for_status()
+        yield from response.iter_bytes(CHUNK_SIZE)
+
+
+def save_image(item, output_dir):
+    """
+    Write one generated image (an object or dict with `url` or `b64_json`)
+    to `output_dir` and return a report dict with path, size and timing.
+    Failures are reported in an `error` field rather than raised.
+    """
+    url = item.get("url") if isinstance(item, dict) else getattr(item, "url", None)
+    b64 = item.get("b64_json") if isinstance(item, dict) else getattr(item, "b64_json", None)
+    report = {"source": "b64_json" if b64 else "url", "url": url}
+    start = time.perf_counter()
+    try:
+        chunks = _b64_chunks(b64) if b64 else _url_chunks(url)
+        report["path"], report["bytes"], report["sha256"] = _write_atomic(chunks, output_dir)
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    report["seconds"] = round(seconds, 3)
+    if has_hooks():
+        emit(CallRecord(f"images.{report['source']}", seconds=seconds, download_bytes=report.get("bytes", 0),
+                        error=report["error"].split(":")[0] if "error" in report else None))
+    if "error" in report:
+        logger.error("Failed to save image from %s: %s", report["source"], report["error"])
+    else:
+        logger.info("Saved %s (%s bytes) in %.2fs", report["path"], report["bytes"], report["seconds"])
+    return report
+
+
+def save_images(items, output_dir, concurrency=None):
+    """Save several images with at most `concurrency` downloads in flight; reports keep input order."""
+    items = list(items)
+    if not items:
+        return []
+    workers = min(concurrency or DEFAULT_DOWNLOAD_CONCURRENCY, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: save_image(item, output_dir), items))
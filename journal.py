@@ -0,0 +1,312 @@
+import io
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_JOURNAL_PATH = "openai_journal.jsonl.gz"
+DEFAULT_MAX_PAYLOAD_CHARS = 2_000  # longer strings are cut, keeping the head and the original length
+DEFAULT_REDACT_KEYS = frozenset({"api_key", "authorization", "password", "secret", "token", "access_token"})
+DEFAULT_QUEUE_SIZE = 10_000  # entries waiting for the writer; beyond this new entries are dropped
+DEFAULT_REPLAY_CONCURRENCY = 32
+REDACTED = "[REDACTED]"
+
+logger = logging.getLogger(__name__)
+
+
+def _is_file(value):
+    return hasattr(value, "read") and hasattr(value, "seek")
+
+
+def _describe_file(f):
+    """Name and size of an upload, without reading it or moving its position."""
+    try:
+        size = os.fstat(f.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        size = len(f.getbuffer()) if hasattr(f, "getbuffer") else None
+    return {"__file__": os.path.basename(str(getattr(f, "name", "") or "upload")), "bytes": size}
+
+
+def _sanitize(value, max_chars, redact_keys):
+    """JSON-safe copy of `value` with long strings truncated and secret keys redacted."""
+    if isinstance(value, str):
+        if max_chars is not None and len(value) > max_chars:
+            return f"{value[:max_chars]}...[+{len(value) - max_chars} chars]"
+        return value
+    if isinstance(value, dict):
+        return {str(k): REDACTED if str(k).lower() in redact_keys else _sanitize(v, max_chars, redact_keys)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(v, max_chars, redact_keys) for v in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if hasattr(value, "model_dump"):
+        return _sanitize(value.model_dump(mode="json", exclude_unset=True), max_chars, redact_keys)
+    if isinstance(value, bytes):
+        return {"__bytes__": len(value)}
+    return _sanitize(str(value), max_chars, redact_keys)
+
+
+def _response_payload(response):
+    if response is None or isinstance(response, (str, dict, list)) or hasattr(response, "model_dump"):
+        return response
+    if hasattr(response, "content") and isinstance(getattr(response, "content"), bytes):
+        return {"__bytes__": len(response.content)}
+    return {"__type__": type(response).__name__}  # e.g. a Stream, consumed by the caller
+
+
+class _CallSummary:
+    """Lazy one-line description of a call's arguments, built only if the log line is emitted."""
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        parts = [_summarize_value(arg) for arg in self.args]
+        parts += [f"{key}={_summarize_value(value)}" for key, value in self.kwargs.items()]
+        return ", ".join(parts)
+
+
+def _summarize_value(value):
+    if _is_file(value):
+        info = _describe_file(value)
+        return f"<file {info['__file__']} {info['bytes']} bytes>"
+    if isinstance(value, str):
+        return repr(value) if len(value) <= 80 else f"<{len(value)} chars>"
+    if isinstance(value, (list, tuple)):
+        chars = sum(len(str(item.get("content", ""))) for item in value if isinstance(item, dict))
+        return f"<{len(value)} items" + (f", {chars} chars>" if chars else ">")
+    return repr(value) if len(repr(value)) <= 80 else f"<{type(value).__name__}>"
+
+
+def summarize_call(args, kwargs):
+    """Loggable summary of call arguments: sizes instead of payloads, files by name."""
+    return _CallSummary(args, kwargs)
+
+
+class Journal:
+    """
+    Opt-in request/response journal written as gzip-compressed JSONL.
+
+    `record` only captures references and enqueues them; a background
+    thread sanitizes (truncating strings to `max_payload_chars`, replacing
+    values of `redact_keys` with "[REDACTED]", describing uploads by name and
+    size) and writes them, so the calling thread never does I/O. When the
+    queue is full, entries are dropped and counted in `dropped` rather than
+    blocking callers. Call `close()` (or `disable_journal()`) to flush.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, max_payload_chars=DEFAULT_MAX_PAYLOAD_CHARS,
+                 redact_keys=DEFAULT_REDACT_KEYS, include_responses=True, queue_size=DEFAULT_QUEUE_SIZE):
+        self.path = path
+        self.max_payload_chars = max_payload_chars
+        self.redact_keys = frozenset(key.lower() for key in redact_keys)
+        self.include_responses = include_responses
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="openai-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, method, args, kwargs, started, seconds, response=None, error=None, retries=0):
+        """Enqueue one finished call (cheap; never blocks)."""
+        if self._closed:
+            return
+        # Uploads may be reused or closed by the caller, so they are described now.
+        args = tuple(_describe_file(a) if _is_file(a) else a for a in args)
+        kwargs = {k: _describe_file(v) if _is_file(v) else v for k, v in kwargs.items()}
+        entry = (method, args, kwargs, started, seconds, response if self.include_responses else None,
+                 None if error is None else f"{type(error).__name__}: {error}", retries)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _serialize(self, entry):
+        method, args, kwargs, started, seconds, response, error, retries = entry
+        line = {
+            "ts": round(started, 6),
+            "method": method,
+            "args": _sanitize(list(args), self.max_payload_chars, self.redact_keys),
+            "kwargs": _sanitize(kwargs, self.max_payload_chars, self.redact_keys),
+            "seconds": round(seconds, 6),
+            "retries": retries,
+            "error": error,
+        }
+        if self.include_responses and error is None:
+            line["response"] = _sanitize(_response_payload(response), self.max_payload_chars, self.redact_keys)
+        return json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+    def _writer(self):
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while True:
+                entry = self._queue.get()
+                stop = entry is None
+                batch = [] if stop else [entry]
+                while not stop:  # write everything already waiting, then flush once
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        stop = True
+                    else:
+                        batch.append(entry)
+                for item in batch:
+                    try:
+                        f.write(self._serialize(item))
+                        self.written += 1
+                    except Exception as e:
+                        logger.warning("Could not journal a %s call: %s", item[0], e)
+                f.flush()
+                if stop:
+                    return
+
+    def close(self):
+        """Write out everything queued and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self.dropped:
+            logger.warning("Journal %s dropped %s entries (queue full)", self.path, self.dropped)
+
+
+def read_journal(path):
+    """Yield the entries of a journal file (gzip or plain JSONL)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _rebuild(value):
+    """Turn recorded upload descriptions back into same-sized in-memory files."""
+    if isinstance(value, dict) and "__file__" in value:
+        f = io.BytesIO(b"\0" * (value.get("bytes") or 0))
+        f.name = value["__file__"]
+        return f
+    return value
+
+
+def _api_transport(base_url, retries, method_paths):
+    """A transport that re-sends entries through `call_openai_method`."""
+    # Imported here: openai_wrapper imports this module.
+    from .client_pool import get_client
+    from .openai_wrapper import _resolve_method, call_openai_method
+
+    # Build the client and load the SDK resources up front, so the first
+    # replayed calls don't measure (and queue behind) the SDK's lazy imports.
+    client = get_client(base_url=base_url)
+    for method_path in method_paths:
+        _resolve_method(client, method_path)
+
+    def send(entry):
+        args = [_rebuild(arg) for arg in entry.get("args", [])]
+        kwargs = {key: _rebuild(value) for key, value in entry.get("kwargs", {}).items()}
+        if base_url:
+            kwargs["base_url"] = base_url
+        response = call_openai_method(entry["method"], *args, retries=retries, cache=False, **kwargs)
+        if kwargs.get("stream"):
+            for _ in response:  # consume, as the original caller did
+                pass
+    return send
+
+
+def _replay_one(entry, transport):
+    start = time.perf_counter()
+    try:
+        transport(entry)
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, type(e).__name__
+
+
+def replay(path, speed=1.0, transport=None, base_url=None, concurrency=DEFAULT_REPLAY_CONCURRENCY,
+           methods=None, limit=None, retries=0):
+    """
+    Re-send the calls of a journal with their original spacing divided by
+    `speed` (1.0 = real time, 10 = ten times faster, 0 = as fast as possible).
+
+    Calls go through `call_openai_method` (point `base_url` or
+    OPENAI_BASE_URL at a mock server) or, with `transport`, to
+    `transport(entry)` instead. `methods` filters by method path. Returns
+    counts, errors, latencies and how late calls started against schedule.
+    """
+    entries = [e for e in read_journal(path) if not methods or e["method"] in methods]
+    entries.sort(key=lambda e: e["ts"])
+    entries = entries[:limit] if limit else entries
+    transport = transport or _api_transport(base_url, retries, {e["method"] for e in entries})
+    lags = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        first_ts = entries[0]["ts"] if entries else 0.0
+        for entry in entries:
+            due = (entry["ts"] - first_ts) / speed if speed else 0.0
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            lags.append(max(-delay, 0.0))
+            futures.append(pool.submit(_replay_one, entry, transport))
+        results = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+    errors = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    latencies = sorted(seconds for seconds, _ in results)
+    lags.sort()
+
+    def pct(values, q):
+        return round(values[min(int(q * len(values)), len(values) - 1)] * 1000, 2) if values else 0.0
+
+    return {
+        "calls": len(results),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "rps": round(len(results) / wall, 2) if wall else 0.0,
+        "original_span_s": round(entries[-1]["ts"] - first_ts, 3) if entries else 0.0,
+        "p50_ms": pct(latencies, 0.50),
+        "p95_ms": pct(latencies, 0.95),
+        "lag_p95_ms": pct(lags, 0.95),
+    }
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def enable_journal(path=DEFAULT_JOURNAL_PATH, **options):
+    """Start journaling every API call to `path`; returns the `Journal`."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal(path, **options)
+            atexit.register(disable_journal)
+        return _journal
+
+
+def disable_journal():
+    """Stop journaling and flush the file."""
+    global _journal
+    with _journal_lock:
+        journal, _journal = _journal, None
+    if journal is not None:
+        journal.close()
+
+
+def get_journal():
+    """The active journal, or None."""
+    return _journal
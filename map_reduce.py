@@ -0,0 +1,194 @@
+import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .openai_wrapper import call_openai_method
+from .token_estimator import context_window, estimate_tokens, fits_context
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_OVERLAP_TOKENS = 200
+DEFAULT_OUTPUT_RESERVE = 4_096  # tokens kept free for each reply
+MAX_CHUNK_TOKENS = 16_000  # even with a huge window, smaller chunks map faster and in parallel
+DEFAULT_INSTRUCTION = "Summarize the following text."
+MAP_TEMPLATE = "{instruction}\n\nThis is part {index} of {total} of a longer document:\n\n{chunk}"
+DEFAULT_REDUCE_PROMPT = (
+    "The responses below each answer the same request for consecutive parts of one document. "
+    "Combine them into a single coherent answer to the request, removing repetition.\n\n"
+    "Request: {instruction}\n\n{results}"
+)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def default_chunk_tokens(model):
+    """A chunk size that leaves room for the instruction and the reply."""
+    budget = context_window(model) - DEFAULT_OUTPUT_RESERVE - 500
+    return max(min(budget, MAX_CHUNK_TOKENS), 256)
+
+
+def _units(text, max_tokens, model):
+    """Paragraphs, split further into sentences (then hard-wrapped) when they exceed `max_tokens`."""
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph, model) <= max_tokens:
+            yield paragraph, "\n\n"
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            tokens = estimate_tokens(sentence, model)
+            if tokens <= max_tokens:
+                yield sentence, " "
+                continue
+            width = max(int(len(sentence) * max_tokens / tokens), 1)
+            for start in range(0, len(sentence), width):
+                yield sentence[start:start + width], ""
+        yield "", "\n\n"  # keep the paragraph break after split sentences
+
+
+def _overlap(units, overlap_tokens, model):
+    """The trailing units (or, within a long unit, trailing sentences) worth `overlap_tokens`."""
+    carried, carried_tokens = [], 0
+    for unit, separator in reversed(units):
+        cost = estimate_tokens(unit, model) if unit else 0
+        if carried_tokens + cost <= overlap_tokens:
+            carried.insert(0, (unit, separator))
+            carried_tokens += cost
+            continue
+        tail = []
+        for sentence in reversed(_SENTENCE_END.split(unit)):
+            cost = estimate_tokens(sentence, model)
+            if carried_tokens + cost > overlap_tokens:
+                break
+            tail.insert(0, sentence)
+            carried_tokens += cost
+        if tail:
+            carried.insert(0, (" ".join(tail), separator))
+        break
+    return carried
+
+
+def default_overlap_tokens(max_tokens):
+    """DEFAULT_OVERLAP_TOKENS, or a quarter of a chunk when chunks are small."""
+    return min(DEFAULT_OVERLAP_TOKENS, max_tokens // 4)
+
+
+def split_text(text, max_tokens, overlap_tokens=None, model=None):
+    """
+    Split `text` into chunks of at most `max_tokens` (estimated for `model`),
+    breaking on paragraph boundaries, else sentence boundaries, else inside a
+    sentence. Each chunk starts with up to `overlap_tokens` (default:
+    `default_overlap_tokens(max_tokens)`) of the previous chunk's trailing
+    text, so context carries across the cut.
+    """
+    if overlap_tokens is None:
+        overlap_tokens = default_overlap_tokens(max_tokens)
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be between 0 and max_tokens - 1")
+    chunks, current, current_tokens = [], [], 0
+    for unit, separator in _units(text, max_tokens - overlap_tokens, model):
+        tokens = estimate_tokens(unit, model) if unit else 0
+        if current_tokens + tokens > max_tokens and any(u for u, _ in current):
+            chunks.append("".join(u + s for u, s in current).strip())
+            current = _overlap(current, overlap_tokens, model)
+            current_tokens = sum(estimate_tokens(u, model) for u, _ in current)
+        current.append((unit, separator))
+        current_tokens += tokens
+    if any(u for u, _ in current):
+        chunks.append("".join(u + s for u, s in current).strip())
+    return chunks
+
+
+def _complete(prompt, model, api_key, **kwargs):
+    response = call_openai_method(
+        "chat.completions.create",
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        api_key=api_key,
+        **kwargs
+    )
+    return response.choices[0].message.content if response else ""
+
+
+def map_reduce(text, model, instruction=None, api_key=None, chunk_tokens=None,
+               overlap_tokens=None, reduce_prompt=DEFAULT_REDUCE_PROMPT,
+               concurrency=DEFAULT_CONCURRENCY, **kwargs):
+    """
+    Apply `instruction` to a document too large for one request.
+
+    The text is split with `split_text`, every chunk is sent with the
+    instruction in parallel ("map"), and the answers are merged by a final
+    call using `reduce_prompt` (with `{instruction}` and `{results}`
+    placeholders). If the answers themselves do not fit into one request
+    they are reduced in rounds. Extra kwargs go to every API call.
+    """
+    instruction = instruction or DEFAULT_INSTRUCTION
+    chunk_tokens = chunk_tokens or default_chunk_tokens(model)
+    chunks = split_text(text, chunk_tokens, overlap_tokens, model)
+    start = time.time()
+    logger.info("Split %s estimated tokens into %s chunks of <= %s tokens",
+                estimate_tokens(text, model), len(chunks), chunk_tokens)
+    if len(chunks) == 1:
+        return _complete(f"{instruction}\n\n{chunks[0]}", model, api_key, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda item: _complete(MAP_TEMPLATE.format(instruction=instruction, index=item[0],
+                                                       total=len(chunks), chunk=item[1]),
+                                   model, api_key, **kwargs),
+            enumerate(chunks, 1)))
+        logger.info("Map step finished in %.2fs", time.time() - start)
+
+        while True:
+            joined = "\n\n".join(f"[Part {i}]\n{result}" for i, result in enumerate(results, 1))
+            prompt = reduce_prompt.format(instruction=instruction, results=joined)
+            if estimate_tokens(prompt, model) <= chunk_tokens or len(results) <= 2:
+                break
+            # Too many partial answers for one reduce call: merge neighbouring groups first.
+            groups = split_text(joined, chunk_tokens, 0, model)
+            if len(groups) >= len(results):
+                # Each answer alone fills a chunk, so another round would not converge.
+                raise RuntimeError(f"Map-reduce cannot shrink {len(results)} partial answers below "
+                                   f"{chunk_tokens} tokens; use a larger chunk_tokens")
+            results = list(pool.map(
+                lambda group: _complete(reduce_prompt.format(instruction=instruction, results=group),
+                                        model, api_key, **kwargs),
+                groups))
+            logger.info("Intermediate reduce to %s results", len(results))
+
+    answer = _complete(prompt, model, api_key, **kwargs)
+    logger.info("Map-reduce finished in %.2fs", time.time() - start)
+    return answer
+
+
+def needs_map_reduce(prompt, model, document=None, max_output_tokens=DEFAULT_OUTPUT_RESERVE):
+    """
+    Pre-flight check: True when `prompt` (followed by `document`, if given)
+    plus `max_output_tokens` for the reply would not fit `model`'s context
+    window, so the request has to go through `map_reduce`.
+    """
+    full = f"{prompt}\n\n{document}" if document is not None else prompt
+    fits, prompt_tokens, window = fits_context([{"role": "user", "content": full}], model, max_output_tokens)
+    if not fits:
+        logger.warning("Prompt of ~%s tokens exceeds the %s-token context of %s; using map-reduce",
+                       prompt_tokens, window, model)
+    return not fits
+
+
+def complete_long_prompt(prompt, model, document=None, api_key=None, max_output_tokens=DEFAULT_OUTPUT_RESERVE,
+                         **options):
+    """
+    Answer `prompt` (applied to `document`, if given), switching to
+    `map_reduce` when the request would not fit the model's context window.
+    `options` are passed to `map_reduce` (chunk_tokens, overlap_tokens,
+    reduce_prompt, concurrency).
+    """
+    if not needs_map_reduce(prompt, model, document, max_output_tokens):
+        full = f"{prompt}\n\n{document}" if document is not None else prompt
+        return _complete(full, model, api_key)
+    if document is None:
+        return map_reduce(prompt, model, api_key=api_key, **options)
+    return map_reduce(document, model, instruction=prompt, api_key=api_key, **options)
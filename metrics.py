@@ -0,0 +1,259 @@
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord:
+    """What one API call (including its retries) cost. Passed to every hook."""
+
+    __slots__ = ("method", "model", "seconds", "retries", "error", "cached", "stream",
+                 "prompt_tokens", "completion_tokens", "upload_bytes", "download_bytes")
+
+    def __init__(self, method, model=None, seconds=0.0, retries=0, error=None, cached=False, stream=False,
+                 prompt_tokens=0, completion_tokens=0, upload_bytes=0, download_bytes=0):
+        self.method = method
+        self.model = model
+        self.seconds = seconds
+        self.retries = retries
+        self.error = error  # exception class name, None on success
+        self.cached = cached
+        self.stream = stream
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.upload_bytes = upload_bytes
+        self.download_bytes = download_bytes
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+_hooks = []  # replaced, never mutated, so emitters can iterate without a lock
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """Register `hook(record)` to be called with a `CallRecord` after every call."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = [*_hooks, hook]
+    return hook
+
+
+def remove_hook(hook):
+    """Unregister `hook`, compared by equality since every `obj.method` access is a new bound method."""
+    global _hooks
+    with _hooks_lock:
+        hooks = list(_hooks)
+        if hook in hooks:
+            hooks.remove(hook)
+        _hooks = hooks
+
+
+def has_hooks():
+    """Cheap check so callers can skip building records when nobody listens."""
+    return bool(_hooks)
+
+
+def emit(record):
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            logger.warning("Metrics hook %r failed: %s", hook, e)
+
+
+def usage_tokens(response):
+    """(prompt, completion) tokens from a response's `usage`, for any endpoint that reports it."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    prompt = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0
+    completion = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0
+    return prompt, completion
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum", "errors", "retries", "cache_hits",
+                 "prompt_tokens", "completion_tokens", "upload_bytes", "download_bytes")
+
+    def __init__(self, n_buckets):
+        self.buckets = [0] * (n_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = {}  # error class -> count
+        self.retries = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.upload_bytes = 0
+        self.download_bytes = 0
+
+
+class MetricsAggregator:
+    """
+    In-memory hook that aggregates call records per (method, model): a latency
+    histogram, error counts by class, retries, cache hits, token usage and
+    bytes moved. `snapshot()` returns plain dicts, `to_prometheus()` the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bucket_bounds = tuple(sorted(buckets))
+        self.started = time.time()
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = (record.method, record.model or "")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.bucket_bounds))
+            series.count += 1
+            if record.cached:
+                series.cache_hits += 1
+            else:
+                series.buckets[bisect.bisect_left(self.bucket_bounds, record.seconds)] += 1
+                series.sum += record.seconds
+            if record.error:
+                series.errors[record.error] = series.errors.get(record.error, 0) + 1
+            series.retries += record.retries
+            series.prompt_tokens += record.prompt_tokens
+            series.completion_tokens += record.completion_tokens
+            series.upload_bytes += record.upload_bytes
+            series.download_bytes += record.download_bytes
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """{(method, model): stats} with counts, latency sum/mean, errors, tokens and bytes."""
+        with self._lock:
+            result = {}
+            for key, s in self._series.items():
+                timed = s.count - s.cache_hits
+                result[key] = {
+                    "calls": s.count,
+                    "errors": dict(s.errors),
+                    "retries": s.retries,
+                    "cache_hits": s.cache_hits,
+                    "latency_sum_s": s.sum,
+                    "latency_mean_s": s.sum / timed if timed else None,
+                    "latency_buckets": dict(zip((*self.bucket_bounds, float("inf")), s.buckets)),
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                    "upload_bytes": s.upload_bytes,
+                    "download_bytes": s.download_bytes,
+                }
+            return result
+
+    def to_prometheus(self, prefix="openai"):
+        """Render all series in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        with self._lock:
+            series = sorted(self._series.items())
+            snapshot = [(key, s, dict(s.errors), list(s.buckets)) for key, s in series]
+
+        family("requests_total", "counter", "API calls by method, model and outcome.")
+        for (method, model), s, errors, _ in snapshot:
+            ok = s.count - sum(errors.values())
+            lines.append(f'{prefix}_requests_total{{{_labels(method, model)},status="ok"}} {ok}')
+            for error, count in sorted(errors.items()):
+                lines.append(f'{prefix}_requests_total{{{_labels(method, model)},status="{_escape(error)}"}} {count}')
+
+        family("request_duration_seconds", "histogram", "Latency of API calls, retries included.")
+        for (method, model), s, _, buckets in snapshot:
+            labels = _labels(method, model)
+            cumulative = 0
+            for bound, count in zip((*self.bucket_bounds, "+Inf"), buckets):
+                cumulative += count
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {s.sum}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        for name, attr, help_text in (
+            ("retries_total", "retries", "Retried attempts."),
+            ("cache_hits_total", "cache_hits", "Calls served from the response cache."),
+            ("upload_bytes_total", "upload_bytes", "Bytes of files uploaded."),
+            ("download_bytes_total", "download_bytes", "Bytes of generated files downloaded."),
+        ):
+            family(name, "counter", help_text)
+            for (method, model), s, _, _ in snapshot:
+                lines.append(f"{prefix}_{name}{{{_labels(method, model)}}} {getattr(s, attr)}")
+
+        family("tokens_total", "counter", "Tokens reported in response usage.")
+        for (method, model), s, _, _ in snapshot:
+            labels = _labels(method, model)
+            lines.append(f'{prefix}_tokens_total{{{labels},kind="prompt"}} {s.prompt_tokens}')
+            lines.append(f'{prefix}_tokens_total{{{labels},kind="completion"}} {s.completion_tokens}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(method, model):
+    return f'method="{_escape(method)}",model="{_escape(model)}"'
+
+
+def serve_prometheus(aggregator, port=9464, host="127.0.0.1"):
+    """Expose `aggregator` at http://host:port/metrics from a daemon thread; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = aggregator.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_port)
+    return server
+
+
+_aggregator = None
+
+
+def enable_metrics(buckets=DEFAULT_BUCKETS):
+    """Start aggregating every call in memory and return the `MetricsAggregator`."""
+    global _aggregator
+    if _aggregator is None:
+        _aggregator = add_hook(MetricsAggregator(buckets))
+    return _aggregator
+
+
+def disable_metrics():
+    global _aggregator
+    if _aggregator is not None:
+        remove_hook(_aggregator)
+        _aggregator = None
+
+
+def get_metrics():
+    """The built-in aggregator, or None when `enable_metrics` has not been called."""
+    return _aggregator
@@ -0,0 +1,559 @@
+"""
+Local stand-in for the OpenAI HTTP API, for benchmarks and offline tests.
+
+Implements chat completions (plain and streamed), image generation (URL and
+b64_json, with the URLs served by the mock itself), embeddings, audio
+transcriptions and translations, file uploads and batches (completed on the
+second poll), assistant threads, messages and runs (streamed, or completed on
+the second poll), and model listing. Latency, error rates and 429s are
+configurable. Standard library only.
+
+    with MockOpenAIServer(latency=0.02, rate_limit_rate=0.05) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url   # http://127.0.0.1:<port>/v1
+        ...
+    python mock_openai_server.py --port 8089 --latency 0.05
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ("gpt-4o-mini", "gpt-4", "dall-e-2", "dall-e-3", "whisper-1", "text-embedding-3-small")
+DEFAULT_IMAGE_BYTES = 256 * 1024
+EMBEDDING_DIMENSIONS = 64
+STREAM_WORDS = ("This ", "is ", "a ", "streamed ", "mock ", "response.")
+
+
+def _png(size):
+    """Bytes starting with a PNG signature, padded to `size` (not a decodable image)."""
+    header = b"\x89PNG\r\n\x1a\n"
+    return header + bytes(i % 251 for i in range(max(size - len(header), 0)))
+
+
+def _prompt_tokens(messages):
+    return max(len(" ".join(str(m.get("content", "")) for m in messages)) // 4, 1)
+
+
+def _chat_usage(request, cached_tokens=0):
+    prompt_tokens = _prompt_tokens(request.get("messages", []))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": len(STREAM_WORDS),
+            "total_tokens": prompt_tokens + len(STREAM_WORDS),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+
+def _chat_body(request, cached_tokens=0):
+    return {"id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "mock"), "usage": _chat_usage(request, cached_tokens), "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(STREAM_WORDS)}}]}
+
+
+def _embeddings_body(request):
+    inputs = request.get("input")
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    dimensions = int(request.get("dimensions") or EMBEDDING_DIMENSIONS)
+    data = []
+    for index, text in enumerate(inputs):
+        # Deterministic per text, so identical inputs get identical vectors.
+        rng = random.Random(hashlib.sha256(str(text).encode("utf-8")).digest())
+        vector = [rng.uniform(-1, 1) for _ in range(dimensions)]
+        if request.get("encoding_format") == "base64":
+            vector = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    tokens = sum(max(len(str(text)) // 4, 1) for text in inputs)
+    return {"object": "list", "model": request.get("model", "mock"), "data": data,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+def _run_body(run_id, thread_id, assistant_id, status="queued"):
+    return {"id": run_id, "object": "thread.run", "thread_id": thread_id, "assistant_id": assistant_id,
+            "status": status, "created_at": int(time.time()), "model": "gpt-4o-mini", "instructions": "",
+            "tools": [], "last_error": None, "incomplete_details": None, "metadata": {}}
+
+
+def _message_body(message_id, thread_id, role, text, run_id=None, assistant_id=None):
+    return {"id": message_id, "object": "thread.message", "thread_id": thread_id, "role": role,
+            "run_id": run_id, "assistant_id": assistant_id, "created_at": int(time.time()), "status": "completed",
+            "attachments": [], "metadata": {}, "content": [{"type": "text", "text": {"value": text, "annotations": []}}]}
+
+
+class _Conflict(Exception):
+    """A request the real API would refuse with a 400 (e.g. a second active run on a thread)."""
+
+
+BATCH_BODIES = {"/v1/chat/completions": _chat_body, "/v1/embeddings": _embeddings_body}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't stall on delayed ACKs
+
+    def log_message(self, *args):
+        pass
+
+    # -- helpers -------------------------------------------------------------
+    def _body(self):
+        length = int(self.headers.get("content-length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8") if content_type == "application/json" else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.send_header("x-ratelimit-limit-requests", "10000")
+        self.send_header("x-ratelimit-remaining-requests", "9999")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self):
+        """Send a configured 429/500 instead of a response; returns True if one was sent."""
+        mock = self.server.mock
+        roll = mock.random()
+        if roll < mock.rate_limit_rate:
+            mock.count("rate_limited")
+            self._send(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       headers={"retry-after-ms": str(int(mock.retry_after * 1000))})
+            return True
+        if roll < mock.rate_limit_rate + mock.error_rate:
+            mock.count("errors")
+            self._send(500, {"error": {"message": "Internal error (mock)", "type": "server_error", "code": None}})
+            return True
+        return False
+
+    # -- routing -------------------------------------------------------------
+    def do_GET(self):
+        mock = self.server.mock
+        path = self.path.split("?")[0]
+        if path.startswith("/files/"):
+            mock.count("downloads")
+            return self._send(200, mock.image, content_type="image/png")
+        if path.startswith("/v1/files/") and path.endswith("/content"):
+            content = mock.files.get(path.split("/")[3])
+            if content is None:
+                return self._send(404, {"error": {"message": "No such file (mock)", "type": "invalid_request_error"}})
+            return self._send(200, content, content_type="application/octet-stream")
+        if path.startswith("/v1/batches/"):
+            return self._batch(path.split("/")[3])
+        if path.startswith("/v1/threads/"):
+            return self._threads_get(path.split("/")[3:], parse_qs(urlsplit(self.path).query))
+        if path == "/v1/models":
+            mock.count("models")
+            data = [{"id": model, "object": "model", "created": 0, "owned_by": "mock"} for model in mock.models]
+            return self._send(200, {"object": "list", "data": data})
+        self._send(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        mock = self.server.mock
+        mock.enter()
+        try:
+            self._post()
+        finally:
+            mock.leave()
+
+    def _post(self):
+        mock = self.server.mock
+        path = self.path.split("?")[0]
+        body = self._body()
+        mock.count("requests")
+        if mock.latency:
+            time.sleep(mock.latency)
+        if self._fault():
+            return
+        if path == "/v1/chat/completions":
+            return self._chat(json.loads(body))
+        if path == "/v1/images/generations":
+            return self._images(json.loads(body))
+        if path == "/v1/embeddings":
+            return self._embeddings(json.loads(body))
+        if path == "/v1/files":
+            return self._upload(body)
+        if path == "/v1/batches":
+            return self._create_batch(json.loads(body))
+        if path in ("/v1/audio/transcriptions", "/v1/audio/translations"):
+            return self._audio(body, translate=path.endswith("translations"))
+        if path.startswith("/v1/threads"):
+            return self._threads_post(path.split("/")[3:], json.loads(body or b"{}"))
+        self._send(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+    # -- endpoints -----------------------------------------------------------
+    def _chat(self, request):
+        mock = self.server.mock
+        cached_tokens = mock.cached_prefix_tokens(request.get("messages", []))
+        usage = _chat_usage(request, cached_tokens)
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request.get("model", "mock")}
+        if not request.get("stream"):
+            return self._send(200, _chat_body(request, cached_tokens))
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for word in STREAM_WORDS:
+            if mock.token_latency:
+                time.sleep(mock.token_latency)
+            event({**chunk, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]})
+        event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event({**chunk, "choices": [], "usage": usage})
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _images(self, request):
+        mock = self.server.mock
+        n = int(request.get("n") or 1)
+        if request.get("model") == "dall-e-3" and n != 1:
+            return self._send(400, {"error": {"message": "n must be 1 for dall-e-3 (mock)",
+                                              "type": "invalid_request_error", "code": None}})
+        host = self.headers.get("host")
+        if request.get("response_format") == "b64_json":
+            encoded = base64.b64encode(mock.image).decode("ascii")
+            data = [{"b64_json": encoded} for _ in range(n)]
+        else:
+            data = [{"url": f"http://{host}/files/img-{mock.count('images')}.png"} for _ in range(n)]
+        self._send(200, {"created": int(time.time()), "data": data})
+
+    def _embeddings(self, request):
+        self._send(200, _embeddings_body(request))
+
+    def _upload(self, body):
+        match = re.search(rb'filename="[^"]*"\r\n(?:[^\r\n]+\r\n)*\r\n(.*?)\r\n--', body, re.DOTALL)
+        purpose = re.search(rb'name="purpose"\r\n\r\n([a-z_-]+)', body)
+        content = match.group(1) if match else b""
+        file_id = self.server.mock.add_file(content)
+        self._send(200, {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                         "filename": "upload.jsonl", "purpose": purpose.group(1).decode() if purpose else "batch",
+                         "status": "processed"})
+
+    def _create_batch(self, request):
+        mock = self.server.mock
+        if request.get("input_file_id") not in mock.files:
+            return self._send(404, {"error": {"message": "No such file (mock)", "type": "invalid_request_error"}})
+        self._send(200, mock.create_batch(request))
+
+    def _batch(self, batch_id):
+        batch = self.server.mock.advance_batch(batch_id)
+        if batch is None:
+            return self._send(404, {"error": {"message": "No such batch (mock)", "type": "invalid_request_error"}})
+        self._send(200, batch)
+
+    def _threads_get(self, parts, query):
+        mock = self.server.mock
+        if len(parts) == 2 and parts[1] == "messages":
+            data = mock.thread_messages(parts[0], (query.get("run_id") or [None])[0])
+            if data is None:
+                return self._send(404, {"error": {"message": "No such thread (mock)", "type": "invalid_request_error"}})
+            if (query.get("order") or ["desc"])[0] == "desc":
+                data.reverse()
+            return self._send(200, {"object": "list", "data": data, "has_more": False,
+                                    "first_id": data[0]["id"] if data else None,
+                                    "last_id": data[-1]["id"] if data else None})
+        if len(parts) == 3 and parts[1] == "runs":
+            run = mock.advance_run(parts[0], parts[2])
+            if run is None:
+                return self._send(404, {"error": {"message": "No such run (mock)", "type": "invalid_request_error"}})
+            return self._send(200, run)
+        self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _threads_post(self, parts, request):
+        mock = self.server.mock
+        try:
+            if not parts:
+                return self._send(200, mock.create_thread())
+            if len(parts) == 2 and parts[1] == "messages":
+                return self._send(200, mock.add_message(parts[0], request.get("content", "")))
+            if len(parts) == 2 and parts[1] == "runs":
+                run = mock.create_run(parts[0], request.get("assistant_id"))
+                return self._stream_run(run) if request.get("stream") else self._send(200, run)
+            if len(parts) == 4 and parts[1] == "runs" and parts[3] == "cancel":
+                return self._send(200, mock.cancel_run(parts[0], parts[2]))
+        except KeyError as e:
+            return self._send(404, {"error": {"message": f"No such object: {e} (mock)",
+                                              "type": "invalid_request_error"}})
+        except _Conflict as e:
+            return self._send(400, {"error": {"message": str(e), "type": "invalid_request_error", "code": None}})
+        self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _stream_run(self, run):
+        """Stream a run's events; with `stream_drop_after` set, cut the connection after that many deltas."""
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+        def event(name, payload):
+            data = f"event: {name}\ndata: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n"
+            data = data.encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        event("thread.run.created", run)
+        event("thread.run.in_progress", mock.advance_run(run["thread_id"], run["id"]))
+        for sent, word in enumerate(STREAM_WORDS):
+            if mock.stream_drop_after is not None and sent >= mock.stream_drop_after:
+                self.close_connection = True  # no terminating chunk: the client sees a broken stream
+                return
+            if mock.token_latency:
+                time.sleep(mock.token_latency)
+            event("thread.message.delta", {"id": "msg_mock", "object": "thread.message.delta", "delta": {
+                "content": [{"index": 0, "type": "text", "text": {"value": word}}]}})
+        event("thread.run.completed", mock.advance_run(run["thread_id"], run["id"]))
+        event("done", "[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _audio(self, body, translate):
+        match = re.search(rb'name="response_format"\r\n\r\n([a-z_]+)', body)
+        response_format = match.group(1).decode() if match else "json"
+        text = "Mock translation." if translate else "Mock transcription."
+        if response_format == "text":
+            return self._send(200, text + "\n", content_type="text/plain")
+        if response_format == "srt":
+            return self._send(200, f"1\n00:00:00,000 --> 00:00:01,000\n{text}\n", content_type="text/plain")
+        if response_format == "vtt":
+            return self._send(200, f"WEBVTT\n\n00:00:00.000 --> 00:00:01.000\n{text}\n", content_type="text/plain")
+        if response_format == "verbose_json":
+            return self._send(200, {"task": "translate" if translate else "transcribe", "language": "english",
+                                    "duration": 1.0, "text": text,
+                                    "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": 1.0, "text": text}]})
+        self._send(200, {"text": text})
+
+
+class MockOpenAIServer:
+    """
+    Threaded mock of the OpenAI API on 127.0.0.1.
+
+    `latency` delays every POST, `token_latency` each streamed chunk;
+    `error_rate` and `rate_limit_rate` are the probabilities of answering
+    with a 500 or a 429 (which carries a `retry-after-ms` of `retry_after`);
+    `batch_error_rate` fails individual requests inside batches;
+    `stream_drop_after` cuts streamed assistant runs after that many deltas
+    (the run still finishes server side). Assistant ids must start with
+    "asst_", and a thread refuses new messages and runs while one is
+    active. Chat usage reports `cached_tokens` for message prefixes seen in
+    earlier requests. `counts` tracks requests, downloads, errors, 429s and
+    the peak number of concurrent POSTs.
+    """
+
+    def __init__(self, port=0, latency=0.0, token_latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=0.01, image_bytes=DEFAULT_IMAGE_BYTES, models=DEFAULT_MODELS, seed=None,
+                 batch_error_rate=0.0):
+        self.port = port
+        self.latency = latency
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.image = _png(image_bytes)
+        self.models = list(models)
+        self.batch_error_rate = batch_error_rate
+        self.files = {}
+        self.batches = {}
+        self.threads = {}  # thread id -> {"messages": [...], "run": id of the latest run}
+        self.runs = {}
+        self.stream_drop_after = None
+        self._prompt_prefixes = set()
+        self.counts = {}
+        self.active = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return self.counts[name]
+
+    def enter(self):
+        """Track POSTs in progress; `counts["max_concurrent"]` is the peak."""
+        with self._lock:
+            self.active += 1
+            self.counts["max_concurrent"] = max(self.counts.get("max_concurrent", 0), self.active)
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def cached_prefix_tokens(self, messages):
+        """
+        Mimic prompt caching: the tokens of the longest leading run of messages
+        that an earlier request sent byte for byte.
+        """
+        keys = [hashlib.sha256(json.dumps(messages[:n], sort_keys=True).encode("utf-8")).digest()
+                for n in range(1, len(messages) + 1)]
+        with self._lock:
+            hits = [n for n, key in enumerate(keys, 1) if key in self._prompt_prefixes]
+            self._prompt_prefixes.update(keys)
+        return _prompt_tokens(messages[:max(hits)]) if hits else 0
+
+    def add_file(self, content):
+        file_id = f"file-mock{self.count('files')}"
+        self.files[file_id] = content
+        return file_id
+
+    def create_batch(self, request):
+        batch_id = f"batch_mock{self.count('batches')}"
+        lines = self.files[request["input_file_id"]].decode("utf-8").splitlines()
+        batch = {"id": batch_id, "object": "batch", "endpoint": request["endpoint"], "status": "validating",
+                 "input_file_id": request["input_file_id"], "completion_window": request["completion_window"],
+                 "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+                 "metadata": request.get("metadata"),
+                 "request_counts": {"total": sum(1 for line in lines if line.strip()), "completed": 0, "failed": 0}}
+        with self._lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def advance_batch(self, batch_id):
+        """Return the batch, moving it one step validating -> in_progress -> completed per poll."""
+        batch = self.batches.get(batch_id)
+        if batch is None or batch["status"] == "completed":
+            return batch
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+            return batch
+        output, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if self.random() < self.batch_error_rate:
+                errors.append({"id": f"batch_req_{len(errors)}", "custom_id": item["custom_id"], "response": {
+                    "status_code": 500, "request_id": "mock",
+                    "body": {"error": {"message": "Internal error (mock)", "type": "server_error"}}}, "error": None})
+            else:
+                output.append({"id": f"batch_req_{len(output)}", "custom_id": item["custom_id"], "error": None,
+                               "response": {"status_code": 200, "request_id": "mock",
+                                            "body": BATCH_BODIES[item["url"]](item["body"])}})
+        encode = lambda lines: "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        batch.update(status="completed", output_file_id=self.add_file(encode(output)) if output else None,
+                     error_file_id=self.add_file(encode(errors)) if errors else None)
+        batch["request_counts"].update(completed=len(output), failed=len(errors))
+        return batch
+
+    def create_thread(self):
+        thread_id = f"thread_mock{self.count('threads')}"
+        with self._lock:
+            self.threads[thread_id] = {"messages": [], "run": None}
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+    def _check_idle(self, thread_id):
+        """The thread, refusing it while a run is active (caller holds the lock)."""
+        thread = self.threads[thread_id]
+        run = self.runs.get(thread["run"])
+        if run is not None and run["status"] in ("queued", "in_progress"):
+            raise _Conflict(f"Thread {thread_id} already has an active run {run['id']}.")
+        return thread
+
+    def add_message(self, thread_id, content):
+        message_id = f"msg_mock{self.count('messages')}"
+        with self._lock:
+            message = _message_body(message_id, thread_id, "user", content)
+            self._check_idle(thread_id)["messages"].append(message)
+        return message
+
+    def create_run(self, thread_id, assistant_id):
+        if not str(assistant_id).startswith("asst_"):
+            raise KeyError(assistant_id)
+        run_id = f"run_mock{self.count('runs')}"
+        with self._lock:
+            self._check_idle(thread_id)["run"] = run_id
+            self.runs[run_id] = _run_body(run_id, thread_id, assistant_id)
+            return dict(self.runs[run_id])
+
+    def advance_run(self, thread_id, run_id):
+        """Return the run, moving it one step queued -> in_progress -> completed (adding the reply)."""
+        with self._lock:
+            run = self.runs.get(run_id)
+            if run is None or run["thread_id"] != thread_id:
+                return None
+            if run["status"] == "queued":
+                run["status"] = "in_progress"
+            elif run["status"] == "in_progress":
+                run["status"] = "completed"
+                self.threads[thread_id]["messages"].append(_message_body(
+                    f"msg_mock_reply_{run_id}", thread_id, "assistant", "".join(STREAM_WORDS),
+                    run_id, run["assistant_id"]))
+            return dict(run)
+
+    def cancel_run(self, thread_id, run_id):
+        with self._lock:
+            run = self.runs[run_id]
+            if run["status"] in ("queued", "in_progress"):
+                run["status"] = "cancelled"
+            return dict(run)
+
+    def thread_messages(self, thread_id, run_id=None):
+        with self._lock:
+            thread = self.threads.get(thread_id)
+            if thread is None:
+                return None
+            return [m for m in thread["messages"] if run_id is None or m["run_id"] == run_id]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}/v1"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.request_queue_size = 128
+        self._httpd.mock = self
+        threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI API server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--token_latency", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Fraction answered with 429")
+    args = parser.parse_args(argv)
+    server = MockOpenAIServer(args.port, args.latency, args.token_latency, args.error_rate,
+                              args.rate_limit_rate).start()
+    print(f"Mock OpenAI API listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
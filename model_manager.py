@@ -1,54 +1,182 @@
 import os
 import json
-import openai
 import time
+import logging
+import tempfile
+import threading
+from .client_pool import get_client
 
 CONFIG_FILE = 'model_config.json'
 MAX_CACHE_AGE = 7 * 24 * 3600  # 1 week in seconds
+NEGATIVE_CACHE_TTL = 10 * 60  # seconds an unknown model name stays rejected without a new lookup
+STAT_INTERVAL = 1.0  # seconds between mtime checks of the config file
 
-def get_available_models(api_key=None):
-    """Returns model list from local config if exists. If missing, stale, or invalid, updates from OpenAI."""
-    if os.path.exists(CONFIG_FILE):
-        mtime = os.path.getmtime(CONFIG_FILE)
-        age = time.time() - mtime
-        print(f"Model config last modified: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime))}")
+logger = logging.getLogger(__name__)
 
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                data = json.load(f)
-            if isinstance(data.get("models"), list) and data["models"]:
-                if age > MAX_CACHE_AGE and api_key:
-                    print("Model cache older than 1 week. Refreshing...")
-                    return update_model_config(api_key=api_key)
-                print(f"Loaded {len(data['models'])} cached models.")
-                return data["models"]
-        except json.JSONDecodeError:
-            print("Failed to parse model config; attempting update.")
-
-    if api_key:
-        return update_model_config(api_key=api_key)
-    return []
 
-def update_model_config(api_key=None):
-    """Fetches models from OpenAI and updates the local config."""
+def _write_config(models, path=CONFIG_FILE):
+    """Atomically replace the config file so concurrent readers never see a partial write."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".model_config.", suffix=".tmp", dir=directory)
     try:
-        client = openai.OpenAI(api_key=api_key) if api_key else openai
-        response = client.models.list()
-        models = sorted(m.id for m in response.data)
-        with open(CONFIG_FILE, 'w') as f:
+        with os.fdopen(fd, 'w') as f:
             json.dump({
                 "models": models,
                 "last_updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
             }, f, indent=2)
-        print(f"Model config updated successfully. {len(models)} models saved.")
-        return models
-    except Exception as e:
-        print(f"Error updating models from OpenAI: {e}")
-        return []
-
-def confirm_model(model_name):
-    """Confirms if a model is in the current config; updates config if not found."""
-    models = get_available_models()
-    if model_name not in models:
-        models = update_model_config()
-    return model_name in models
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def fetch_models(api_key=None):
+    """Fetch the sorted list of model ids from OpenAI."""
+    response = get_client(api_key=api_key).models.list()
+    return sorted(m.id for m in response.data)
+
+
+class ModelRegistry:
+    """
+    Process-wide, in-memory view of `model_config.json`.
+
+    Lookups are set membership tests. The file is re-read only when its mtime
+    changes (checked at most every STAT_INTERVAL seconds). Once the list is
+    older than `max_age` it is refreshed from OpenAI on a background thread
+    while callers keep getting the current list. Unknown names are remembered
+    for `negative_ttl` seconds so a typo costs at most one refresh.
+    """
+
+    def __init__(self, config_file=CONFIG_FILE, max_age=MAX_CACHE_AGE,
+                 negative_ttl=NEGATIVE_CACHE_TTL):
+        self.config_file = config_file
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._models = frozenset()
+        self._sorted = []
+        self._mtime = None
+        self._checked = 0.0
+        self._unknown = {}  # model name -> time the negative entry expires
+        self._refresh_thread = None
+        self._generation = 0  # bumped by every refresh attempt
+        self._last_attempt = None
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked < STAT_INTERVAL:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.config_file)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.config_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Failed to read model config %s: %s", self.config_file, e)
+            return
+        models = data.get("models") if isinstance(data, dict) else None
+        if isinstance(models, list):
+            self._set_models(models)
+            self._mtime = mtime
+            logger.debug("Loaded %s cached models from %s", len(models), self.config_file)
+
+    def _set_models(self, models):
+        with self._lock:
+            self._models = frozenset(models)
+            self._sorted = sorted(self._models)
+            self._unknown.clear()
+
+    def is_stale(self):
+        return self._mtime is None or time.time() - self._mtime > self.max_age
+
+    def models(self, api_key=None):
+        """The cached model list, refreshed in the background when stale."""
+        self._reload_if_changed()
+        if not self._sorted and api_key:
+            return self.refresh(api_key)
+        if self.is_stale() and (api_key or os.getenv("OPENAI_API_KEY")):
+            self.refresh_in_background(api_key)
+        return list(self._sorted)
+
+    def __contains__(self, model_name):
+        return self.contains(model_name)
+
+    def contains(self, model_name, api_key=None):
+        """
+        Whether `model_name` is a known model. A name missing from the cache
+        triggers at most one blocking refresh per `negative_ttl`.
+        """
+        self._reload_if_changed()
+        if model_name in self._models:
+            if self.is_stale():
+                self.refresh_in_background(api_key)
+            return True
+        now = time.monotonic()
+        with self._lock:
+            expires = self._unknown.get(model_name)
+            if expires is not None and expires > now:
+                return False
+        self.refresh(api_key, coalesce=True)
+        found = model_name in self._models
+        if not found:
+            with self._lock:
+                self._unknown[model_name] = now + self.negative_ttl
+        return found
+
+    def refresh(self, api_key=None, coalesce=False):
+        """
+        Fetch the model list from OpenAI now and persist it. Returns the new list.
+        With `coalesce`, callers that queued behind a running refresh reuse its result.
+        """
+        generation = self._generation
+        with self._refresh_lock:
+            if coalesce and generation != self._generation:
+                return list(self._sorted)
+            self._generation += 1
+            self._last_attempt = time.monotonic()
+            try:
+                models = fetch_models(api_key)
+                _write_config(models, self.config_file)
+            except Exception as e:
+                logger.error("Error updating models from OpenAI: %s", e)
+                return list(self._sorted) if self._sorted else []
+            self._set_models(models)
+            try:
+                self._mtime = os.path.getmtime(self.config_file)
+            except OSError:
+                self._mtime = time.time()
+            logger.info("Model config updated successfully. %s models saved.", len(models))
+            return list(self._sorted)
+
+    def refresh_in_background(self, api_key=None):
+        """Start a refresh unless one is already running; never blocks."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if self._last_attempt is not None and time.monotonic() - self._last_attempt < self.negative_ttl:
+                return  # a recent attempt failed or the file is being kept old on purpose
+            self._refresh_thread = threading.Thread(
+                target=self.refresh, args=(api_key,), name="model-registry-refresh", daemon=True)
+            self._refresh_thread.start()
+
+
+registry = ModelRegistry()
+
+
+def get_available_models(api_key=None):
+    """Returns model list from local config if exists. If missing, fetches it; if stale, refreshes it in the background."""
+    return registry.models(api_key=api_key)
+
+def update_model_config(api_key=None):
+    """Fetches models from OpenAI and updates the local config."""
+    return registry.refresh(api_key=api_key)
+
+def confirm_model(model_name, api_key=None):
+    """Confirms if a model is in the current config; refreshes the config once if not found."""
+    return registry.contains(model_name, api_key=api_key)
@@ -1,67 +1,360 @@
 import openai
 import time
+import asyncio
+import inspect
+import weakref
 from openai import OpenAIError
-import os
-import json
 import logging
+from .client_pool import get_client, get_async_client
+from .response_cache import get_cache, should_cache, request_key
+from .rate_limiter import get_rate_limiter
+from .single_flight import get_coalescer, should_coalesce, flight_key
+from .metrics import CallRecord, emit, has_hooks, usage_tokens
+from .journal import get_journal, summarize_call
+from .retry_policy import (
+    PERMANENT_ERROR_CODES, RETRY, SKIP,
+    error_code, get_retry_policy, get_bad_request_handler, get_circuit_breaker,
+)
 
-DEFAULT_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+DEFAULT_ASYNC_CONCURRENCY = 100  # in-flight requests per event loop
 
-# Configure module logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+# Module logger; handlers are configured by the CLI (entrypoint.main) or the host application
 logger = logging.getLogger(__name__)
 
+_async_concurrency = DEFAULT_ASYNC_CONCURRENCY
+_async_semaphores = weakref.WeakKeyDictionary()  # loop -> asyncio.Semaphore
+
+
+def _resolve_method(client, method_path):
+    method_func = client
+    for part in method_path.split("."):
+        method_func = getattr(method_func, part)
+    return method_func
+
+
+def _cache_key(method_path, args, kwargs, base_url, use_cache):
+    cache = get_cache()
+    if cache is None or not should_cache(method_path, kwargs, use_cache):
+        return None, None
+    return cache, request_key(method_path, args, kwargs, base_url)
+
+
+def _prepare_call(method_path, kwargs, client_getter):
+    api_key = kwargs.pop('api_key', None)
+    base_url = kwargs.pop('base_url', None)
+    options = {
+        "cache": kwargs.pop('cache', None),
+        "coalesce": kwargs.pop('coalesce', None),
+        "policy": kwargs.pop('retry_policy', None) or get_retry_policy(),
+        "on_bad_request": kwargs.pop('on_bad_request', None) or get_bad_request_handler(),
+        "retries": 0,
+        "upload_bytes": 0,
+    }
+    client = client_getter(api_key=api_key, base_url=base_url)
+    options["breaker"] = get_circuit_breaker(f"{client.base_url} {method_path}")
+    options["base_url"] = base_url
+    options["api_key"] = api_key
+    options["limiter"] = get_rate_limiter() if kwargs.get('model') else None
+    if options["limiter"]:
+        # The raw response exposes the x-ratelimit-* headers the limiter feeds on.
+        return _resolve_method(client.with_raw_response, method_path), options
+    return _resolve_method(client, method_path), options
+
+
+def _reserve_capacity(options, kwargs):
+    """Returns (reservation, seconds to wait) for the active rate limiter, if any."""
+    limiter = options["limiter"]
+    if not limiter:
+        return None, 0.0
+    model_limiter, estimated, wait = limiter.acquire(options["api_key"], kwargs['model'], kwargs)
+    return (model_limiter, estimated), wait
+
+
+def _settle_capacity(reservation, response=None, error=None):
+    """Feed response headers and real token usage back into the limiter."""
+    if reservation is None:
+        return response
+    model_limiter, estimated = reservation
+    if error is not None:
+        model_limiter.update_from_headers(getattr(getattr(error, 'response', None), 'headers', None))
+        return None
+    model_limiter.update_from_headers(response.headers)
+    response = response.parse()
+    usage = getattr(response, 'usage', None)
+    model_limiter.settle(estimated, getattr(usage, 'total_tokens', None))
+    return response
+
+
+def _flight_key(method_path, args, kwargs, options):
+    if not should_coalesce(method_path, kwargs, options["coalesce"]):
+        return None
+    return flight_key(method_path, args, kwargs, options["base_url"], options["api_key"])
+
+
+def _call_record(method_path, args, kwargs, options, start, response=None, error=None):
+    prompt_tokens, completion_tokens = usage_tokens(response)
+    return CallRecord(
+        method_path, kwargs.get('model'), time.perf_counter() - start, options["retries"],
+        type(error).__name__ if error is not None else None, stream=bool(kwargs.get('stream')),
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, upload_bytes=options["upload_bytes"],
+    )
+
+
+def _emit_cache_hit(method_path, kwargs):
+    if has_hooks():
+        emit(CallRecord(method_path, kwargs.get('model'), cached=True))
+
+
+def _file_positions(args, kwargs):
+    # Uploads are read by the SDK; remember where they started so a retry resends them in full.
+    return [(f, f.tell()) for f in (*args, *kwargs.values())
+            if hasattr(f, 'seek') and hasattr(f, 'tell') and hasattr(f, 'read')]
+
+
+def _upload_bytes(positions):
+    """Bytes the uploads will send (from each start position to EOF), measured before the SDK reads them."""
+    total = 0
+    for f, position in positions:
+        try:
+            total += f.seek(0, 2) - position
+            f.seek(position)
+        except OSError:
+            pass  # not seekable: size unknown
+    return total
 
-def call_openai_method(method_path, *args, retries=DEFAULT_RETRIES, **kwargs):
+
+def _rewind(positions):
+    for f, position in positions:
+        f.seek(position)
+
+
+def call_openai_method(method_path, *args, retries=None, **kwargs):
     """
     Call an OpenAI method via string path, like 'chat.completions.create'.
     Example: call_openai_method("chat.completions.create", model="gpt-4", ...)
+
+    `api_key` and `base_url` select a pooled client from `client_pool`, so
+    repeated calls reuse the same connections instead of reconnecting.
+
+    When a response cache is enabled (`response_cache.enable_cache`),
+    deterministic calls are served from it; pass `cache=True` to also cache
+    e.g. image generations, or `cache=False` to bypass it.
+
+    Transient failures (429, 5xx, timeouts) are retried according to the
+    `retry_policy` (default: `retry_policy.get_retry_policy()`, with `retries`
+    overriding its max_retries); other errors fail fast. A shared circuit
+    breaker per endpoint raises `CircuitOpenError` while the API is down.
+    On `BadRequestError` the `on_bad_request` handler decides whether to
+    retry, skip (return None) or raise; the default raises.
+
+    With `rate_limiter.enable_rate_limiting()` active, calls that name a
+    `model` first wait for RPM/TPM capacity for their (api_key, model).
+
+    With `single_flight.enable_coalescing()` (for the read-like methods in
+    `single_flight.COALESCED_METHODS`) or `coalesce=True`, a call identical
+    to one already in flight waits for it and shares its response or
+    exception instead of sending its own request.
     """
-    api_key = kwargs.pop('api_key', os.getenv("OPENAI_API_KEY"))
-    client = openai.OpenAI(api_key=api_key)
+    method_func, options = _prepare_call(method_path, kwargs, get_client)
+    max_retries = options["policy"].max_retries if retries is None else retries
+
+    # Log a summary of the request (sizes, not payloads; built only when DEBUG is on)
+    logger.debug("OpenAI Request: method=%s, %s", method_path, summarize_call(args, kwargs))
+
+    cache, cache_key = _cache_key(method_path, args, kwargs, options["base_url"], options["cache"])
+    if cache_key:
+        hit, cached = cache.get(cache_key)
+        if hit:
+            logger.debug("Cache hit for %s", method_path)
+            _emit_cache_hit(method_path, kwargs)
+            return cached
+
+    key = _flight_key(method_path, args, kwargs, options)
+    if key:
+        return get_coalescer().do(
+            key, lambda: _send(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key))
+    return _send(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
 
-    parts = method_path.split(".")
-    method_func = client
-    for part in parts:
-        method_func = getattr(method_func, part)
 
-    # Log the request payload
-    logger.debug("OpenAI Request: method=%s, args=%s, kwargs=%s", method_path, args, kwargs)
+def _send(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key):
+    """Send the request (with retries) and report it to the metrics hooks and journal, if any."""
+    journal = get_journal()
+    if journal is None and not has_hooks():
+        return _attempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
+    start = time.perf_counter()
+    try:
+        response = _attempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
+    except BaseException as e:
+        _report(journal, method_path, args, kwargs, options, start, error=e)
+        raise
+    _report(journal, method_path, args, kwargs, options, start, response=response)
+    return response
+
+
+def _report(journal, method_path, args, kwargs, options, start, response=None, error=None):
+    if has_hooks():
+        emit(_call_record(method_path, args, kwargs, options, start, response=response, error=error))
+    if journal is not None:
+        seconds = time.perf_counter() - start
+        journal.record(method_path, args, kwargs, time.time() - seconds, seconds, response=response,
+                       error=error, retries=options["retries"])
+
 
+def _attempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key):
+    """The retry loop of `call_openai_method`."""
+    policy, breaker = options["policy"], options["breaker"]
+    positions = _file_positions(args, kwargs)
+    options["upload_bytes"] = _upload_bytes(positions)
     attempt = 0
-    while attempt <= retries:
+    while True:
+        probe = breaker.before_call()
+        reservation, wait = _reserve_capacity(options, kwargs)
         try:
-            return method_func(*args, **kwargs)
+            if wait:
+                time.sleep(wait)
+            response = _settle_capacity(reservation, method_func(*args, **kwargs))
         except OpenAIError as e:
-            if "BadRequestError" in str(type(e)):
+            _settle_capacity(reservation, error=e)
+            breaker.record(e)
+            if isinstance(e, openai.BadRequestError) and error_code(e) not in PERMANENT_ERROR_CODES:
                 logger.error("OpenAI BadRequestError: %s", e)
-                print("Pausing for debugging. Choose an option:")
-                print("1: Retry the OpenAI call")
-                print("2: Continue to the next file")
-                print("3: Terminate the pipeline")
-
-                choice = input("Enter your choice (1, 2, or 3): ")
-
-                if choice == "1":
-                    attempt = 0  # Reset attempt counter to retry
+                decision = options["on_bad_request"](e, method_path)
+                if decision == RETRY:
+                    options["retries"] += 1
+                    _rewind(positions)
                     continue
-                elif choice == "2":
+                if decision == SKIP:
                     return None  # Return None to signal skipping the file
-                elif choice == "3":
-                    raise  # Re-raise the exception to terminate the pipeline
-                else:
-                    logger.warning("Invalid choice. Retrying the OpenAI call.")
-                    attempt = 0
+                raise
+            if attempt >= max_retries or not policy.is_retryable(e):
+                raise
+            delay = policy.delay(attempt, e)
+            attempt += 1
+            options["retries"] += 1
+            logger.warning("Retrying OpenAI call in %.2fs due to error: %s (attempt %s/%s)",
+                           delay, e, attempt, max_retries)
+            time.sleep(delay)
+            _rewind(positions)
+            continue
+        except BaseException:
+            if probe:
+                breaker.release_probe()  # e.g. a transport error or an interrupt: no verdict on the endpoint
+            raise
+        breaker.record(None)
+        if cache_key:
+            cache.set(cache_key, response)
+        return response
+
+
+def set_async_concurrency(limit: int) -> None:
+    """Cap the number of concurrent `acall_openai_method` requests per event loop."""
+    global _async_concurrency
+    if limit < 1:
+        raise ValueError("Async concurrency limit must be at least 1")
+    _async_concurrency = limit
+    _async_semaphores.clear()
+
+
+def _async_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _async_semaphores[loop] = asyncio.Semaphore(_async_concurrency)
+    return semaphore
+
+
+async def acall_openai_method(method_path, *args, retries=None, **kwargs):
+    """
+    Async counterpart of `call_openai_method` backed by a pooled `AsyncOpenAI`.
+    Example: await acall_openai_method("chat.completions.create", model="gpt-4", ...)
+
+    At most `set_async_concurrency()` requests per event loop are in flight at
+    once; further callers wait for a free slot. Retries, circuit breaking and
+    the `on_bad_request` handler (which may be a coroutine) work as in the
+    sync version, with backoff waits done via `asyncio.sleep`.
+    """
+    method_func, options = _prepare_call(method_path, kwargs, get_async_client)
+    max_retries = options["policy"].max_retries if retries is None else retries
+
+    logger.debug("OpenAI Request: method=%s, %s", method_path, summarize_call(args, kwargs))
+
+    cache, cache_key = _cache_key(method_path, args, kwargs, options["base_url"], options["cache"])
+    if cache_key:
+        hit, cached = await asyncio.to_thread(cache.get, cache_key)
+        if hit:
+            logger.debug("Cache hit for %s", method_path)
+            _emit_cache_hit(method_path, kwargs)
+            return cached
+
+    key = _flight_key(method_path, args, kwargs, options)
+    if key:
+        return await get_coalescer().ado(
+            key, lambda: _asend(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key))
+    return await _asend(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
+
+
+async def _asend(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key):
+    """Send the request (with retries) and report it to the metrics hooks and journal, if any."""
+    journal = get_journal()
+    if journal is None and not has_hooks():
+        return await _aattempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
+    start = time.perf_counter()
+    try:
+        response = await _aattempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key)
+    except BaseException as e:
+        _report(journal, method_path, args, kwargs, options, start, error=e)
+        raise
+    _report(journal, method_path, args, kwargs, options, start, response=response)
+    return response
+
+
+async def _aattempts(method_func, options, method_path, args, kwargs, max_retries, cache, cache_key):
+    """The retry loop of `acall_openai_method`."""
+    policy, breaker = options["policy"], options["breaker"]
+    positions = _file_positions(args, kwargs)
+    options["upload_bytes"] = _upload_bytes(positions)
+    attempt = 0
+    while True:
+        probe = breaker.before_call()
+        reservation, wait = _reserve_capacity(options, kwargs)
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            async with _async_semaphore():
+                response = _settle_capacity(reservation, await method_func(*args, **kwargs))
+        except OpenAIError as e:
+            _settle_capacity(reservation, error=e)
+            breaker.record(e)
+            if isinstance(e, openai.BadRequestError) and error_code(e) not in PERMANENT_ERROR_CODES:
+                logger.error("OpenAI BadRequestError: %s", e)
+                decision = options["on_bad_request"](e, method_path)
+                if inspect.isawaitable(decision):
+                    decision = await decision
+                if decision == RETRY:
+                    options["retries"] += 1
+                    _rewind(positions)
                     continue
-            if attempt == retries:
+                if decision == SKIP:
+                    return None
+                raise
+            if attempt >= max_retries or not policy.is_retryable(e):
                 raise
-            time.sleep(RETRY_DELAY)
+            delay = policy.delay(attempt, e)
             attempt += 1
-            logger.warning("Retrying OpenAI call due to error: %s (attempt %s/%s)", e, attempt, retries)
+            options["retries"] += 1
+            logger.warning("Retrying OpenAI call in %.2fs due to error: %s (attempt %s/%s)",
+                           delay, e, attempt, max_retries)
+            await asyncio.sleep(delay)
+            _rewind(positions)
+            continue
+        except BaseException:
+            if probe:
+                breaker.release_probe()  # e.g. a transport error or an interrupt: no verdict on the endpoint
+            raise
+        breaker.record(None)
+        if cache_key:
+            await asyncio.to_thread(cache.set, cache_key, response)
+        return response
 
 
 def generate_content(prompt: str, api_key: str, model: str = "gpt-4") -> str | None:
@@ -86,45 +379,45 @@ def generate_content(prompt: str, api_key: str, model: str = "gpt-4") -> str | N
         return None
 
 
+async def agenerate_content(prompt: str, api_key: str, model: str = "gpt-4") -> str | None:
+    """Async version of `generate_content`."""
+
+    messages = [{"role": "user", "content": prompt}]
+    logger.debug("Generating content with model %s", model)
+
+    try:
+        response = await acall_openai_method(
+            "chat.completions.create",
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            api_key=api_key,
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error("OpenAI call failed: %s", e)
+        return None
+
+
 def generate_content_v2(prompt: str, api_key: str, model: str):
-    """Alternative content generation method with manual retry logic."""
+    """
+    Deterministic (temperature 0) content generation that raises on failure.
 
-    openai.api_key = api_key
-    max_retries = 3
-    retry_delay = 5  # seconds
+    Retries follow the shared retry policy, with up to two retries by default.
+    """
 
-    for attempt in range(max_retries):
-        try:
-            messages = [{"role": "user", "content": prompt}]
-            response = openai.chat.completions.create(
-                model=model,
-                messages=json.dumps(messages),
-                temperature=0.0,
-                # max_tokens=max_tokens,  # Consider re-introducing if needed
-            )
-            return response.choices[0].message.content
-        except openai.APIConnectionError as e:
-            logger.warning(
-                "Retrying OpenAI call due to error: %s (attempt %s/%s)",
-                e,
-                attempt + 1,
-                max_retries,
-            )
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                raise
-        except openai.APIError as e:
-            logger.warning(
-                "Retrying OpenAI call due to error: %s (attempt %s/%s)",
-                e,
-                attempt + 1,
-                max_retries,
-            )
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                raise
-        except Exception as e:
-            logger.error("OpenAI call failed: %s", e)
-            raise
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        response = call_openai_method(
+            "chat.completions.create",
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            # max_tokens=max_tokens,  # Consider re-introducing if needed
+            api_key=api_key,
+            retries=2,
+        )
+    except Exception as e:
+        logger.error("OpenAI call failed: %s", e)
+        raise
+    return response.choices[0].message.content if response else None
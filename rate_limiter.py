@@ -0,0 +1,176 @@
+import os
+import time
+import logging
+import threading
+from .token_estimator import estimate_message_tokens, estimate_tokens
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+DEFAULT_MAX_OUTPUT_TOKENS = 1024  # assumed completion size when a request sets no limit
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of rejecting callers.
+
+    `reserve()` always deducts immediately, letting the level go negative, and
+    returns how long the caller must wait for its reservation to be covered.
+    Callers therefore queue up in arrival order and nobody fires early.
+    """
+
+    def __init__(self, capacity, per_minute=None):
+        self.capacity = float(capacity)
+        self.rate = float(per_minute if per_minute is not None else capacity) / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._level -= amount
+            if self._level >= 0:
+                return 0.0
+            return -self._level / self.rate if self.rate else float("inf")
+
+    def credit(self, amount):
+        """Give back (or, if negative, take) tokens after the real cost is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+    def sync(self, limit=None, remaining=None):
+        """Adopt the server's view of the limit and of what is left in the window."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit:
+                self.capacity = float(limit)
+                self.rate = float(limit) / 60.0
+            if remaining is not None:
+                self._level = min(self._level, float(remaining))
+
+    @property
+    def level(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._level
+
+
+def estimate_request_tokens(kwargs):
+    """
+    Token cost of a request: the prompt as `token_estimator` counts it, plus
+    the completion budget, which OpenAI counts against TPM up front.
+    """
+    model = kwargs.get("model")
+    prompt = estimate_message_tokens(kwargs["messages"], model) if kwargs.get("messages") else 0
+    for key in ("input", "prompt"):
+        value = kwargs.get(key)
+        if isinstance(value, str):
+            prompt += estimate_tokens(value, model)
+        elif isinstance(value, (list, tuple)):
+            # Strings, or already tokenized inputs (lists of token ids).
+            prompt += sum(estimate_tokens(v, model) if isinstance(v, str) else len(v) for v in value)
+    if "messages" in kwargs:
+        completion = (kwargs.get("max_completion_tokens") or kwargs.get("max_tokens")
+                      or DEFAULT_MAX_OUTPUT_TOKENS) * (kwargs.get("n") or 1)
+    else:
+        completion = 0
+    return max(prompt + completion, 1)
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one (api_key, model)."""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def reserve(self, tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def settle(self, estimated, actual):
+        if actual is not None:
+            self.tokens.credit(estimated - actual)
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if limit is not None or remaining is not None:
+                bucket.sync(limit, remaining)
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Client-side RPM/TPM limiter shared by all calls in the process.
+
+    Each (api_key, model) pair gets its own buckets, seeded from `limits`
+    (model -> (rpm, tpm)) or the defaults and then continuously corrected from
+    the `x-ratelimit-*` headers of every response.
+    """
+
+    def __init__(self, default_rpm=DEFAULT_RPM, default_tpm=DEFAULT_TPM, limits=None):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.limits = dict(limits or {})
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter_for(self, api_key, model):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        key = (api_key, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                rpm, tpm = self.limits.get(model, (self.default_rpm, self.default_tpm))
+                limiter = self._limiters[key] = ModelLimiter(rpm, tpm)
+            return limiter
+
+    def acquire(self, api_key, model, kwargs):
+        """
+        Reserve capacity for a request and return (limiter, estimated_tokens, wait).
+        The caller must wait `wait` seconds before sending.
+        """
+        limiter = self.limiter_for(api_key, model)
+        estimated = estimate_request_tokens(kwargs)
+        wait = limiter.reserve(estimated)
+        if wait:
+            logger.debug("Rate limit for %s: waiting %.2fs", model, wait)
+        return limiter, estimated, wait
+
+
+_active_limiter = None
+
+
+def enable_rate_limiting(**settings):
+    """Turn on client-side rate limiting for `call_openai_method` and return the limiter."""
+    global _active_limiter
+    _active_limiter = RateLimiter(**settings)
+    return _active_limiter
+
+
+def disable_rate_limiting():
+    global _active_limiter
+    _active_limiter = None
+
+
+def get_rate_limiter():
+    """The active `RateLimiter`, or None when rate limiting is off."""
+    return _active_limiter
@@ -0,0 +1,255 @@
+import os
+import io
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import importlib
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(".openai_cache", "responses.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 3600  # seconds; image URLs expire much sooner, pass a shorter ttl for those
+
+# Keyword arguments that only affect transport, never the response content.
+IGNORED_KWARGS = {"api_key", "timeout", "extra_headers", "cache"}
+
+# Methods whose output is a pure function of their input unless sampling is enabled.
+DETERMINISTIC_METHODS = {
+    "embeddings.create",
+    "moderations.create",
+    "audio.transcriptions.create",
+    "audio.translations.create",
+}
+SAMPLED_METHODS = {"chat.completions.create", "completions.create"}
+
+logger = logging.getLogger(__name__)
+
+
+def _file_digest(f):
+    position = f.tell()
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(1024 * 1024), b""):
+        digest.update(block)
+    f.seek(position)
+    return {"file": os.path.basename(getattr(f, "name", "") or ""), "sha256": digest.hexdigest()}
+
+
+def _normalize(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, io.IOBase) or hasattr(value, "read"):
+        return _file_digest(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return repr(value)
+
+
+def request_key(method_path, args=(), kwargs=None, base_url=None):
+    """
+    Canonical SHA-256 of a request: method path, arguments and target server.
+
+    Keyword order does not matter, transport-only kwargs such as `api_key` are
+    excluded, and uploaded files are identified by the hash of their content.
+    """
+    params = {k: v for k, v in (kwargs or {}).items() if k not in IGNORED_KWARGS}
+    canonical = json.dumps(
+        [method_path, base_url, list(args), params],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_normalize,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(method_path, kwargs):
+    """Whether a call is expected to return the same response for the same input."""
+    if kwargs.get("stream"):
+        return False
+    if method_path in DETERMINISTIC_METHODS:
+        return not kwargs.get("temperature")
+    if method_path in SAMPLED_METHODS:
+        return kwargs.get("temperature") == 0 or kwargs.get("top_p") == 0
+    return False
+
+
+def should_cache(method_path, kwargs, cache=None):
+    """
+    Decide whether a call goes through the cache.
+
+    `cache=None` follows `is_deterministic`, `cache=True` forces caching (e.g.
+    for image generation) and `cache=False` bypasses it. Streams never cache.
+    """
+    if cache is False or kwargs.get("stream"):
+        return False
+    return cache is True or is_deterministic(method_path, kwargs)
+
+
+def _encode(value):
+    if isinstance(value, str):
+        kind, payload = "str", value
+    elif hasattr(value, "model_dump_json"):
+        cls = type(value)
+        kind, payload = f"{cls.__module__}:{cls.__qualname__}", value.model_dump_json()
+    else:
+        return None
+    return zlib.compress(json.dumps([kind, payload]).encode("utf-8"))
+
+
+def _decode(blob):
+    kind, payload = json.loads(zlib.decompress(blob))
+    if kind == "str":
+        return payload
+    module_name, qualname = kind.split(":", 1)
+    cls = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        cls = getattr(cls, part)
+    return cls.model_validate_json(payload)
+
+
+class ResponseCache:
+    """
+    On-disk response cache backed by SQLite.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the cache grows past `max_bytes` or `max_entries`. SQLite in
+    WAL mode makes it safe to share one cache file between threads and
+    processes; each thread gets its own connection.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 max_entries=None, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, expires REAL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return (hit, value) for `key`, refreshing its LRU position on a hit."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(False)
+            return False, None
+        try:
+            value = _decode(row[0])
+        except Exception as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", key, e)
+            with conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(False)
+            return False, None
+        with conn:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return True, value
+
+    def set(self, key, value, ttl=None):
+        """Store `value`; returns False if the response type cannot be cached."""
+        blob = _encode(value)
+        if blob is None:
+            return False
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, expires, now),
+            )
+            self._evict(conn, now)
+        return True
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS running "
+                "FROM entries) WHERE running > ?)",
+                (self.max_bytes,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size on disk."""
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_active_cache = None
+
+
+def enable_cache(path=DEFAULT_CACHE_PATH, **settings):
+    """Turn on response caching for `call_openai_method` and return the cache."""
+    global _active_cache
+    _active_cache = ResponseCache(path, **settings)
+    return _active_cache
+
+
+def disable_cache():
+    global _active_cache
+    _active_cache = None
+
+
+def get_cache():
+    """The active `ResponseCache`, or None when caching is off."""
+    return _active_cache
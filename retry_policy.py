@@ -0,0 +1,288 @@
+import re
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import openai
+
+DEFAULT_RETRIES = 3
+DEFAULT_BASE_DELAY = 1.0  # seconds
+DEFAULT_MAX_DELAY = 60.0  # seconds
+DEFAULT_FAILURE_THRESHOLD = 5  # consecutive outage-type failures before the circuit opens
+DEFAULT_RECOVERY_TIMEOUT = 30.0  # seconds the circuit stays open before a probe call
+
+RETRY = "retry"
+SKIP = "skip"
+RAISE = "raise"
+
+# Error codes that arrive with a retryable status but will not succeed on retry.
+PERMANENT_ERROR_CODES = {"insufficient_quota", "content_policy_violation", "billing_hard_limit_reached"}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(openai.OpenAIError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Circuit open for {endpoint}; retry in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def parse_duration(value):
+    """Parse '20ms', '1.5s', '6m0s' or a bare number of seconds; None if unparseable."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from Retry-After or x-ratelimit-reset-* headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        seconds = parse_duration(value)
+        if seconds is None:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return max(seconds, 0.0)
+
+    resets = [parse_duration(headers.get(name))
+              for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def error_code(error):
+    code = getattr(error, "code", None)
+    if code:
+        return code
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        return body.get("code") or (body.get("error") or {}).get("code")
+    return None
+
+
+def is_retryable(error):
+    """
+    Classify an error: rate limits, timeouts, connection errors and 5xx are
+    transient; bad requests, auth failures, content-policy rejections and
+    exhausted quota fail fast.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if error_code(error) in PERMANENT_ERROR_CODES:
+        return False
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def is_outage(error):
+    """Errors that suggest the endpoint itself is unhealthy (feeds the circuit breaker)."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter that defers to server-provided wait hints.
+
+    The n-th retry waits a random time in [0, min(max_delay, base_delay * multiplier**n)]
+    ("full jitter"), so workers hitting the same 429 do not retry in lockstep.
+    If the error carries a Retry-After or x-ratelimit-reset-* header that wait
+    is used instead, stretched by up to 20% so callers still spread out.
+    """
+
+    def __init__(self, max_retries=DEFAULT_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, multiplier=2.0, jitter=True):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def is_retryable(self, error):
+        """Override to change which errors are retried."""
+        return is_retryable(error)
+
+    def delay(self, attempt, error=None):
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            spread = random.uniform(1.0, 1.2) if self.jitter else 1.0
+            return min(hinted, self.max_delay) * spread
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while an endpoint is down.
+
+    After `failure_threshold` consecutive outage errors the circuit opens and
+    calls raise `CircuitOpenError` without touching the network. Once
+    `recovery_timeout` has passed, a single probe call is let through; its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 recovery_timeout=DEFAULT_RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise `CircuitOpenError` if the call may not run; returns True for the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.recovery_timeout and not self._probing:
+                self._probing = True
+                return True
+            raise CircuitOpenError(self.name, max(self.recovery_timeout - waited, 0.0))
+
+    def release_probe(self):
+        """End a probe that told nothing about the endpoint, so the next call probes instead."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit for %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning("Circuit for %s opened after %s failure(s)", self.name, self._failures)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record(self, error):
+        """Update the breaker from a call outcome (None for success)."""
+        if error is None:
+            self.record_success()
+        elif is_outage(error):
+            self.record_failure()
+        elif isinstance(error, openai.APIStatusError):
+            self.record_success()  # the endpoint answered; the request was the problem
+        else:
+            self.release_probe()
+
+
+def raise_bad_request(error, method_path):
+    """Default `BadRequestError` handler: fail immediately, never block."""
+    return RAISE
+
+
+def interactive_bad_request_handler(error, method_path):
+    """The old debugging prompt. Blocks on stdin, so only use it interactively."""
+    print("Pausing for debugging. Choose an option:")
+    print("1: Retry the OpenAI call")
+    print("2: Continue to the next file")
+    print("3: Terminate the pipeline")
+
+    choice = input("Enter your choice (1, 2, or 3): ")
+    if choice == "2":
+        return SKIP
+    if choice == "3":
+        return RAISE
+    if choice != "1":
+        logger.warning("Invalid choice. Retrying the OpenAI call.")
+    return RETRY
+
+
+_default_policy = RetryPolicy()
+_bad_request_handler = raise_bad_request
+_breakers = {}
+_breaker_settings = {}
+_breakers_lock = threading.Lock()
+
+
+def get_retry_policy():
+    return _default_policy
+
+
+def set_retry_policy(policy):
+    """Replace the process-wide default `RetryPolicy`."""
+    global _default_policy
+    _default_policy = policy
+
+
+def get_bad_request_handler():
+    return _bad_request_handler
+
+
+def set_bad_request_handler(handler):
+    """
+    Install the callback consulted on `BadRequestError`.
+
+    It is called as handler(error, method_path) and returns RETRY, SKIP
+    (the call returns None) or RAISE. Async callers may install a coroutine.
+    """
+    global _bad_request_handler
+    _bad_request_handler = handler or raise_bad_request
+
+
+def configure_circuit_breakers(**settings):
+    """Set failure_threshold / recovery_timeout for breakers created from now on."""
+    with _breakers_lock:
+        _breaker_settings.update(settings)
+        _breakers.clear()
+
+
+def get_circuit_breaker(endpoint):
+    """The shared breaker for `endpoint`, created on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint, **_breaker_settings)
+        return breaker
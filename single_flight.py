@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from .response_cache import DETERMINISTIC_METHODS, SAMPLED_METHODS, request_key
+
+# Calls that only read or compute, so identical concurrent ones may share a response.
+# Calls that create something (images, files, batches, thread messages, runs) are
+# left out: merging them would return one result to callers who each asked for their own.
+COALESCED_METHODS = DETERMINISTIC_METHODS | SAMPLED_METHODS | {
+    "models.list",
+    "models.retrieve",
+    "files.list",
+    "files.retrieve",
+    "files.content",
+    "batches.list",
+    "batches.retrieve",
+    "beta.assistants.retrieve",
+    "beta.threads.retrieve",
+    "beta.threads.messages.list",
+    "beta.threads.runs.retrieve",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class _AsyncFlight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    with the same key while it is in flight wait for it and receive the same
+    result or exception. Nothing is remembered once the call finishes, so
+    this never serves stale data; pair it with `response_cache` for that.
+
+    Threads and each asyncio event loop have separate in-flight tables, as
+    a coroutine cannot wait on a thread's call without blocking its loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight
+        self._async_flights = weakref.WeakKeyDictionary()  # loop -> {key: _AsyncFlight}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run `fn()` unless an identical call is in flight; then share its outcome."""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            if flight.followers:
+                logger.debug("Shared one call between %s callers", flight.followers + 1)
+            flight.done.set()
+
+    async def ado(self, key, coro_fn):
+        """
+        Async version of `do`: awaits `coro_fn()` once per in-flight key on this
+        loop. The call runs in its own task, so cancelling any one caller (the
+        first included) leaves it running for the others; it is cancelled only
+        when every caller waiting on it has been.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            flights = self._async_flights.setdefault(loop, {})
+            flight = flights.get(key)
+            if flight is None:
+                flight = flights[key] = _AsyncFlight(loop.create_task(coro_fn()))
+                flight.task.add_done_callback(lambda task: self._land(flights, key, flight))
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _land(self, flights, key, flight):
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+        if flight.waiters > 1:
+            logger.debug("Shared one call between %s callers", flight.waiters)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced,
+                    "in_flight": len(self._flights) + sum(len(f) for f in self._async_flights.values())}
+
+
+def flight_key(method_path, args, kwargs, base_url=None, api_key=None):
+    """Canonical request key; calls under different API keys are never merged."""
+    key = request_key(method_path, args, kwargs, base_url)
+    if api_key:
+        key += ":" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return key
+
+
+def should_coalesce(method_path, kwargs, coalesce=None):
+    """
+    `coalesce=None` follows `enable_coalescing` for the methods in
+    COALESCED_METHODS, True/False force it per call. Streams are never
+    shared, since each caller must consume its own.
+    """
+    if coalesce is False or kwargs.get("stream"):
+        return False
+    return coalesce is True or (_enabled and method_path in COALESCED_METHODS)
+
+
+_coalescer = SingleFlight()
+_enabled = False
+
+
+def enable_coalescing():
+    """Share in-flight identical calls made through `call_openai_method`; returns the coalescer."""
+    global _enabled
+    _enabled = True
+    return _coalescer
+
+
+def disable_coalescing():
+    global _enabled
+    _enabled = False
+
+
+def get_coalescer():
+    """The process-wide `SingleFlight`; its `stats()` count the coalesced calls."""
+    return _coalescer
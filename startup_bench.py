@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark for the CLI.
+
+Runs `python -m <package> ...` in fresh interpreters, reports the median wall
+time and the slowest imports (from `python -X importtime`), and fails if the
+start-up exceeds its budget or loads modules it should not need.
+
+    python startup_bench.py            # report + budget check
+    python startup_bench.py --runs 20 --budget_ms 150
+"""
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent
+PACKAGE = ROOT.name
+
+COLD_START_BUDGET_MS = 200  # wall time for `--help`, interpreter start-up included
+IMPORT_BUDGET_MS = 60  # cumulative import time of the package for `--help`
+
+# Scenario -> (CLI args or python snippet, top-level modules that must not be imported)
+SCENARIOS = {
+    "help": (["gpt", "--help"], ["openai", "httpx"]),
+    "whisper_import": (
+        f"import {PACKAGE}.Whisper_Api_Module",
+        [f"{PACKAGE}.Gpt_Api_Module", f"{PACKAGE}.Dalle_Api_Module"],
+    ),
+}
+
+
+def _command(target, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    if isinstance(target, str):
+        return cmd + ["-c", target]
+    return cmd + ["-m", PACKAGE, *target]
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def imported_modules(target):
+    """Modules imported by a fresh interpreter running `target`, with their timings."""
+    result = subprocess.run(_command(target, importtime=True), cwd=ROOT.parent,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{target!r} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure(target, runs=5):
+    """Median wall-clock milliseconds of `runs` fresh interpreters running `target`."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(_command(target), cwd=ROOT.parent, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def check_forbidden_imports():
+    """Return a list of (scenario, module) pairs that were imported but should not be."""
+    violations = []
+    for name, (target, forbidden) in SCENARIOS.items():
+        modules = imported_modules(target)
+        violations += [(name, module) for module in forbidden if module in modules]
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start time")
+    parser.add_argument("--runs", type=int, default=10, help="Interpreter launches to time")
+    parser.add_argument("--budget_ms", type=float, default=COLD_START_BUDGET_MS, help="Wall-time budget for --help")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args(argv)
+
+    baseline_ms = measure("pass", args.runs)
+    help_ms = measure(SCENARIOS["help"][0], args.runs)
+    modules = imported_modules(SCENARIOS["help"][0])
+    package_us = modules.get(PACKAGE, (0, 0))[1] + modules.get(f"{PACKAGE}.entrypoint", (0, 0))[1]
+
+    print(f"Interpreter start-up:      {baseline_ms:7.1f} ms")
+    print(f"`{PACKAGE} gpt --help`:    {help_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"Package import time:       {package_us / 1000:7.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    print("\nSlowest imports for --help:")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:7.2f} ms self  {cumulative_us / 1000:7.2f} ms total  {name}")
+
+    failures = [f"{scenario}: imported {module}" for scenario, module in check_forbidden_imports()]
+    if help_ms > args.budget_ms:
+        failures.append(f"--help took {help_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if package_us / 1000 > IMPORT_BUDGET_MS:
+        failures.append(f"package import took {package_us / 1000:.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,8 @@ import sys
 def main():
     parser = argparse.ArgumentParser(description="Run all test scripts")
     parser.add_argument("--api_key", help="OpenAI API key", default=None)
+    parser.add_argument("--benchmark", action="store_true", help="Also run the mock-server benchmark")
+    parser.add_argument("--baseline", help="Benchmark baseline JSON to compare against")
     args = parser.parse_args()
 
     # Ensure project root is on the path
@@ -28,6 +30,11 @@ def main():
         except Exception as e:
             failures += 1
             print(f"{path.name}: FAIL - {e}")
+    if args.benchmark:
+        import benchmark
+        bench_argv = ["--requests", "50"] + (["--baseline", args.baseline] if args.baseline else [])
+        if benchmark.main(bench_argv):
+            failures += 1
     if failures:
         sys.exit(f"{failures} test(s) failed")
 
@@ -6,16 +6,20 @@ if __name__ == '__main__' and __package__ is None:
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import queue
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from .model_manager import get_available_models, update_model_config
-from .openai_wrapper import call_openai_method
-import openai
+from .chat_stream import stream_chat
 
 import os
 import json
 
 CONFIG_CACHE = "gui_test_config.json"
+AUTOSAVE_DELAY_MS = 500  # quiet period after the last edit before the config is written
+UI_POLL_MS = 30  # how often worker messages are drained into the widgets
+MAX_UI_MESSAGES = 200  # per drain, so a fast stream can't starve Tk's own events
 
 class OpenAITestGUI:
     def __init__(self, root):
@@ -28,10 +32,18 @@ class OpenAITestGUI:
         self.output_path = tk.StringVar()
 
         self.models = []
-        self._load_config()
+        self._ui_queue = queue.Queue()
+        self._save_pool = ThreadPoolExecutor(max_workers=1)  # one writer keeps saves in order
+        self._save_after_id = None
+        self._run_id = 0
+        self._stream = None
+        self._cancelled = None
 
         self._build_ui()
+        self._load_config()
         self._setup_autosave()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
 
     def _build_ui(self):
         ttk.Label(self.root, text="API Key:").grid(row=0, column=0, sticky='w')
@@ -50,9 +62,11 @@ class OpenAITestGUI:
         ttk.Entry(self.root, textvariable=self.output_path, width=40).grid(row=3, column=1, sticky='ew')
         ttk.Button(self.root, text="Browse", command=self._browse_file).grid(row=3, column=2)
 
-        ttk.Button(self.root, text="Run Test", command=self._run_test).grid(row=4, column=0, pady=5)
+        self.run_button = ttk.Button(self.root, text="Run Test", command=self._run_test)
+        self.run_button.grid(row=4, column=0, pady=5)
         ttk.Button(self.root, text="Clear All", command=self._clear_all).grid(row=4, column=1, pady=5)
-        ttk.Label(self.root, text="").grid(row=4, column=2)
+        self.cancel_button = ttk.Button(self.root, text="Cancel", command=self._cancel_test, state='disabled')
+        self.cancel_button.grid(row=4, column=2)
 
         self.log_box = tk.Text(self.root, height=15, width=100)
         self.log_box.grid(row=5, column=0, columnspan=3, sticky='nsew')
@@ -66,22 +80,40 @@ class OpenAITestGUI:
             self.output_path.set(file_path)
 
     def _load_models(self):
-        try:
-            key = self.api_key.get().strip()
-            self.models = get_available_models() if not key else update_model_config(api_key=key)
-            self.model_combo['values'] = self.models
-            self._log(f"Loaded {len(self.models)} models from config.")
-        except Exception as e:
-            self._log("\n=== ERROR LOADING MODELS ===\n" + traceback.format_exc())
+        key = self.api_key.get().strip()
+        threading.Thread(target=self._fetch_models, args=(key,), daemon=True).start()
 
-    def _save_config(self):
-        data = {
+    def _fetch_models(self, key):
+        try:
+            models = get_available_models() if not key else update_model_config(api_key=key)
+            self._post(None, self._show_models, models)
+        except Exception:
+            self._post(None, self._log, "\n=== ERROR LOADING MODELS ===\n" + traceback.format_exc())
+
+    def _show_models(self, models):
+        self.models = models
+        self.model_combo['values'] = self.models
+        self._log(f"Loaded {len(self.models)} models from config.")
+
+    def _config_data(self):
+        return {
             "prompt": self.prompt_entry.get("1.0", tk.END).strip(),
             "model": self.model.get(),
             "output_path": self.output_path.get()
         }
-        with open(CONFIG_CACHE, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+
+    def _save_config(self):
+        """Snapshot the fields now (UI thread) and write them on the background writer."""
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+            self._save_after_id = None
+        return self._save_pool.submit(_write_config, self._config_data())
+
+    def _schedule_save(self, *args):
+        """Debounce: save once edits have paused for AUTOSAVE_DELAY_MS."""
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+        self._save_after_id = self.root.after(AUTOSAVE_DELAY_MS, self._save_config)
 
     def _load_config(self):
         if os.path.exists(CONFIG_CACHE):
@@ -101,49 +133,110 @@ class OpenAITestGUI:
         self._save_config()
 
     def _run_test(self):
-        threading.Thread(target=self._execute_test, daemon=True).start()
-
-    def _execute_test(self):
-        self.log_box.delete('1.0', tk.END)
         key = self.api_key.get().strip()
         model = self.model.get().strip()
         prompt = self.prompt_entry.get("1.0", tk.END).strip()
         output_path = self.output_path.get().strip()
 
+        self.log_box.delete('1.0', tk.END)
         if not key or not model or not prompt:
             self._log("ERROR: Missing required fields.")
             return
 
+        self._save_config()
+        self._run_id += 1
+        self._stream = stream_chat(prompt, model, api_key=key)  # sends nothing until iterated
+        self._cancelled = threading.Event()
+        self.run_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self._log("=== MODEL RESPONSE ===")
+        threading.Thread(target=self._execute_test,
+                         args=(self._run_id, self._stream, self._cancelled, output_path), daemon=True).start()
+
+    def _execute_test(self, run_id, stream, cancelled, output_path):
+        """Worker thread: stream the reply; every widget update goes through the UI queue."""
         try:
-            self._save_config()
-            response = call_openai_method(
-                "chat.completions.create",
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                api_key=key
-            )
-            content = response.choices[0].message.content
-            self._log("\n=== MODEL RESPONSE ===\n" + content)
-
+            for delta in stream:
+                if cancelled.is_set():
+                    break
+                self._post(run_id, self._append, delta)
+            if cancelled.is_set():
+                return
+            content = stream.text
             if output_path:
                 with open(output_path, 'w', encoding='utf-8') as f:
                     f.write(content)
-                self._log(f"\nSaved response to {output_path}")
-
-        except Exception as e:
-            err_trace = traceback.format_exc()
-            self._log("\n=== ERROR ===\n" + err_trace)
+                self._post(run_id, self._log, f"\n\nSaved response to {output_path}")
+            ttft = stream.metrics.time_to_first_token
+            if ttft is not None:
+                self._post(run_id, self._log, f"\n\n(first token {ttft:.2f}s, total {stream.metrics.total_duration:.2f}s)")
+        except Exception:
+            if not cancelled.is_set():
+                self._post(run_id, self._log, "\n=== ERROR ===\n" + traceback.format_exc())
+        finally:
+            stream.close()
+            self._post(run_id, self._finish_run)
+
+    def _cancel_test(self):
+        """Abort the in-flight request: closing the stream drops its HTTP connection."""
+        if self._cancelled is None:
+            return
+        self._cancelled.set()
+        threading.Thread(target=self._stream.close, daemon=True).start()
+        self._log("\n=== CANCELLED ===")
+        self._finish_run()
+        self._run_id += 1  # ignore anything the aborted worker still posts
+
+    def _finish_run(self):
+        self._stream = None
+        self._cancelled = None
+        self.run_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+
+    def _post(self, run_id, callback, *args):
+        """
+        Queue `callback(*args)` to run on the Tk thread (safe from any thread).
+        It is dropped if `run_id` is no longer the current run; None always runs.
+        """
+        self._ui_queue.put((run_id, callback, args))
+
+    def _drain_ui_queue(self):
+        try:
+            for _ in range(MAX_UI_MESSAGES):
+                run_id, callback, args = self._ui_queue.get_nowait()
+                if run_id is None or run_id == self._run_id:
+                    callback(*args)
+        except queue.Empty:
+            pass
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
 
     def _setup_autosave(self):
-        self.prompt_entry.bind("<KeyRelease>", lambda e: self._save_config())
-        self.model.trace_add("write", lambda *args: self._save_config())
-        self.output_path.trace_add("write", lambda *args: self._save_config())
+        self.prompt_entry.bind("<KeyRelease>", self._schedule_save)
+        self.model.trace_add("write", self._schedule_save)
+        self.output_path.trace_add("write", self._schedule_save)
+
+    def _on_close(self):
+        if self._save_after_id is not None:
+            self._save_config()
+        self._save_pool.shutdown(wait=True)
+        self.root.destroy()
+
+    def _append(self, text):
+        self.log_box.insert(tk.END, text)
+        self.log_box.see(tk.END)
 
     def _log(self, message):
         self.log_box.insert(tk.END, message + "\n")
         self.log_box.see(tk.END)
 
 
+def _write_config(data):
+    tmp = CONFIG_CACHE + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, CONFIG_CACHE)
+
+
 if __name__ == '__main__':
     root = tk.Tk()
     app = OpenAITestGUI(root)
@@ -0,0 +1,131 @@
+import asyncio
+import importlib
+import os
+import pathlib
+import sys
+import tempfile
+import wave
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+openai_wrapper = importlib.import_module(f"{root.name}.openai_wrapper")
+gpt = importlib.import_module(f"{root.name}.Gpt_Api_Module")
+dalle = importlib.import_module(f"{root.name}.Dalle_Api_Module")
+whisper = importlib.import_module(f"{root.name}.Whisper_Api_Module")
+metrics = importlib.import_module(f"{root.name}.metrics")
+retry_policy = importlib.import_module(f"{root.name}.retry_policy")
+response_cache = importlib.import_module(f"{root.name}.response_cache")
+single_flight = importlib.import_module(f"{root.name}.single_flight")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+mock_openai_server = importlib.import_module(f"{root.name}.mock_openai_server")
+
+REPLY = "".join(mock_openai_server.STREAM_WORDS)
+
+
+def _chat(prompt, **kwargs):
+    return openai_wrapper.acall_openai_method("chat.completions.create", model="gpt-4o-mini",
+                                              messages=[{"role": "user", "content": prompt}], **kwargs)
+
+
+async def _limits_and_retries(server):
+    # At most three requests reach the server at once.
+    openai_wrapper.set_async_concurrency(3)
+    try:
+        responses = await asyncio.gather(*(_chat(f"limit {i}") for i in range(12)))
+    finally:
+        openai_wrapper.set_async_concurrency(openai_wrapper.DEFAULT_ASYNC_CONCURRENCY)
+    assert len(responses) == 12 and server.counts["max_concurrent"] == 3
+    try:
+        openai_wrapper.set_async_concurrency(0)
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+    # About a third of the requests fail with a 500 or a 429; every call still succeeds after retries.
+    # (The circuit breaker would open on a run of failures, so it is relaxed meanwhile.)
+    records = []
+    metrics.add_hook(records.append)
+    retry_policy.configure_circuit_breakers(failure_threshold=1000)
+    server.error_rate, server.rate_limit_rate = 0.15, 0.15
+    try:
+        replies = await asyncio.gather(*(_chat(f"retry {i}") for i in range(20)))
+    finally:
+        server.error_rate = server.rate_limit_rate = 0.0
+        retry_policy.configure_circuit_breakers(failure_threshold=retry_policy.DEFAULT_FAILURE_THRESHOLD)
+        metrics.remove_hook(records.append)
+    assert all(r.choices[0].message.content == REPLY for r in replies)
+    failures = server.counts.get("errors", 0) + server.counts.get("rate_limited", 0)
+    assert failures > 0 and sum(record.retries for record in records) == failures
+
+
+async def _cache_and_coalescing(server, tmp):
+    def embed():
+        return openai_wrapper.acall_openai_method("embeddings.create", model="text-embedding-3-small", input="same")
+
+    response_cache.enable_cache(os.path.join(tmp, "cache.sqlite3"))
+    try:
+        before = server.counts["requests"]
+        first = await embed()
+        second = await embed()
+        assert server.counts["requests"] - before == 1
+        assert second.data[0].embedding == first.data[0].embedding
+    finally:
+        response_cache.disable_cache()
+
+    coalescer = single_flight.enable_coalescing()
+    try:
+        stats = coalescer.stats()
+        before = server.counts["requests"]
+        results = await asyncio.gather(*(_chat("shared") for _ in range(5)))
+        assert server.counts["requests"] - before == 1 and all(r is results[0] for r in results)
+        assert coalescer.stats()["coalesced"] - stats["coalesced"] == 4
+    finally:
+        single_flight.disable_coalescing()
+
+
+async def _helpers(tmp):
+    assert await openai_wrapper.agenerate_content("Hi", None, model="gpt-4o-mini") == REPLY.strip()
+    assert await gpt.ause_chat_api("Hi", "gpt-4o-mini") == REPLY
+
+    deltas = []
+
+    async def on_delta(delta):
+        deltas.append(delta)
+
+    assert await gpt.ause_chat_api("Hi", "gpt-4o-mini", stream=True, on_delta=on_delta) == REPLY
+    assert "".join(deltas) == REPLY
+    assert await gpt.ause_assistant_api("Hi", "asst_async") == REPLY
+
+    images = os.path.join(tmp, "images")
+    args = SimpleNamespace(model="dall-e-2", prompt="An image", size="256x256", n=2, quality="standard", style=None,
+                           api_key=None, output_dir=images, response_format="b64_json", download=False,
+                           concurrency=2, jobs=None)
+    records = await dalle.agenerate_dalle_image(args)
+    assert len(records) == 2 and all(os.path.exists(record["path"]) for record in records), records
+
+    audio = os.path.join(tmp, "clip.wav")
+    with wave.open(audio, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\x00\x00" * 8000)
+    output = os.path.join(tmp, "clip.txt")
+    args = SimpleNamespace(model="whisper-1", file=audio, translate=False, language=None, format="text",
+                           api_key=None, output_file=output)
+    await whisper.atranscribe_audio(args)
+    with open(output) as f:
+        assert f.read().strip() == "Mock transcription."
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, mock_openai_server.MockOpenAIServer(latency=0.02, seed=7) as server, \
+            benchmark.mock_environment(server, tmp):
+        asyncio.run(_limits_and_retries(server))
+        asyncio.run(_cache_and_coalescing(server, tmp))
+        asyncio.run(_helpers(tmp))
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,95 @@
+import importlib
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import wave
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+audio_batch = importlib.import_module(f"{root.name}.audio_batch")
+entrypoint = importlib.import_module(f"{root.name}.entrypoint")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def _wav(path, seconds):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\x01\x00" * int(8000 * seconds))
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer() as server, benchmark.mock_environment(server, tmp):
+        audio = os.path.join(tmp, "audio")
+        out = os.path.join(tmp, "transcripts")
+        _wav(os.path.join(audio, "a.wav"), 1)
+        _wav(os.path.join(audio, "day2", "b.wav"), 2)
+        shutil.copy(os.path.join(audio, "a.wav"), os.path.join(audio, "day2", "a_copy.wav"))
+        # Listed, but gone by the time it is read (a dangling link).
+        os.symlink(os.path.join(tmp, "missing.wav"), os.path.join(audio, "day2", "broken.wav"))
+        with open(os.path.join(audio, "notes.txt"), "w") as f:
+            f.write("not audio")
+        assert audio_batch.discover_audio(audio) == ["a.wav", "day2/a_copy.wav", "day2/b.wav", "day2/broken.wav"]
+
+        argv = ["whisper", "--model", "whisper-1", "--input_dir", audio, "--output_dir", out, "--format", "text"]
+        before = server.counts.get("requests", 0)
+        summary = entrypoint.main(argv)
+        assert summary["files"] == 4 and summary["transcribed"] == 2 and summary["duplicates"] == 1
+        assert summary["failed"] == 1 and "day2/broken.wav" in summary["errors"]
+        assert server.counts["requests"] - before == 2  # the copy was not sent
+        for name in ("a.txt", "day2/a_copy.txt", "day2/b.txt"):
+            with open(os.path.join(out, name)) as f:
+                assert f.read().strip() == "Mock transcription."
+        with open(os.path.join(out, audio_batch.MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        # The two identical files run in parallel, so either one may be the one sent.
+        copies = {path: manifest["files"][path].get("duplicate_of") for path in ("a.wav", "day2/a_copy.wav")}
+        assert copies in ({"a.wav": None, "day2/a_copy.wav": "a.wav"}, {"a.wav": "day2/a_copy.wav", "day2/a_copy.wav": None})
+        assert manifest["files"]["day2/broken.wav"]["status"] == "failed"
+
+        # A restart sends only what is not finished: the repaired file.
+        _wav(os.path.join(tmp, "missing.wav"), 1.5)
+        before = server.counts["requests"]
+        summary = entrypoint.main(argv)
+        assert summary["skipped"] == 3 and summary["transcribed"] == 1 and summary["failed"] == 0
+        assert server.counts["requests"] - before == 1
+
+        # Changed content is transcribed again; a deleted transcript is restored
+        # from the identical recording's transcript without a request.
+        _wav(os.path.join(audio, "day2", "b.wav"), 3)
+        os.remove(os.path.join(out, "a.txt"))
+        before = server.counts["requests"]
+        summary = entrypoint.main(argv)
+        assert summary["skipped"] == 2 and summary["transcribed"] == 1 and summary["duplicates"] == 1
+        assert server.counts["requests"] - before == 1
+        assert os.path.exists(os.path.join(out, "a.txt"))
+
+        # Without --output_dir the transcripts go next to the audio.
+        summary = entrypoint.main(["whisper", "--model", "whisper-1", "--input_dir", os.path.join(audio, "day2")])
+        assert summary["transcribed"] == 3 and summary["duplicates"] == 0
+        assert os.path.exists(os.path.join(audio, "day2", "b.json"))
+        assert os.path.exists(os.path.join(audio, "day2", audio_batch.MANIFEST_NAME))
+
+    # Long recordings split into segments still share the one --concurrency budget.
+    assert audio_batch.segment_concurrency(8, 2) == 4 and audio_batch.segment_concurrency(2, 50) == 1
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer(latency=0.05) as server, \
+            benchmark.mock_environment(server, tmp):
+        audio = os.path.join(tmp, "long")
+        for i in range(3):
+            _wav(os.path.join(audio, f"talk{i}.wav"), 4 + i)
+        argv = ["whisper", "--model", "whisper-1", "--input_dir", audio, "--format", "text",
+                "--segment_seconds", "1", "--overlap", "0.1", "--concurrency", "2"]
+        summary = entrypoint.main(argv)
+        assert summary["transcribed"] == 3 and server.counts["requests"] > 6  # every file was split
+        assert server.counts["max_concurrent"] <= 2, server.counts
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,83 @@
+import array
+import importlib
+import pathlib
+import sys
+import tempfile
+import wave
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+audio_segments = importlib.import_module(f"{root.name}.audio_segments")
+whisper = importlib.import_module(f"{root.name}.Whisper_Api_Module")
+
+RATE = 8000
+WORD_SECONDS, PAUSE_SECONDS, WORDS = 2.5, 0.5, 20  # 60 s of audio
+
+
+def _write_wav(path):
+    """Tone bursts separated by silence; burst k has amplitude 1000 + 100 * k."""
+    samples = array.array('h')
+    for k in range(WORDS):
+        amplitude = 1000 + 100 * k
+        samples.extend(amplitude if i % 2 else -amplitude for i in range(int(WORD_SECONDS * RATE)))
+        samples.extend([0] * int(PAUSE_SECONDS * RATE))
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(samples.tobytes())
+
+
+def _fake_whisper(method, file=None, **kwargs):
+    """Return verbose_json with one segment per (possibly cut off) tone burst."""
+    assert kwargs["response_format"] == "verbose_json"
+    with wave.open(file, 'rb') as w:
+        samples = array.array('h', w.readframes(w.getnframes()))
+    segments, start = [], None
+    for i, value in enumerate([*samples, 0]):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            k = (abs(samples[start]) - 1000) // 100
+            segments.append({"id": len(segments), "start": start / RATE, "end": i / RATE, "text": f" word{k}"})
+            start = None
+    return {"task": "transcribe", "language": "english", "text": "", "segments": segments}
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(pathlib.Path(tmp) / "long.wav")
+        _write_wav(path)
+        assert audio_segments.needs_chunking(path, segment_seconds=10)
+        assert not audio_segments.needs_chunking(path, segment_seconds=120)
+
+        segments = audio_segments.plan_segments(path, segment_seconds=10, overlap_seconds=1)
+        # Cuts land in the pauses, i.e. at multiples of 3 s plus 2.5..3 s.
+        for segment in segments[1:]:
+            assert (segment["own_start"] % 3) >= WORD_SECONDS, segment
+        assert segments[0]["own_start"] == 0 and abs(segments[-1]["own_end"] - WORDS * 3) < 1e-9
+
+        args = SimpleNamespace(model="whisper-1", file=path, translate=False, language=None, format="srt",
+                               api_key="test", output_file=None, segment_seconds=10, overlap=1, concurrency=3)
+        original = whisper.call_openai_method
+        whisper.call_openai_method = _fake_whisper
+        try:
+            operation, method, kwargs = whisper._request_kwargs(args)
+            planned = whisper._plan_chunks(args, kwargs)
+            srt = whisper.transcribe_chunks(args, method, kwargs, planned)
+            args.format = "verbose_json"
+            merged = whisper.transcribe_chunks(args, method, kwargs, planned)
+        finally:
+            whisper.call_openai_method = original
+
+    assert [s["text"] for s in merged["segments"]] == [f" word{k}" for k in range(WORDS)]
+    for k, item in enumerate(merged["segments"]):
+        assert abs(item["start"] - 3 * k) < 0.01 and abs(item["end"] - (3 * k + WORD_SECONDS)) < 0.01
+    assert srt.startswith("1\n00:00:00,000 --> 00:00:02,500\nword0\n")
+    assert "20\n00:00:57,000 --> 00:00:59,500\nword19\n" in srt
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,70 @@
+import importlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+batch_jobs = importlib.import_module(f"{root.name}.batch_jobs")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        requests_path = os.path.join(tmp, "requests.jsonl")
+        with open(requests_path, "w") as f:
+            for i in range(10):
+                f.write(json.dumps({"id": f"req-{i}", "prompt": f"Question {i}"}) + "\n")
+            f.write(json.dumps({"body": {"messages": [{"role": "user", "content": "Raw"}], "temperature": 0}}) + "\n")
+        requests = list(batch_jobs.read_requests(requests_path, "chat", "gpt-4o-mini"))
+        assert requests[0] == ("req-0", {"model": "gpt-4o-mini",
+                                         "messages": [{"role": "user", "content": "Question 0"}]})
+        assert requests[-1][0] == "11" and requests[-1][1]["temperature"] == 0
+
+        batch_file = os.path.join(tmp, "batch.jsonl")
+        assert batch_jobs.write_batch_file(requests, batch_file) == 11
+        with open(batch_file) as f:
+            line = json.loads(f.readline())
+        assert line["method"] == "POST" and line["url"] == "/v1/chat/completions" and line["custom_id"] == "req-0"
+        try:
+            batch_jobs.write_batch_file([("x", {}), ("x", {})], batch_file)
+            raise AssertionError("duplicate ids accepted")
+        except ValueError:
+            pass
+
+        saved = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+        with MockOpenAIServer(batch_error_rate=0.3, seed=1) as server:
+            os.environ["OPENAI_BASE_URL"] = server.url
+            os.environ["OPENAI_API_KEY"] = "sk-mock"
+            try:
+                batch = batch_jobs.submit_batch(requests)
+                status = batch_jobs.wait_for_batch(batch.id, initial_delay=0.01, timeout=5)
+                assert status["status"] == "completed" and status["total"] == 11
+
+                output_path = os.path.join(tmp, "results.jsonl")
+                summary = batch_jobs.fetch_results(batch.id, output_path)
+                assert summary["total"] == 11 and 0 < summary["failed"] < 11
+                with open(output_path) as f:
+                    records = [json.loads(line) for line in f]
+                assert {r["id"] for r in records} == {custom_id for custom_id, _ in requests}
+                assert all(r["response"] for r in records if "error" not in r)
+
+                server.batch_error_rate = 0.0
+                retry = batch_jobs.resubmit_failed(batch.id)
+                batch_jobs.wait_for_batch(retry.id, initial_delay=0.01, timeout=5)
+                retried = list(batch_jobs.iter_results(retry.id))
+                assert sorted(r["id"] for r in retried) == sorted(summary["failed_ids"])
+                assert not any("error" in r for r in retried)
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,24 @@
+import importlib
+import pathlib
+import sys
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+
+
+def run_test(api_key=None):
+    results = benchmark.run_benchmarks(["call_openai_method", "use_chat_api_stream", "transcribe_audio"],
+                                       requests=8, concurrency=4, rate_limit_rate=0.2, seed=1)
+    for name, result in results.items():
+        assert result["errors"] == {}, (name, result["errors"])
+        assert result["rps"] > 0 and result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+    baseline = {"call_openai_method": dict(results["call_openai_method"], rps=results["call_openai_method"]["rps"] * 10)}
+    assert benchmark.compare(results, baseline)  # a 10x faster baseline is a regression
+    assert not benchmark.compare(results, results)
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,66 @@
+import importlib
+import json
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+bulk_prompts = importlib.import_module(f"{root.name}.bulk_prompts")
+retry_policy = importlib.import_module(f"{root.name}.retry_policy")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+mock_openai_server = importlib.import_module(f"{root.name}.mock_openai_server")
+
+REPLY = "".join(mock_openai_server.STREAM_WORDS)
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, mock_openai_server.MockOpenAIServer() as server, \
+            benchmark.mock_environment(server, tmp):
+        src = pathlib.Path(tmp) / "in.jsonl"
+        dst = pathlib.Path(tmp) / "out.jsonl"
+        lines = [json.dumps({"id": f"p{i}", "prompt": f"prompt {i}"}) for i in range(50)]
+        lines.insert(10, "")
+        lines.insert(20, "{not json")
+        lines.insert(30, json.dumps({"id": "no-prompt"}))
+        lines.append(json.dumps({"prompt": "last", "model": "gpt-4"}))
+        src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        summary = bulk_prompts.run_bulk(str(src), str(dst), "gpt-4o-mini", concurrency=4)
+        records = [json.loads(line) for line in dst.read_text(encoding="utf-8").splitlines()]
+        assert summary["total"] == 53 and summary["failed"] == 2 and len(records) == 53
+        assert server.counts["requests"] == 51  # the malformed lines were not sent
+
+        # Malformed lines are recorded in place, by line number, and the run goes on.
+        bad = [r for r in records if "error" in r]
+        assert [r["id"] for r in bad] == [21, 31]
+        assert "invalid JSON" in bad[0]["error"] and "'prompt'" in bad[1]["error"]
+        assert all(r["response"] is None and r["usage"] is None for r in bad)
+
+        good = [r for r in records if "error" not in r]
+        assert [r["id"] for r in good[:50]] == [f"p{i}" for i in range(50)]
+        for record in good:
+            assert set(record) == {"timestamp", "model", "mode", "response", "id", "usage", "latency_ms"}
+            assert record["mode"] == "gpt" and record["response"] == REPLY and record["latency_ms"] > 0
+            usage = record["usage"]
+            assert usage["completion_tokens"] == len(mock_openai_server.STREAM_WORDS)
+            assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+        assert good[-1]["id"] == 54 and good[-1]["model"] == "gpt-4" and good[0]["model"] == "gpt-4o-mini"
+
+        # A failing request becomes an error record too.
+        src.write_text(json.dumps({"id": "x", "prompt": "fails"}) + "\n", encoding="utf-8")
+        server.error_rate = 1.0
+        try:
+            summary = bulk_prompts.run_bulk(str(src), str(dst), "gpt-4o-mini", concurrency=1)
+        finally:
+            server.error_rate = 0.0
+            retry_policy.configure_circuit_breakers()  # the retried 500s opened the circuit
+        (record,) = [json.loads(line) for line in dst.read_text(encoding="utf-8").splitlines()]
+        assert summary["failed"] == 1 and record["id"] == "x" and record["response"] is None
+        # Five 500s in a row open the circuit, so the last retry fails fast.
+        assert record["error"].startswith(("InternalServerError", "CircuitOpenError"))
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,118 @@
+import importlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+chat_session = importlib.import_module(f"{root.name}.chat_session")
+retry_policy = importlib.import_module(f"{root.name}.retry_policy")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer() as server, benchmark.mock_environment(server, tmp):
+        path = os.path.join(tmp, "session.json")
+        session = chat_session.ChatSession("gpt-4o-mini", system_prompt="Be brief. " * 40, path=path)
+        session.send("First question")
+        assert session.last_turn["cached_tokens"] == 0
+        deltas = []
+        session.send("Second question", on_delta=deltas.append)
+        assert "".join(deltas) == session.history[-1]["content"]
+        # The previous request is an unchanged prefix of this one, so it is served from cache.
+        assert session.last_turn["cached_tokens"] > 0
+        assert session.totals["turns"] == 2 and len(session.history) == 4
+
+        resumed = chat_session.ChatSession.load(path)
+        assert resumed.messages() == session.messages() and resumed.session_id == session.session_id
+        resumed.send("Third question")
+        assert resumed.last_turn["cached_tokens"] > 0 and resumed.totals["turns"] == 3
+
+        small = chat_session.ChatSession("gpt-4o-mini", system_prompt="Sys", max_history_tokens=120,
+                                         reserve_tokens=0)
+        trims = []
+        for i in range(12):
+            small.send(f"Message number {i} " + "padding " * 10)
+            trims.append(small.last_turn["trimmed_messages"])
+        assert small.history[0]["role"] == "user" and len(small.history) < 24
+        # Trimming cuts deep, so most turns keep the prefix unchanged.
+        assert 0 < sum(1 for t in trims if t) < len(trims) // 2, trims
+        assert small.messages()[0] == {"role": "system", "content": "Sys"}
+
+        summarizing = chat_session.ChatSession("gpt-4o-mini", max_history_tokens=120, reserve_tokens=0,
+                                               summarize=True)
+        for i in range(12):
+            summarizing.send(f"Fact {i}: " + "detail " * 10)
+        assert summarizing.summary and summarizing.messages()[0]["content"].startswith(
+            chat_session.SUMMARY_PREFIX)
+
+        history = list(session.history)
+        server.error_rate = 1.0
+        session.request_kwargs["retries"] = 0
+        try:
+            session.send("This one fails")
+            raise AssertionError("expected the request to fail")
+        except AssertionError:
+            raise
+        except Exception:
+            pass
+        assert session.history == history, "a failed turn must not stay in the history"
+
+        # A failed summary call leaves the history and summary as they were.
+        server.error_rate = 0.0
+        folding = chat_session.ChatSession("gpt-4o-mini", max_history_tokens=120, reserve_tokens=0,
+                                           summarize=True, retries=0)
+        folding.summary = "Earlier facts."
+        folding.history = [{"role": role, "content": f"Turn {i}: " + "detail " * 8}
+                           for i in range(6) for role in ("user", "assistant")]
+        history = list(folding.history)
+        server.error_rate = 1.0
+        try:
+            folding.send("One more")
+            raise AssertionError("expected the summary call to fail")
+        except AssertionError:
+            raise
+        except Exception:
+            pass
+        assert folding.history == history and folding.summary == "Earlier facts."
+        retry_policy.configure_circuit_breakers()  # the retried 500s opened the circuit
+
+        # So does a message too large for the budget on its own.
+        server.error_rate = 0.0
+        try:
+            folding.send("huge " * 500)
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+        assert folding.history == history and folding.summary == "Earlier facts."
+        folding.send("One more")
+        assert folding.last_turn["trimmed_messages"] > 0 and folding.summary != "Earlier facts."
+
+        # In the interactive loop a failed turn is reported and the session goes on.
+        lines = iter(["Fails", "Works", "/exit"])
+
+        def read(prompt):
+            line = next(lines)
+            server.error_rate = 1.0 if line == "Fails" else 0.0
+            retry_policy.configure_circuit_breakers()  # close the circuit the failing turn opened
+            return line
+
+        args = SimpleNamespace(session=None, model="gpt-4o-mini", api_key=None, system=None, history_tokens=None,
+                               summarize=False, prompt=None)
+        out = io.StringIO()
+        try:
+            interactive = chat_session.run_interactive(args, read=read, out=out)
+        finally:
+            server.error_rate = 0.0
+            retry_policy.configure_circuit_breakers()
+        assert out.getvalue().count("[Error: ") == 1
+        assert [m["content"] for m in interactive.history if m["role"] == "user"] == ["Works"]
+
+
+if __name__ == "__main__":
+    run_test()
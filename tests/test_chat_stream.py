@@ -0,0 +1,48 @@
+import importlib
+import pathlib
+import sys
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+chat_stream = importlib.import_module(f"{root.name}.chat_stream")
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    choices = [] if usage else [SimpleNamespace(delta=SimpleNamespace(content=content),
+                                                finish_reason=finish_reason)]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def run_test(api_key=None):
+    chunks = [_chunk(""), _chunk("Hel"), _chunk("lo"), _chunk(None, "stop"),
+              _chunk(usage=SimpleNamespace(total_tokens=5))]
+    requests = []
+
+    def fake_call(method_path, **kwargs):
+        requests.append((method_path, kwargs))
+        return iter(chunks)
+
+    original = chat_stream.call_openai_method
+    chat_stream.call_openai_method = fake_call
+    try:
+        stream = chat_stream.stream_chat("Hi", "gpt-test", temperature=0)
+        assert not requests  # nothing is sent until iteration starts
+        assert list(stream) == ["Hel", "lo"]
+    finally:
+        chat_stream.call_openai_method = original
+
+    method_path, kwargs = requests[0]
+    assert method_path == "chat.completions.create"
+    assert kwargs["stream"] and kwargs["stream_options"] == {"include_usage": True}
+    assert kwargs["messages"] == [{"role": "user", "content": "Hi"}] and kwargs["temperature"] == 0
+    assert stream.text == "Hello" and stream.finish_reason == "stop"
+    assert stream.usage.total_tokens == 5
+    metrics = stream.metrics.as_dict()
+    assert metrics["chunks"] == 2 and len(stream.metrics.inter_token_latencies) == 1
+    assert 0 <= metrics["time_to_first_token_s"] <= metrics["total_duration_s"]
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,33 @@
+import importlib
+import pathlib
+import sys
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+try:
+    client_pool = importlib.import_module(f"{root.name}.client_pool")
+    import openai  # noqa: F401
+except Exception:
+    client_pool = None
+
+
+def run_test(api_key=None):
+    if client_pool is None:
+        print("openai not installed; skipping client pool test.")
+        return
+    pool = client_pool.ClientPool(idle_ttl=60)
+    first = pool.get(api_key="sk-test-a")
+    assert pool.get(api_key="sk-test-a") is first
+    assert pool.get(api_key="sk-test-b") is not first
+    assert pool.get(api_key="sk-test-a", base_url="http://127.0.0.1:1/v1") is not first
+    assert len(pool) == 3
+
+    pool.configure(idle_ttl=-1)
+    pool.get(api_key="sk-test-c")
+    assert len(pool) == 1
+    pool.clear()
+    assert len(pool) == 0
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,167 @@
+import importlib
+import io
+import os
+import pathlib
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+daemon = importlib.import_module(f"{root.name}.daemon")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(service, address):
+    thread = threading.Thread(target=service.serve_forever)
+    thread.start()
+    while daemon.daemon_status(address) is None:
+        time.sleep(0.01)
+    return thread
+
+
+def _tcp_checks(tmp):
+    """Loopback only, a 0600 token, and no forwarding across different environments."""
+    try:
+        daemon.Daemon("0.0.0.0:47999")
+        raise AssertionError("expected a non-loopback address to be refused")
+    except ValueError:
+        pass
+    saved_home = os.environ.get("HOME")
+    os.environ["HOME"] = tmp
+    address = f"127.0.0.1:{_free_port()}"
+    service = daemon.Daemon(address, concurrency=2)
+    thread = _serve(service, address)
+    try:
+        token_file = daemon.token_path(address)
+        assert os.path.dirname(token_file) == tmp and stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+        out, err = io.StringIO(), io.StringIO()
+        assert daemon.forward(["gpt", "--model", "gpt-4o-mini", "--prompt", "Hi"], address, out, err) == 0
+        assert out.getvalue().strip()
+
+        # A client without the token gets nothing.
+        with daemon._connect(address) as sock:
+            daemon._send(sock, {"op": "status"})
+            assert b"refused" in sock.makefile("rb").readline()
+
+        # Another API key: refused, so the caller runs the command itself.
+        saved_key = os.environ["OPENAI_API_KEY"]
+        os.environ["OPENAI_API_KEY"] = "sk-other"
+        try:
+            assert daemon.forward(["gpt", "--model", "gpt-4o-mini", "--prompt", "Hi"], address, out, err) is None
+        finally:
+            os.environ["OPENAI_API_KEY"] = saved_key
+        assert daemon.daemon_status(address)["served"] == 1
+    finally:
+        daemon.stop_daemon(address)
+        thread.join()
+        if saved_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = saved_home
+    assert not os.path.exists(token_file)
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer(latency=0.1) as server, \
+            benchmark.mock_environment(server, tmp):
+        address = os.path.join(tmp, "daemon.sock")
+        assert daemon.forward(["gpt", "--model", "gpt-4o-mini"], address) is None  # nothing listening
+        assert daemon.daemon_status(address) is None and daemon.stop_daemon(address) is False
+
+        argv = daemon.client_argv(["gpt", "--file", "a.wav"], SimpleNamespace(file="a.wav", output="-"))
+        assert argv[-2:] == ["--file", os.path.abspath("a.wav")] and "-" not in argv
+
+        stdout = sys.stdout
+        thread = _serve(daemon.Daemon(address, concurrency=1), address)
+        try:
+            results = {}
+
+            def run(i):
+                out, err = io.StringIO(), io.StringIO()
+                output = os.path.join(tmp, f"reply{i}.txt")
+                code = daemon.forward(["gpt", "--model", "gpt-4o-mini", "--prompt", f"Hi {i}",
+                                       "--output_file", output], address, out, err)
+                with open(output) as f:
+                    results[i] = (code, out.getvalue(), f.read())
+
+            start = time.perf_counter()
+            clients = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            # One slot shared by all clients: the three requests ran one after another.
+            assert time.perf_counter() - start >= 0.3
+            for code, out, saved in results.values():
+                assert code == 0 and saved and out.strip() == saved.strip()
+
+            out, err = io.StringIO(), io.StringIO()
+            assert daemon.forward(["gpt", "--bogus"], address, out, err) == 2
+            assert "unrecognized arguments" in err.getvalue()
+            status = daemon.daemon_status(address)
+            assert status["served"] == 4 and status["failed"] == 1 and status["active"] == 0
+        finally:
+            daemon.stop_daemon(address)
+            thread.join()
+        assert sys.stdout is stdout and not os.path.exists(address)
+        _socket_checks(tmp)
+        _tcp_checks(tmp)
+
+
+def _socket_checks(tmp):
+    """Commands only go to a private socket; a malformed request is refused, not a crash."""
+    saved = {name: os.environ.pop(name, None) for name in (daemon.SOCKET_ENV, "XDG_RUNTIME_DIR")}
+    try:
+        os.environ["XDG_RUNTIME_DIR"] = tmp
+        assert daemon.default_address() == os.path.join(tmp, daemon.SOCKET_NAME)
+        del os.environ["XDG_RUNTIME_DIR"]
+        directory = os.path.dirname(daemon.default_address())
+        assert os.path.basename(directory) == f"openai_wrapper-{os.getuid()}"
+    finally:
+        for name, value in saved.items():
+            if value is not None:
+                os.environ[name] = value
+
+    # A socket others can connect to (or could have planted) gets no commands.
+    address = os.path.join(tmp, "shared.sock")
+    with socket.socket(socket.AF_UNIX) as listener:
+        listener.bind(address)
+        os.chmod(address, 0o666)
+        listener.listen()
+        listener.settimeout(0.2)
+        assert daemon.forward(["gpt", "--model", "gpt-4o-mini", "--api_key", "sk-secret"], address) is None
+        try:
+            listener.accept()[0].close()
+            raise AssertionError("the client connected to a socket other users can reach")
+        except socket.timeout:
+            pass
+    os.remove(address)
+
+    address = os.path.join(tmp, "private", "daemon.sock")
+    thread = _serve(daemon.Daemon(address), address)
+    try:
+        assert stat.S_IMODE(os.stat(os.path.dirname(address)).st_mode) == 0o700
+        with daemon._connect(address) as sock:
+            sock.sendall(b"not json\n")
+            assert b"refused" in sock.makefile("rb").readline()
+        assert daemon.daemon_status(address)["served"] == 0
+    finally:
+        daemon.stop_daemon(address)
+        thread.join()
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,105 @@
+import glob
+import importlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+dalle = importlib.import_module(f"{root.name}.Dalle_Api_Module")
+retry_policy = importlib.import_module(f"{root.name}.retry_policy")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = pathlib.Path(tmp) / "jobs.jsonl"
+        jsonl.write_text(json.dumps({"prompt": "a", "n": 3, "style": "vivid", "extra": 1}) + "\n\n"
+                         + json.dumps({"prompt": "b", "size": "1792x1024"}) + "\n")
+        text = pathlib.Path(tmp) / "prompts.txt"
+        text.write_text("first prompt\n\nsecond prompt\n")
+        jobs = dalle.read_jobs(str(jsonl))
+        assert jobs == [{"prompt": "a", "n": 3, "style": "vivid"}, {"prompt": "b", "size": "1792x1024"}]
+        assert dalle.read_jobs(str(text)) == [{"prompt": "first prompt"}, {"prompt": "second prompt"}]
+
+    args = SimpleNamespace(model="dall-e-3", prompt="p", n=2, size="1024x1024", quality="hd", style=None,
+                           api_key="test", jobs=None)
+    assert dalle._needs_fan_out(args)
+    assert [(i, n) for i, _, n in dalle._plan_requests(args, jobs)] == [(0, 1), (0, 1), (0, 1), (1, 1), (1, 1)]
+    payload = dalle._build_request(args, jobs[1])
+    assert payload["size"] == "1792x1024" and payload["quality"] == "hd" and "style" not in payload
+
+    args.model, args.n = "dall-e-2", 12
+    assert [n for _, _, n in dalle._plan_requests(args, [{"prompt": "p"}])] == [10, 2]
+    args.n = 4
+    assert not dalle._needs_fan_out(args)
+
+    # Failed requests are retried only for transient errors.
+    def status_error(cls, status, code=None):
+        request = httpx.Request("POST", "https://api.openai.com/v1/images/generations")
+        return cls("error", response=httpx.Response(status, request=request), body={"code": code} if code else None)
+
+    for error, retryable in ((status_error(openai.InternalServerError, 500), True),
+                             (status_error(openai.RateLimitError, 429), True),
+                             (status_error(openai.RateLimitError, 429, code="insufficient_quota"), False),
+                             (status_error(openai.AuthenticationError, 401), False),
+                             (status_error(openai.BadRequestError, 400), False)):
+        entries = dalle._image_entries(args, 0, {"prompt": "p"}, 2, error=error)
+        assert len(entries) == 2 and all(entry["retryable"] is retryable for entry in entries), error
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _batch_against_mock(tmp)
+
+
+def _batch_against_mock(tmp):
+    """A whole fan-out: request planning, per-image retries and the manifest."""
+    output_dir = os.path.join(tmp, "images")
+    args = SimpleNamespace(model="dall-e-2", prompt=None, n=1, size="256x256", quality="standard", style=None,
+                           api_key=None, output_dir=output_dir, response_format="url", download=False,
+                           concurrency=1, jobs=None, image_retries=1)
+    jobs = [{"prompt": "a", "n": 3}, {"prompt": "b", "n": 12}, {"prompt": "c"}]  # 4 requests, 16 images
+    with MockOpenAIServer(seed=4) as server, benchmark.mock_environment(server, tmp):
+        manifest = dalle.generate_dalle_batch(args, jobs)
+        assert server.counts["requests"] == 4
+        assert manifest["jobs"] == 3 and manifest["failed"] == 0 and len(manifest["images"]) == 16
+        assert [entry["job"] for entry in manifest["images"]] == [0] * 3 + [1] * 12 + [2]
+        assert [entry["prompt"] for entry in manifest["images"]][2:4] == ["a", "b"]
+        assert all(entry["attempts"] == 1 and entry["size"] == "256x256" for entry in manifest["images"])
+        assert len({entry["url"] for entry in manifest["images"]}) == 16
+
+        # Half the requests fail, and the wrapper does not retry them: each failed image is requested again once.
+        retry_policy.set_retry_policy(retry_policy.RetryPolicy(max_retries=0))
+        retry_policy.configure_circuit_breakers(failure_threshold=1000)
+        server.error_rate = 0.5
+        try:
+            before = server.counts["requests"]
+            failed = dalle.generate_dalle_batch(args, jobs)
+        finally:
+            server.error_rate = 0.0
+            retry_policy.configure_circuit_breakers(failure_threshold=retry_policy.DEFAULT_FAILURE_THRESHOLD)
+        images = failed["images"]
+        retried = [entry for entry in images if entry["attempts"] == 2]
+        assert len(images) == 16 and server.counts["requests"] - before == 4 + len(retried)
+        assert any("error" not in entry for entry in retried), "no image succeeded on its retry"
+        assert failed["failed"] == sum(1 for entry in images if "error" in entry) > 0
+        assert all(entry["attempts"] == 2 and entry["error"].startswith("InternalServerError")
+                   for entry in images if "error" in entry)
+        assert all("retryable" not in entry for entry in images)
+
+    # Every run has its own manifest, even within the same second.
+    paths = sorted(glob.glob(os.path.join(output_dir, "dalle_manifest_*.json")))
+    assert len(paths) == 2
+    with open(paths[0]) as f, open(paths[1]) as g:
+        assert sorted([json.load(f)["failed"], json.load(g)["failed"]]) == sorted([0, failed["failed"]])
+
+
+if __name__ == "__main__":
+    run_test()
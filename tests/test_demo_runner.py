@@ -0,0 +1,33 @@
+import importlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+demo_runner = importlib.import_module(f"{root.name}.demo_runner")
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "report.json")
+        log_path = os.path.join(tmp, "demo.log")
+        argv = ["--mock", "--scenarios", "gpt", "whisper", "embed", "--report", report_path, "--log", log_path]
+        assert demo_runner.main(argv) == 0
+        assert demo_runner.main(argv) == 0
+        with open(report_path) as f:
+            report = json.load(f)
+        assert report["passed"] == 3 and report["failed"] == 0 and report["target"] == "mock"
+        gpt = report["scenarios"]["gpt"]
+        assert gpt["status"] == "pass" and gpt["calls"] >= 1 and gpt["prompt_tokens"] > 0
+        assert 0 < gpt["api_s"] <= gpt["wall_s"]
+        assert os.path.exists(log_path + ".1"), "previous run's log was not rotated"
+        with open(log_path) as f:
+            assert "GPT PASS" in f.read()
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,89 @@
+import importlib
+import os
+import pathlib
+import sys
+import tempfile
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+embeddings = importlib.import_module(f"{root.name}.embeddings")
+vector_store = importlib.import_module(f"{root.name}.vector_store")
+
+
+def run_test(api_key=None):
+    items = [(i, "short text") for i in range(10)]
+    batches = list(embeddings.pack_batches(items, max_inputs=4))
+    assert [len(ids) for ids, _ in batches] == [4, 4, 2]
+    batches = list(embeddings.pack_batches([(i, "word " * 1000) for i in range(10)], max_tokens=3000))
+    assert all(len(ids) <= 2 for ids, _ in batches)
+    try:
+        list(embeddings.pack_batches([(1, "word " * 20_000)]))
+        raise AssertionError("oversized input accepted")
+    except ValueError:
+        pass
+
+    requests = []
+
+    def fake_call(method, model, input, api_key=None, **kwargs):
+        requests.append(list(input))
+        # Reverse the data to check results are put back in index order.
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data[::-1])
+
+    original = embeddings.call_openai_method
+    embeddings.call_openai_method = fake_call
+    try:
+        vectors = embeddings.embed_texts(["a", "bb", "ccc"] * 1000, concurrency=3)
+        assert len(vectors) == 3000 and vectors[:3] == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+        assert len(requests) == 2  # 2048 inputs per request
+
+        # An over-long text fails embed_texts before anything is sent...
+        requests.clear()
+        try:
+            embeddings.embed_texts(["fine"] * 5000 + ["word " * 20_000])
+            raise AssertionError("oversized input accepted")
+        except ValueError:
+            assert requests == []
+
+        # ... and is skipped and reported by a streaming index build, which keeps the rest.
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "texts.txt")
+            with open(source, "w") as f:
+                f.write("first\n" + "word " * 20_000 + "\nthird\n")
+            summary = embeddings.build_index(source, os.path.join(tmp, "index"))
+            assert summary["texts"] == 2 and summary["skipped"] == 1 and summary["skipped_ids"] == [2]
+            assert vector_store.VectorStore(os.path.join(tmp, "index")).ids() == [1, 3]
+    finally:
+        embeddings.call_openai_method = original
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        store = vector_store.VectorStore(path, model="text-embedding-3-small")
+        store.add(["x", "y"], [[1, 0, 0], [0, 1, 0]])
+        store.add(["z", {"doc": 4}], [[0, 0, 5], [1, 1, 0]])
+        reopened = vector_store.VectorStore(path)
+        assert len(reopened) == 4 and reopened.model == "text-embedding-3-small"
+        results = reopened.search([1, 0.9, 0], top_k=2, block_rows=1)
+        assert [item_id for item_id, _ in results] == [{"doc": 4}, "x"]
+        assert abs(results[0][1] - 0.9986) < 1e-3
+        assert reopened.ids() == ["x", "y", "z", {"doc": 4}]
+        assert reopened.ids([3, 0]) == [{"doc": 4}, "x"]
+        assert os.path.getsize(path + ".idx") == 4 * 8
+
+        # An index from before the offsets file gets one on open.
+        os.remove(path + ".idx")
+        rebuilt = vector_store.VectorStore(path)
+        assert rebuilt.ids([2, 1]) == ["z", "y"] and os.path.getsize(path + ".idx") == 4 * 8
+        rebuilt.add(["w"], [[0, 1, 1]])
+        assert vector_store.VectorStore(path).ids([4, 3]) == ["w", {"doc": 4}]
+        try:
+            vector_store.VectorStore(path, model="text-embedding-ada-002")
+            raise AssertionError("model mismatch accepted")
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,62 @@
+import asyncio
+import importlib
+import pathlib
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+gpt = importlib.import_module(f"{root.name}.Gpt_Api_Module")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+mock_openai_server = importlib.import_module(f"{root.name}.mock_openai_server")
+
+REPLY = "".join(mock_openai_server.STREAM_WORDS)
+
+
+def run_test(api_key=None):
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock_openai_server.MockOpenAIServer(latency=0.01, token_latency=0.002) as server, \
+            benchmark.mock_environment(server, tmp):
+        # Streamed: the reply comes from the deltas, without polling or listing messages.
+        assert gpt.use_assistant_api("Hi", "asst_1") == REPLY
+        assert server.counts["runs"] == 1 and server.counts["requests"] == 3
+
+        # Polled: the run completes on the second retrieve and the reply is read from the thread.
+        assert gpt.use_assistant_api("Hi", "asst_1", stream=False) == REPLY
+
+        # A stream cut after two deltas falls back to polling and returns the whole reply.
+        server.stream_drop_after = 2
+        assert gpt.use_assistant_api("Hi", "asst_1") == REPLY
+        assert asyncio.run(gpt.ause_assistant_api("Hi", "asst_1")) == REPLY
+        server.stream_drop_after = None
+
+        # An unknown assistant is an error, not a reason to poll.
+        try:
+            gpt.use_assistant_api("Hi", "missing")
+            raise AssertionError("expected NotFoundError")
+        except openai.NotFoundError:
+            pass
+
+        # Reused thread: concurrent prompts, sync and async, take turns on it.
+        threads = server.counts["threads"]
+        assert gpt.use_assistant_api("First", "asst_2", reuse_thread=True) == REPLY
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            replies = list(pool.map(lambda i: gpt.use_assistant_api(f"Q{i}", "asst_2", reuse_thread=True), range(4)))
+
+        async def ask_async():
+            return await asyncio.gather(*(gpt.ause_assistant_api(f"A{i}", "asst_2", reuse_thread=True)
+                                          for i in range(3)))
+
+        replies += asyncio.run(ask_async())
+        assert replies == [REPLY] * 7
+        assert server.counts["threads"] == threads + 1
+        thread_id = gpt._reused_threads[(None, "asst_2")]
+        messages = server.thread_messages(thread_id)
+        assert len(messages) == 16 and [m["role"] for m in messages[:4]] == ["user", "assistant"] * 2
+
+
+if __name__ == "__main__":
+    run_test()
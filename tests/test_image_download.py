@@ -0,0 +1,30 @@
+import base64
+import hashlib
+import importlib
+import os
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+image_download = importlib.import_module(f"{root.name}.image_download")
+
+
+def run_test(api_key=None):
+    png = b"\x89PNG\r\n\x1a\n" + os.urandom(3 * image_download.CHUNK_SIZE + 17)
+    items = [{"b64_json": base64.b64encode(png).decode()}, {"b64_json": "not base64!"}]
+    with tempfile.TemporaryDirectory() as tmp:
+        reports = image_download.save_images(items, tmp, concurrency=2)
+        ok, failed = reports
+        digest = hashlib.sha256(png).hexdigest()
+        assert ok["path"] == os.path.join(tmp, digest[:16] + ".png")
+        assert ok["bytes"] == len(png) and ok["sha256"] == digest and ok["seconds"] >= 0
+        assert pathlib.Path(ok["path"]).read_bytes() == png
+        assert "error" in failed and "path" not in failed
+        assert os.listdir(tmp) == [digest[:16] + ".png"]  # no temporary files left behind
+
+
+if __name__ == "__main__":
+    run_test()
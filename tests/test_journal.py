@@ -0,0 +1,79 @@
+import importlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+journal = importlib.import_module(f"{root.name}.journal")
+openai_wrapper = importlib.import_module(f"{root.name}.openai_wrapper")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    saved = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer() as server:
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_KEY"] = "sk-mock"
+        path = os.path.join(tmp, "calls.jsonl.gz")
+        try:
+            journal.enable_journal(path, max_payload_chars=50, redact_keys={"secret_note"})
+            long_prompt = "x" * 500
+            for i in range(3):
+                openai_wrapper.call_openai_method(
+                    "chat.completions.create", model="gpt-4o-mini", cache=False,
+                    messages=[{"role": "user", "content": f"{i} {long_prompt}"}],
+                    metadata={"secret_note": "hunter2"})
+            audio = io.BytesIO(b"\0" * 1234)
+            audio.name = "clip.wav"
+            openai_wrapper.call_openai_method("audio.transcriptions.create", model="whisper-1", file=audio)
+            journal.disable_journal()
+            assert journal.get_journal() is None
+
+            entries = list(journal.read_journal(path))
+            assert [e["method"] for e in entries] == ["chat.completions.create"] * 3 + ["audio.transcriptions.create"]
+            content = entries[0]["kwargs"]["messages"][0]["content"]
+            assert content.startswith("0 xxx") and content.endswith("[+452 chars]")
+            assert entries[0]["kwargs"]["metadata"]["secret_note"] == journal.REDACTED
+            assert entries[0]["response"]["choices"][0]["message"]["content"]
+            assert entries[3]["kwargs"]["file"] == {"__file__": "clip.wav", "bytes": 1234}
+            assert all(e["error"] is None and e["seconds"] >= 0 for e in entries)
+
+            # Replaying at 1000x sends everything again, uploads included.
+            before = server.counts.get("requests", 0)
+            stats = journal.replay(path, speed=1000)
+            assert stats["calls"] == 4 and not stats["errors"], stats
+            assert server.counts["requests"] - before == 4
+
+            seen = []
+            stats = journal.replay(path, speed=0, transport=seen.append, methods={"chat.completions.create"})
+            assert stats["calls"] == 3 and len(seen) == 3
+
+            # A full queue drops entries instead of blocking the caller.
+            blocked = journal.Journal(os.path.join(tmp, "full.jsonl.gz"), queue_size=1)
+            release = threading.Event()
+            serialize = blocked._serialize
+            blocked._serialize = lambda entry: release.wait() and serialize(entry)  # a stalled disk
+            for _ in range(50):
+                blocked.record("m", (), {}, 0.0, 0.0)
+            release.set()
+            blocked.close()
+            assert blocked.dropped >= 48 and blocked.written + blocked.dropped == 50
+
+            summary = str(journal.summarize_call((), {"messages": [{"content": long_prompt}], "file": audio}))
+            assert "500 chars" in summary and "clip.wav" in summary and long_prompt not in summary
+        finally:
+            journal.disable_journal()
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,100 @@
+import importlib
+import pathlib
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+token_estimator = importlib.import_module(f"{root.name}.token_estimator")
+map_reduce = importlib.import_module(f"{root.name}.map_reduce")
+entrypoint = importlib.import_module(f"{root.name}.entrypoint")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    estimate = token_estimator.estimate_tokens
+    assert estimate("") == 0
+    assert estimate("word " * 1000, "gpt-4o") >= 1000
+    assert token_estimator.context_window("gpt-4o-mini") == 128_000
+    assert token_estimator.context_window("gpt-4-32k-0613") == 32_768
+    assert not token_estimator.fits_context([{"role": "user", "content": "word " * 10_000}], "gpt-4")[0]
+
+    paragraphs = [f"Paragraph {i}. " + "Some filler sentence here. " * 20 for i in range(30)]
+    text = "\n\n".join(paragraphs)
+    chunks = map_reduce.split_text(text, 400, 50, "gpt-4o")
+    assert len(chunks) > 1
+    assert all(estimate(chunk, "gpt-4o") <= 400 for chunk in chunks), "chunk over budget"
+    assert "Paragraph 0." in chunks[0] and "Paragraph 29." in chunks[-1]
+    # Overlap: each chunk repeats the tail of the previous one.
+    assert chunks[1].split("\n\n")[0] in chunks[0]
+    # A single oversized sentence is hard-split rather than dropped.
+    long_word_chunks = map_reduce.split_text("x" * 20_000, 300, 0, "gpt-4o")
+    assert "".join(long_word_chunks) == "x" * 20_000
+
+    prompts, lock = [], threading.Lock()
+
+    def fake_call(method, model, messages, api_key=None, **kwargs):
+        with lock:
+            prompts.append(messages[0]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"summary {len(prompts)}"))])
+
+    original = map_reduce.call_openai_method
+    map_reduce.call_openai_method = fake_call
+    try:
+        answer = map_reduce.map_reduce(text, "gpt-4o", "List the paragraphs.", chunk_tokens=400,
+                                       overlap_tokens=50, reduce_prompt="Merge for {instruction}:\n{results}")
+        assert answer.startswith("summary")
+        maps = [p for p in prompts if p.startswith("List the paragraphs.")]
+        assert len(maps) == len(chunks)
+        assert prompts[-1].startswith("Merge for List the paragraphs.:")
+
+        prompts.clear()
+        map_reduce.complete_long_prompt("Short question", "gpt-4o")
+        assert prompts == ["Short question"]
+
+        # Answers that each fill a chunk cannot be reduced further: fail instead of looping.
+        def verbose_call(method, model, messages, api_key=None, **kwargs):
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="word " * 500))])
+
+        map_reduce.call_openai_method = verbose_call
+        try:
+            map_reduce.map_reduce(text, "gpt-4o", chunk_tokens=400, overlap_tokens=50)
+            raise AssertionError("expected RuntimeError")
+        except RuntimeError:
+            pass
+    finally:
+        map_reduce.call_openai_method = original
+
+    # The pre-flight leaves room for the reply, so a prompt that only just fits the window does not.
+    almost_full = "word " * 5_000  # ~7.3k of gpt-4's 8k tokens
+    assert token_estimator.fits_context([{"role": "user", "content": almost_full}], "gpt-4")[0]
+    assert map_reduce.needs_map_reduce(almost_full, "gpt-4")
+    assert not map_reduce.needs_map_reduce("Short question", "gpt-4", "A short document.")
+
+    # Small chunks get a proportionally small default overlap.
+    assert map_reduce.default_overlap_tokens(150) == 37 and map_reduce.default_overlap_tokens(4_000) == 200
+    assert len(map_reduce.split_text(text, 150, model="gpt-4o")) > len(chunks)
+
+    # ... so a small --chunk_tokens alone is accepted by the CLI.
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer() as server, benchmark.mock_environment(server, tmp):
+        argv = ["gpt", "--model", "gpt-4o-mini", "--prompt", "\n\n".join(paragraphs[:3]), "--map_reduce",
+                "--chunk_tokens", "150"]
+        assert entrypoint.main(argv, echo=False)
+        assert server.counts["requests"] > 2
+
+    # An overlap set explicitly that does not fit into the chunk size is a usage error, not a crash.
+    for argv in (["gpt", "--model", "gpt-4o", "--prompt", "x", "--chunk_tokens", "200", "--chunk_overlap", "200"],
+                 ["gpt", "--model", "gpt-4o", "--prompt", "x", "--chunk_overlap", "-1"]):
+        try:
+            entrypoint.main(argv, echo=False)
+            raise AssertionError("expected a usage error")
+        except SystemExit as e:
+            assert e.code == 2
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,67 @@
+import importlib
+import io
+import pathlib
+import sys
+import tempfile
+from types import SimpleNamespace
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+metrics = importlib.import_module(f"{root.name}.metrics")
+openai_wrapper = importlib.import_module(f"{root.name}.openai_wrapper")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+MockOpenAIServer = importlib.import_module(f"{root.name}.mock_openai_server").MockOpenAIServer
+
+
+def run_test(api_key=None):
+    aggregator = metrics.MetricsAggregator(buckets=(0.1, 1.0))
+    seen = []
+    metrics.add_hook(aggregator)
+    metrics.add_hook(seen.append)
+    metrics.add_hook(lambda record: 1 / 0)  # a broken hook must not break calls
+    try:
+        response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+        prompt, completion = metrics.usage_tokens(response)
+        metrics.emit(metrics.CallRecord("chat.completions.create", "gpt-x", 0.05, prompt_tokens=prompt,
+                                        completion_tokens=completion))
+        metrics.emit(metrics.CallRecord("chat.completions.create", "gpt-x", 0.5, retries=2, error="RateLimitError"))
+        metrics.emit(metrics.CallRecord("chat.completions.create", "gpt-x", cached=True))
+        metrics.emit(metrics.CallRecord("audio.transcriptions.create", "whisper-1", 3.0, upload_bytes=1000))
+    finally:
+        for hook in list(metrics._hooks):
+            metrics.remove_hook(hook)
+    assert not metrics.has_hooks() and len(seen) == 4
+
+    chat = aggregator.snapshot()[("chat.completions.create", "gpt-x")]
+    assert chat["calls"] == 3 and chat["cache_hits"] == 1 and chat["retries"] == 2
+    assert chat["errors"] == {"RateLimitError": 1}
+    assert chat["prompt_tokens"] == 10 and chat["completion_tokens"] == 5
+    assert list(chat["latency_buckets"].values()) == [1, 1, 0]
+    assert abs(chat["latency_mean_s"] - 0.275) < 1e-9
+
+    text = aggregator.to_prometheus()
+    assert '# TYPE openai_request_duration_seconds histogram' in text
+    assert 'openai_requests_total{method="chat.completions.create",model="gpt-x",status="ok"} 2' in text
+    assert 'openai_requests_total{method="chat.completions.create",model="gpt-x",status="RateLimitError"} 1' in text
+    assert 'openai_request_duration_seconds_bucket{method="audio.transcriptions.create",model="whisper-1",le="+Inf"} 1' in text
+    assert 'openai_request_duration_seconds_bucket{method="chat.completions.create",model="gpt-x",le="1.0"} 2' in text
+    assert 'openai_upload_bytes_total{method="audio.transcriptions.create",model="whisper-1"} 1000' in text
+
+    # Upload sizes are measured before the SDK reads the file, from its current position.
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer() as server, benchmark.mock_environment(server, tmp):
+        upload = io.BytesIO(b"x" * 100 + b"a" * 5000)
+        upload.name = "clip.wav"
+        upload.seek(100)
+        seen = []
+        metrics.add_hook(seen.append)
+        try:
+            openai_wrapper.call_openai_method("audio.transcriptions.create", model="whisper-1", file=upload)
+        finally:
+            metrics.remove_hook(seen.append)
+        assert len(seen) == 1 and seen[0].upload_bytes == 5000 and seen[0].error is None
+        assert not metrics.has_hooks(), "the bound-method hook was not removed"
+
+
+if __name__ == "__main__":
+    run_test()
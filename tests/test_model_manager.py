@@ -0,0 +1,45 @@
+import importlib
+import json
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+model_manager = importlib.import_module(f"{root.name}.model_manager")
+
+
+def run_test(api_key=None):
+    fetches = []
+
+    def fake_fetch(api_key=None):
+        fetches.append(api_key)
+        return ["gpt-new", "gpt-old"]
+
+    original = model_manager.fetch_models
+    model_manager.fetch_models = fake_fetch
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config = pathlib.Path(tmp) / "model_config.json"
+            config.write_text(json.dumps({"models": ["gpt-old"]}))
+            registry = model_manager.ModelRegistry(str(config))
+
+            assert registry.contains("gpt-old")
+            assert registry.models() == ["gpt-old"]
+            assert not fetches
+
+            # Unknown name: one refresh, then answered from the negative cache.
+            assert not registry.contains("gpt-typo", api_key="k")
+            assert not registry.contains("gpt-typo", api_key="k")
+            assert fetches == ["k"]
+            assert registry.contains("gpt-new")
+
+            saved = json.loads(config.read_text())
+            assert saved["models"] == ["gpt-new", "gpt-old"]
+            assert not list(pathlib.Path(tmp).glob("*.tmp"))
+    finally:
+        model_manager.fetch_models = original
+
+if __name__ == "__main__":
+    run_test()
@@ -1,11 +1,12 @@
+import importlib
 import pathlib
 import sys
 
 root = pathlib.Path(__file__).resolve().parents[1]
-sys.path.insert(0, str(root))
+sys.path.insert(0, str(root.parent))
 
 try:
-    from openai_wrapper import generate_content
+    generate_content = importlib.import_module(f"{root.name}.openai_wrapper").generate_content
 except Exception:
     generate_content = None
 
@@ -0,0 +1,50 @@
+import importlib
+import pathlib
+import sys
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+rate_limiter = importlib.import_module(f"{root.name}.rate_limiter")
+token_estimator = importlib.import_module(f"{root.name}.token_estimator")
+
+
+def run_test(api_key=None):
+    bucket = rate_limiter.TokenBucket(60)  # one token per second
+    assert bucket.reserve(60) == 0.0
+    wait = bucket.reserve(2)
+    assert 1.9 < wait <= 2.0
+    bucket.credit(2)
+    assert bucket.reserve(0) == 0.0
+
+    # The limiter counts prompts exactly like the map-reduce pre-flight does.
+    messages = [{"role": "user", "content": "x" * 400}]
+    estimate = rate_limiter.estimate_request_tokens({"model": "gpt-4o", "messages": messages, "max_tokens": 50})
+    assert estimate == token_estimator.estimate_message_tokens(messages, "gpt-4o") + 50
+    inputs = ["abcd" * 10, "efgh"]
+    assert rate_limiter.estimate_request_tokens({"input": inputs + [[1, 2, 3]]}) == \
+        sum(token_estimator.estimate_tokens(text) for text in inputs) + 3
+
+    limiter = rate_limiter.RateLimiter(default_rpm=1000, default_tpm=10_000, limits={"small": (2, 100)})
+    model = limiter.limiter_for("key", "small")
+    assert model.requests.capacity == 2 and limiter.limiter_for("key", "small") is model
+    assert limiter.limiter_for("other-key", "small") is not model
+
+    model.update_from_headers({
+        "x-ratelimit-limit-requests": "600",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-tokens": "3000",
+    })
+    assert model.requests.capacity == 600 and model.tokens.capacity == 6000
+    wait = model.reserve(10)
+    assert 0.05 < wait <= 0.11  # no requests left; 10 per second refill
+
+    _, estimated, _ = limiter.acquire("key", "big", {"messages": [], "max_tokens": 10})
+    big = limiter.limiter_for("key", "big")
+    level = big.tokens.level
+    big.settle(estimated, 4)
+    assert big.tokens.level - level >= estimated - 4 - 1
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,65 @@
+import importlib
+import io
+import pathlib
+import sys
+import tempfile
+import time
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+response_cache = importlib.import_module(f"{root.name}.response_cache")
+
+
+def run_test(api_key=None):
+    key = response_cache.request_key
+    messages = [{"role": "user", "content": "hi"}]
+    assert key("chat.completions.create", (), {"model": "m", "messages": messages, "api_key": "a"}) == \
+        key("chat.completions.create", (), {"messages": messages, "model": "m", "api_key": "b"})
+    assert key("chat.completions.create", (), {"model": "m"}) != key("chat.completions.create", (), {"model": "n"})
+
+    audio = io.BytesIO(b"RIFF....WAVE")
+    first = key("audio.transcriptions.create", (), {"file": audio})
+    assert audio.tell() == 0
+    assert first == key("audio.transcriptions.create", (), {"file": io.BytesIO(b"RIFF....WAVE")})
+    assert first != key("audio.transcriptions.create", (), {"file": io.BytesIO(b"other")})
+
+    assert response_cache.should_cache("chat.completions.create", {"temperature": 0})
+    assert not response_cache.should_cache("chat.completions.create", {"temperature": 0.7})
+    assert not response_cache.should_cache("chat.completions.create", {"temperature": 0, "stream": True})
+    assert not response_cache.should_cache("images.generate", {})
+    assert response_cache.should_cache("images.generate", {}, cache=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = response_cache.ResponseCache(str(pathlib.Path(tmp) / "c.sqlite3"), max_entries=2)
+        assert cache.set("a", "alpha") and cache.set("b", "beta")
+        assert cache.get("a") == (True, "alpha")
+        time.sleep(0.01)
+        cache.set("c", "gamma")  # evicts "b", the least recently used
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, "alpha")
+        assert not cache.set("d", object())
+
+        cache.set("short", "lived", ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("short") == (False, None)
+
+        try:
+            from openai.types import CreateEmbeddingResponse
+        except ImportError:
+            CreateEmbeddingResponse = None
+        if CreateEmbeddingResponse is not None:
+            response = CreateEmbeddingResponse.model_validate({
+                "object": "list", "model": "m",
+                "data": [{"object": "embedding", "index": 0, "embedding": [0.5, 0.25]}],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            })
+            cache.set("emb", response)
+            hit, restored = cache.get("emb")
+            assert hit and restored == response
+
+        stats = cache.stats()
+        assert stats["hits"] >= 3 and stats["misses"] == 2 and stats["entries"] <= 2
+
+if __name__ == "__main__":
+    run_test()
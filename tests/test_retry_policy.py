@@ -0,0 +1,120 @@
+import importlib
+import pathlib
+import sys
+import tempfile
+import time
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+try:
+    import httpx
+    import openai
+    retry_policy = importlib.import_module(f"{root.name}.retry_policy")
+    openai_wrapper = importlib.import_module(f"{root.name}.openai_wrapper")
+    benchmark = importlib.import_module(f"{root.name}.benchmark")
+    mock_openai_server = importlib.import_module(f"{root.name}.mock_openai_server")
+except Exception:
+    retry_policy = None
+
+
+def _status_error(cls, status, headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    body = {"code": code} if code else None
+    return cls("error", response=response, body=body)
+
+
+def run_test(api_key=None):
+    if retry_policy is None:
+        print("openai not installed; skipping retry policy test.")
+        return
+
+    assert retry_policy.parse_duration("6m0s") == 360
+    assert retry_policy.parse_duration("20ms") == 0.02
+    assert retry_policy.parse_duration("1.5") == 1.5
+    assert retry_policy.parse_duration("soon") is None
+
+    limited = _status_error(openai.RateLimitError, 429, {"retry-after": "3"})
+    assert retry_policy.retry_after(limited) == 3
+    reset = _status_error(openai.RateLimitError, 429, {"x-ratelimit-reset-requests": "1s",
+                                                       "x-ratelimit-reset-tokens": "2m"})
+    assert retry_policy.retry_after(reset) == 120
+
+    assert retry_policy.is_retryable(limited)
+    assert retry_policy.is_retryable(_status_error(openai.InternalServerError, 503))
+    assert not retry_policy.is_retryable(_status_error(openai.BadRequestError, 400))
+    assert not retry_policy.is_retryable(_status_error(openai.AuthenticationError, 401))
+    assert not retry_policy.is_retryable(_status_error(openai.RateLimitError, 429, code="insufficient_quota"))
+
+    policy = retry_policy.RetryPolicy(base_delay=1, max_delay=10, jitter=False)
+    assert [policy.delay(n) for n in range(5)] == [1, 2, 4, 8, 10]
+    assert policy.delay(0, limited) == 3
+    jittered = retry_policy.RetryPolicy(base_delay=1, max_delay=10)
+    assert all(0 <= jittered.delay(3) <= 8 for _ in range(20))
+
+    breaker = retry_policy.CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.05)
+    outage = _status_error(openai.InternalServerError, 500)
+    breaker.record(outage)
+    breaker.before_call()
+    breaker.record(outage)
+    assert breaker.state == "open"
+    try:
+        breaker.before_call()
+        raise AssertionError("open circuit should fail fast")
+    except retry_policy.CircuitOpenError:
+        pass
+    time.sleep(0.06)
+    assert breaker.before_call()  # the single half-open probe
+    try:
+        breaker.before_call()
+        raise AssertionError("only one probe may run while half-open")
+    except retry_policy.CircuitOpenError:
+        pass
+    breaker.record(None)
+    assert breaker.state == "closed"
+
+    _probe_interrupted()
+
+
+def _probe_interrupted():
+    """A probe that dies of something other than an API error must not wedge the circuit half-open."""
+    def chat():
+        return openai_wrapper.call_openai_method("chat.completions.create", model="gpt-4o-mini", retries=0,
+                                                 messages=[{"role": "user", "content": "Hi"}])
+
+    def broken(client, method_path):
+        def send(*args, **kwargs):
+            raise httpx.ReadError("connection reset")
+        return send
+
+    with tempfile.TemporaryDirectory() as tmp, mock_openai_server.MockOpenAIServer() as server, \
+            benchmark.mock_environment(server, tmp):
+        retry_policy.configure_circuit_breakers(failure_threshold=1, recovery_timeout=0.05)
+        resolve = openai_wrapper._resolve_method
+        try:
+            server.error_rate = 1.0
+            try:
+                chat()
+                raise AssertionError("expected InternalServerError")
+            except openai.InternalServerError:
+                pass
+            server.error_rate = 0.0
+            time.sleep(0.06)
+            openai_wrapper._resolve_method = broken
+            try:
+                chat()
+                raise AssertionError("expected ReadError")
+            except httpx.ReadError:
+                pass
+            openai_wrapper._resolve_method = resolve
+            assert chat().choices[0].message.content  # the next call probes and closes the circuit
+        finally:
+            openai_wrapper._resolve_method = resolve
+            server.error_rate = 0.0
+            retry_policy.configure_circuit_breakers(failure_threshold=retry_policy.DEFAULT_FAILURE_THRESHOLD,
+                                                    recovery_timeout=retry_policy.DEFAULT_RECOVERY_TIMEOUT)
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,128 @@
+import asyncio
+import importlib
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+single_flight = importlib.import_module(f"{root.name}.single_flight")
+openai_wrapper = importlib.import_module(f"{root.name}.openai_wrapper")
+benchmark = importlib.import_module(f"{root.name}.benchmark")
+mock_openai_server = importlib.import_module(f"{root.name}.mock_openai_server")
+
+
+def _threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_test(api_key=None):
+    flight = single_flight.SingleFlight()
+    calls, results, errors = [], [], []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"answer": 42}
+
+    _threads(lambda: results.append(flight.do("k", slow)), 8)
+    assert len(calls) == 1 and len(results) == 8 and all(r is results[0] for r in results)
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "in_flight": 0}
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    def call_failing():
+        try:
+            flight.do("bad", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    _threads(call_failing, 4)
+    assert len(errors) == 4 and all(e is errors[0] for e in errors)
+
+    async def main():
+        acalls = []
+
+        async def aslow(value):
+            acalls.append(value)
+            await asyncio.sleep(0.1)
+            return value
+
+        same = await asyncio.gather(*(flight.ado("a", lambda: aslow(1)) for _ in range(5)))
+        other = await flight.ado("b", lambda: aslow(2))
+        return acalls, same, other
+
+    acalls, same, other = asyncio.run(main())
+    assert acalls == [1, 2] and same == [1] * 5 and other == 2
+
+    async def cancelled_callers():
+        started, finished = [], []
+
+        async def work():
+            started.append(1)
+            await asyncio.sleep(0.1)
+            finished.append(1)
+            return "shared"
+
+        # Cancelling the first caller leaves the call running for the one that joined it.
+        first = asyncio.ensure_future(flight.ado("c", work))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(flight.ado("c", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "shared" and first.cancelled() and started == [1] and finished == [1]
+
+        # Once every caller is cancelled, the call itself is.
+        only = asyncio.ensure_future(flight.ado("d", work))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        await asyncio.sleep(0.15)
+        assert only.cancelled() and started == [1, 1] and finished == [1]
+
+    asyncio.run(cancelled_callers())
+    assert flight.stats()["in_flight"] == 0
+
+    chat = "chat.completions.create"
+    assert not single_flight.should_coalesce(chat, {"model": "m"})
+    assert single_flight.should_coalesce(chat, {"model": "m"}, coalesce=True)
+    assert not single_flight.should_coalesce(chat, {"model": "m", "stream": True}, coalesce=True)
+    single_flight.enable_coalescing()
+    try:
+        assert single_flight.should_coalesce(chat, {"model": "m"})
+        assert not single_flight.should_coalesce("images.generate", {"model": "m"})
+        assert not single_flight.should_coalesce("beta.threads.runs.create", {"assistant_id": "a"})
+    finally:
+        single_flight.disable_coalescing()
+    key = single_flight.flight_key("chat.completions.create", (), {"model": "m"}, api_key="a")
+    assert key != single_flight.flight_key("chat.completions.create", (), {"model": "m"}, api_key="b")
+
+    _creates_are_not_shared()
+
+
+def _creates_are_not_shared():
+    """Identical concurrent image generations each reach the server and get their own images."""
+    with tempfile.TemporaryDirectory() as tmp, mock_openai_server.MockOpenAIServer(latency=0.05) as server, \
+            benchmark.mock_environment(server, tmp):
+        coalescer = single_flight.enable_coalescing()
+        try:
+            before, coalesced = server.counts.get("requests", 0), coalescer.stats()["coalesced"]
+            responses = []
+            _threads(lambda: responses.append(openai_wrapper.call_openai_method(
+                "images.generate", model="dall-e-2", prompt="same", n=1, size="256x256")), 2)
+            assert server.counts["requests"] - before == 2 and responses[0] is not responses[1]
+            assert coalescer.stats()["coalesced"] == coalesced
+        finally:
+            single_flight.disable_coalescing()
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,22 @@
+import importlib
+import pathlib
+import sys
+
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.parent))
+
+startup_bench = importlib.import_module(f"{root.name}.startup_bench")
+
+
+def run_test(api_key=None):
+    sample = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        340 |   json\n"
+    )
+    assert startup_bench.parse_importtime(sample) == {"json": (120, 340)}
+    violations = startup_bench.check_forbidden_imports()
+    assert not violations, f"unexpected imports at start-up: {violations}"
+
+
+if __name__ == "__main__":
+    run_test()
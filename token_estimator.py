@@ -0,0 +1,100 @@
+import re
+import json
+import logging
+
+# Context window (total tokens) by model id prefix; the longest matching prefix wins.
+CONTEXT_WINDOWS = {
+    "gpt-5": 400_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4-1106": 128_000,
+    "gpt-4-0125": 128_000,
+    "gpt-4-32k": 32_768,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+# Average characters per token of each tokenizer family on English prose.
+CHARS_PER_TOKEN = {
+    "o200k": 4.2,  # gpt-4o, gpt-4.1, gpt-5, o-series
+    "cl100k": 3.8,  # gpt-4, gpt-3.5
+}
+O200K_PREFIXES = ("gpt-5", "gpt-4.1", "gpt-4o", "o1", "o3", "o4")
+SAFETY_MARGIN = 1.1  # heuristic estimates are padded so a "fits" verdict errs on the safe side
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators per chat message
+REPLY_PRIMER_TOKENS = 3
+
+_WORD_OR_SYMBOL = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_WIDE_CHARS = re.compile(r"[\u2e80-\ud7ff\uf900-\uffef]")  # CJK and similar: about one token each
+
+logger = logging.getLogger(__name__)
+
+_encodings = {}
+
+
+def tokenizer_family(model):
+    model = model or ""
+    return "o200k" if model.startswith(O200K_PREFIXES) else "cl100k"
+
+
+def context_window(model):
+    """Total tokens (prompt + completion) the model accepts."""
+    model = model or ""
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+def _encoding(model):
+    """The tiktoken encoding for `model` when tiktoken is installed, else None."""
+    family = tokenizer_family(model)
+    if family not in _encodings:
+        try:
+            import tiktoken
+            _encodings[family] = tiktoken.get_encoding(f"{family}_base")
+        except Exception:  # not installed, or the encoding cannot be downloaded
+            _encodings[family] = None
+    return _encodings[family]
+
+
+def estimate_tokens(text, model=None):
+    """
+    Token count of `text` for `model`: exact with tiktoken installed, otherwise
+    a padded estimate from character and word counts of the model's tokenizer
+    family.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    wide = len(_WIDE_CHARS.findall(text))
+    by_chars = (len(text) - wide) / CHARS_PER_TOKEN[tokenizer_family(model)] + wide
+    # Code and numbers tokenize much denser than prose.
+    by_words = len(_WORD_OR_SYMBOL.findall(text))
+    return int(max(by_chars, by_words) * SAFETY_MARGIN) + 1
+
+
+def estimate_message_tokens(messages, model=None):
+    """Prompt tokens of a chat `messages` list, including per-message overhead."""
+    total = REPLY_PRIMER_TOKENS
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        total += estimate_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def fits_context(messages, model, max_output_tokens=0):
+    """
+    Pre-flight check: returns (fits, prompt_tokens, context_window) for sending
+    `messages` to `model` while leaving room for `max_output_tokens`.
+    """
+    prompt_tokens = estimate_message_tokens(messages, model)
+    window = context_window(model)
+    return prompt_tokens + max_output_tokens <= window, prompt_tokens, window
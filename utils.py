@@ -11,13 +11,18 @@ def save_text_to_file(content, path):
         f.write(content)
     print(f"Saved to {path}")
 
-def format_as_json_response(content, model, mode):
-    return json.dumps({
+def build_json_response(content, model, mode, **extra):
+    record = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "model": model,
         "mode": mode,
         "response": content
-    }, indent=2)
+    }
+    record.update(extra)
+    return record
+
+def format_as_json_response(content, model, mode):
+    return json.dumps(build_json_response(content, model, mode), indent=2)
 
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
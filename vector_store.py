@@ -0,0 +1,166 @@
+import os
+import json
+import logging
+import numpy as np
+
+DTYPE = np.float32
+OFFSET_DTYPE = np.uint64
+BLOCK_ROWS = 65_536  # rows scored per step, bounding search memory to BLOCK_ROWS * dim * 4 bytes
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """
+    Append-only on-disk store of unit-normalized float32 vectors.
+
+    `<path>.f32` holds the raw rows, `<path>.ids` one JSON id per line,
+    `<path>.idx` the uint64 byte offset of each id line and `<path>.json`
+    the model, dimension and committed sizes. Searches memory-map the rows
+    and the offsets, so neither has to fit in memory and a search reads
+    only the ids of its results. Data past the committed sizes (from an
+    interrupted `add`) is ignored and overwritten by the next one.
+    """
+
+    def __init__(self, path, model=None, dimensions=None):
+        self.path = path
+        self.model = model
+        self.dimensions = dimensions  # the `dimensions` request option, if one was used
+        self.dim = None
+        self.count = 0
+        self.ids_bytes = 0
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+            if model and meta.get("model") and model != meta["model"]:
+                raise ValueError(f"{path} was built with {meta['model']}, not {model}")
+            self.model = meta.get("model") or model
+            self.dimensions = meta.get("dimensions", dimensions)
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            self.ids_bytes = meta["ids_bytes"]
+            offsets_size = os.path.getsize(self._offsets_path) if os.path.exists(self._offsets_path) else 0
+            if offsets_size < self.count * np.dtype(OFFSET_DTYPE).itemsize:
+                self._rebuild_offsets()  # an index written before offsets were kept
+
+    @property
+    def _data_path(self):
+        return self.path + ".f32"
+
+    @property
+    def _ids_path(self):
+        return self.path + ".ids"
+
+    @property
+    def _offsets_path(self):
+        return self.path + ".idx"
+
+    @property
+    def _meta_path(self):
+        return self.path + ".json"
+
+    def __len__(self):
+        return self.count
+
+    def add(self, ids, vectors):
+        """Append `vectors` (rows of floats) under `ids`; rows are normalized for cosine search."""
+        rows = np.asarray(vectors, dtype=DTYPE)
+        if rows.ndim != 2 or len(rows) != len(ids):
+            raise ValueError("expected one vector per id")
+        if self.dim is None:
+            self.dim = rows.shape[1]
+        elif rows.shape[1] != self.dim:
+            raise ValueError(f"vectors have dimension {rows.shape[1]}, index has {self.dim}")
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        rows /= np.where(norms == 0, 1, norms)
+
+        with open(self._data_path, 'ab') as f:
+            f.truncate(self.count * self.dim * rows.itemsize)
+            f.write(rows.tobytes())
+        lines = [(json.dumps(item_id) + "\n").encode('utf-8') for item_id in ids]
+        lengths = np.fromiter((len(line) for line in lines), dtype=OFFSET_DTYPE, count=len(lines))
+        offsets = self.ids_bytes + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(OFFSET_DTYPE)
+        with open(self._ids_path, 'ab') as f:
+            f.truncate(self.ids_bytes)
+            f.write(b"".join(lines))
+        self._write_offsets(offsets)
+        self.count += len(rows)
+        self.ids_bytes += int(lengths.sum())
+        self._write_meta()
+
+    def _write_offsets(self, offsets):
+        with open(self._offsets_path, 'ab') as f:
+            f.truncate(self.count * offsets.itemsize)
+            f.write(offsets.tobytes())
+
+    def _rebuild_offsets(self):
+        with open(self._ids_path, 'rb') as f:
+            lines = f.read(self.ids_bytes).split(b"\n")[:self.count]
+        lengths = np.fromiter((len(line) + 1 for line in lines), dtype=OFFSET_DTYPE, count=len(lines))
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(OFFSET_DTYPE)
+        count, self.count = self.count, 0
+        self._write_offsets(offsets)
+        self.count = count
+
+    def _write_meta(self):
+        meta = {"model": self.model, "dimensions": self.dimensions, "dim": self.dim, "count": self.count,
+                "ids_bytes": self.ids_bytes}
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    def vectors(self):
+        """The committed rows as a read-only (count, dim) memory map."""
+        if not self.count:
+            return np.empty((0, self.dim or 0), dtype=DTYPE)
+        return np.memmap(self._data_path, dtype=DTYPE, mode='r', shape=(self.count, self.dim))
+
+    def ids(self, rows=None):
+        """Ids of the given row numbers (all rows by default); only those lines are read."""
+        if rows is None:
+            with open(self._ids_path, 'rb') as f:
+                return [json.loads(line) for line in f.read(self.ids_bytes).split(b"\n")[:self.count]]
+        rows = list(rows)
+        if not rows:
+            return []
+        offsets = np.memmap(self._offsets_path, dtype=OFFSET_DTYPE, mode='r', shape=(self.count,))
+        ids = []
+        with open(self._ids_path, 'rb') as f:
+            for row in rows:
+                start = int(offsets[row])
+                end = int(offsets[row + 1]) if row + 1 < self.count else self.ids_bytes
+                f.seek(start)
+                ids.append(json.loads(f.read(end - start)))
+        return ids
+
+    def search(self, query, top_k=10, block_rows=BLOCK_ROWS):
+        """
+        Cosine top-k: returns [(id, score)] for the `top_k` rows most similar
+        to `query`, best first. Rows are scored block by block with one
+        matrix-vector product each, keeping only each block's best k.
+        """
+        if not self.count or top_k < 1:
+            return []
+        query = np.asarray(query, dtype=DTYPE)
+        if query.shape != (self.dim,):
+            raise ValueError(f"query has shape {query.shape}, index dimension is {self.dim}")
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        rows = self.vectors()
+        best_scores, best_rows = np.empty(0, dtype=DTYPE), np.empty(0, dtype=np.int64)
+        for start in range(0, self.count, block_rows):
+            scores = rows[start:start + block_rows] @ query
+            if len(scores) > top_k:
+                keep = np.argpartition(scores, -top_k)[-top_k:]
+            else:
+                keep = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[keep]])
+            best_rows = np.concatenate([best_rows, keep + start])
+            if len(best_scores) > top_k:
+                keep = np.argpartition(best_scores, -top_k)[-top_k:]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores, kind='stable')
+        ids = self.ids(best_rows[order])
+        return [(item_id, float(score)) for item_id, score in zip(ids, best_scores[order])]